@@ -65,11 +65,16 @@ def build():
     # Copy HTML file from source
     updatefile("index.html", "build/index.html")
 
-    # Process every possible permutation
-    permutations = session.getPermutations()
-    for pos, permutation in enumerate(permutations):
-        logging.info("Permutation %s/%s" % (pos+1, len(permutations)))
+    # All classes which might be included (dependencies of the unpatched classes)
+    resolver = Resolver(session.getProjects())
+    resolver.addClassName("ootest.Test")
+    resolver.excludeClasses(loaderIncluded)
+    candidates = resolver.getIncludedClasses()
+
+    # Every permutation which makes a difference for these classes
+    permutations = list(session.getEffectivePermutations(candidates))
 
+    def compress(permutation):
         # Get projects
         projects = session.getProjects(permutation)
 
@@ -77,18 +82,22 @@ def build():
         resolver = Resolver(projects, permutation)
         resolver.addClassName("ootest.Test")
         resolver.excludeClasses(loaderIncluded)
-        classes = resolver.getIncludedClasses()
 
         # Compressing classes
         translation = session.getTranslation(permutation.get("locale"))
-        classes = Sorter(resolver, permutation).getSortedClasses()
-        compressedCode = Combiner(classes).getCompressedCode(permutation, translation, optimization, formatting)
-        
-        # Boot logic
-        bootCode = ""
-
-        # Write file
-        writefile("build/oo-%s.js" % permutation.getChecksum(), compressedCode + bootCode)
+        sorter = Sorter(resolver, permutation)
+        parts = Combiner(sorter.getSortedClasses()).getCompressedParts(permutation, translation, optimization, formatting)
+        return parts, sorter.getLoadDependencies()
+
+    # Compress permutations in parallel. Classes which are the same in all permutations 
+    # are loaded from a common file first.
+    sharedCode, compressedCodes = session.build(compress, [permutation for permutation, variants in permutations], shared=True)
+    writefile("build/oo-common.js", sharedCode)
+
+    for (permutation, variants), compressedCode in zip(permutations, compressedCodes):
+        # Write file (once for every complete permutation)
+        for variant in variants:
+            writefile("build/oo-%s.js" % variant.getChecksum(), compressedCode)
 
 
 
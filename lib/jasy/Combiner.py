@@ -5,7 +5,7 @@
 
 import logging, os, random
 
-__all__ = ["Combiner"]
+__all__ = ["Combiner", "getSharedClasses", "getSharedCode"]
 
 
 class Combiner():
@@ -27,6 +27,26 @@ class Combiner():
         return "".join([classObj.getCompressed(permutation, translation, optimization, format) for classObj in self.__classList])
 
 
+    def getCompressedParts(self, permutation=None, translation=None, optimization=None, format=None):
+        """ Returns the compressed result of the stored class list as a list of (class name, code) tuples (see getSharedClasses()) """
+
+        return [(classObj.getName(), classObj.getCompressed(permutation, translation, optimization, format)) for classObj in self.__classList]
+
+
+    def getCompressedMappings(self, permutation=None, translation=None, optimization=None, format=None):
+        """ Combines the source mappings of the stored class list, matching the result of getCompressedCode() """
+
+        result = []
+        offset = 0
+        for classObj in self.__classList:
+            for position, fileId, line in classObj.getCompressedMappings(permutation, translation, optimization, format):
+                result.append((offset + position, fileId, line))
+
+            offset += len(classObj.getCompressed(permutation, translation, optimization, format))
+
+        return result
+
+
     def getLoaderCode(self, bootCode, relativeRoot, session):
         logging.info("Generating loader...")
 
@@ -43,4 +63,71 @@ class Combiner():
         boot = "function(){%s}" % bootCode if bootCode else ""
         result = 'jasy.io.Queue.load([%s], %s, null, true)' % (loader, boot)
 
-        return result
\ No newline at end of file
+        return result
+
+
+
+def getSharedClasses(builds):
+    """
+    Returns the names of the classes (in load order) which the given builds (e.g. of different permutations) 
+    can load from a common chunk. Builds are tuples of the compressed classes as returned by 
+    Combiner.getCompressedParts() and the load dependencies as returned by Sorter.getLoadDependencies(). 
+    Classes are shared when they have the same code in all builds and all classes they depend on in 
+    any build are shared as well (or not part of that build). Loading the chunk before the remaining 
+    classes of a build (in their original order) keeps all load dependencies intact.
+    """
+
+    if not builds:
+        return []
+
+    # Classes with the same code in all builds
+    codes = dict(builds[0][0])
+    for parts, dependencies in builds[1:]:
+        codes = dict([(name, code) for name, code in parts if codes.get(name) == code])
+
+    # Dependencies of the candidates in any of the builds (classes which are not 
+    # part of any build, e.g. those of the loader, are loaded before anyway)
+    names = set()
+    required = dict([(name, set()) for name in codes])
+    for parts, dependencies in builds:
+        names.update(dependencies)
+        for name in codes:
+            required[name].update(dependencies.get(name, ()))
+
+    # Adds the classes whose dependencies are shared, in the order of the first build
+    shared = []
+    available = set()
+    order = [name for name, code in builds[0][0] if name in codes]
+    
+    added = True
+    while added:
+        added = False
+        for name in order:
+            if name in available:
+                continue
+                
+            if not required[name].intersection(names).difference(available):
+                shared.append(name)
+                available.add(name)
+                added = True
+
+    logging.info("Sharing %s of %s classes between %s builds" % (len(shared), len(builds[0][0]), len(builds)))
+    return shared
+
+
+
+def getSharedCode(builds):
+    """
+    Splits the code of the given builds (see getSharedClasses()) into a common chunk and the 
+    remaining code of every build. Returns the code of the chunk and the list of the remaining 
+    codes (in the order of the builds). The chunk has to be loaded before the remaining code.
+    """
+
+    if not builds:
+        return "", []
+
+    shared = getSharedClasses(builds)
+    sharedNames = set(shared)
+    codes = dict(builds[0][0])
+
+    return "".join([codes[name] for name in shared]), ["".join([code for name, code in parts if not name in sharedNames]) for parts, dependencies in builds]
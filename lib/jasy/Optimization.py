@@ -3,7 +3,7 @@
 # Copyright 2010-2011 Sebastian Werner
 #
 
-import logging
+import logging, time
 
 import jasy.optimizer.CryptPrivates as CryptPrivates
 import jasy.optimizer.BlockReducer as BlockReducer
@@ -13,8 +13,25 @@ import jasy.optimizer.UnusedCleaner as UnusedCleaner
 
 
 class Optimization:
-    def __init__(self, *args):
+    """
+    Set of optimizations to apply to the trees of classes. The optimizations which might 
+    enable each other (unused, declarations, blocks) are repeated as long as they change 
+    the tree (at most "maxIterations" rounds), renaming (variables, privates) happens
+    once at the end. Statistics about the passes are collected, see getStatistics().
+    """
+    
+    # Passes to repeat after a pass changed the tree (e.g. removing a statement 
+    # with the last access to a variable makes the variable unused)
+    __enables = {
+        "unused" : ("unused", "declarations", "blocks"),
+        "declarations" : ("blocks",),
+        "blocks" : ("unused",)
+    }
+    
+    def __init__(self, *args, maxIterations=4):
         self.__optimizations = set()
+        self.__maxIterations = maxIterations
+        self.__statistics = {}
         
         for identifier in args:
             self.enable(identifier)
@@ -28,24 +45,89 @@ class Optimization:
     def apply(self, tree, stats):
         enabled = self.__optimizations
         
+        passes = []
         if "unused" in enabled:
-            UnusedCleaner.optimize(tree)
-
+            passes.append(("unused", UnusedCleaner.optimize))
+            
         if "declarations" in enabled:
-            CombineDeclarations.optimize(tree)
-
+            passes.append(("declarations", CombineDeclarations.optimize))
+            
         if "blocks" in enabled:
-            BlockReducer.optimize(tree)
+            passes.append(("blocks", BlockReducer.optimize))
+            
+        # A pass is repeated when the tree has been changed after it was executed. Changes
+        # are detected by the result of the pass (when available) and by the number of nodes.
+        count = self.__countNodes(tree)
+        names = set([name for name, optimize in passes])
+        dirty = set(names)
+        
+        iteration = 0
+        while dirty and iteration < self.__maxIterations:
+            iteration += 1
+            
+            for name, optimize in passes:
+                if not name in dirty:
+                    continue
+                    
+                dirty.remove(name)
+                
+                start = time.time()
+                changed = optimize(tree)
+                
+                before = count
+                count = self.__countNodes(tree)
+                self.__record(name, time.time() - start, count - before)
+                
+                if changed or count != before:
+                    dirty.update(names.intersection(self.__enables[name]))
+
+        if dirty:
+            logging.debug("Stopped optimizing after %s iterations" % iteration)
 
         if "variables" in enabled:
+            start = time.time()
             LocalVariables.optimize(tree, stats)
+            self.__record("variables", time.time() - start, 0)
 
         if "privates" in enabled:
+            start = time.time()
             CryptPrivates.optimize(tree)
+            self.__record("privates", time.time() - start, 0)
+            
+    def getStatistics(self):
+        """ 
+        Returns a dictionary with the statistics of all applications of the optimization: 
+        pass name => (number of runs, time in seconds, change of the number of nodes)
+        """
+        return dict([(name, tuple(values)) for name, values in self.__statistics.items()])
+        
+    def __record(self, name, duration, delta):
+        values = self.__statistics.get(name)
+        if values is None:
+            self.__statistics[name] = [1, duration, delta]
+        else:
+            values[0] += 1
+            values[1] += duration
+            values[2] += delta
+            
+    def __countNodes(self, tree):
+        count = 0
+        todo = [tree]
+        while todo:
+            node = todo.pop()
+            if node is not None:
+                count += 1
+                todo.extend(node)
+                
+        return count
 
     def getKey(self):
-        return "+".join(sorted(self.__optimizations))
+        key = "+".join(sorted(self.__optimizations))
+        if self.__maxIterations != 4:
+            key += "@%s" % self.__maxIterations
+            
+        return key
         
     # Map Python built-ins
     __repr__ = getKey
-    __str__ = getKey        
\ No newline at end of file
+    __str__ = getKey
@@ -9,12 +9,13 @@ from jasy.core.Translation import Translation
 from jasy.core.Info import *
 from jasy.core.Profiler import *
 from jasy.core.LocaleData import *
+from jasy.core.Parallel import execute
 
 from jasy.Project import Project
 from jasy.File import *
 from jasy.Resolver import Resolver
 from jasy.Optimization import Optimization
-from jasy.Combiner import Combiner
+from jasy.Combiner import Combiner, getSharedCode
 from jasy.Sorter import Sorter
 
 
@@ -251,6 +252,86 @@ class Session():
         return permutations
 
 
+    def getEffectivePermutations(self, classes):
+        """
+        Generator for the permutations which make a difference for the given classes (e.g. all 
+        classes which might be included into the build). Fields which are not checked by any of 
+        the classes are not permutated (the locale is always permutated as it selects projects and 
+        translations). Yields tuples of the effective permutation and the list of the complete 
+        permutations (see getPermutations()) it stands for, e.g. to store the result of the 
+        effective permutation under the checksum of each of them.
+        """
+        
+        fields = self.__fields
+        values = { key:fields[key]["values"] for key in fields if "values" in fields[key] }
+        
+        keys = set(["locale"])
+        for classObj in classes:
+            keys.update(classObj.getPermutationKeys())
+        
+        names = sorted(values)
+        relevant = [name for name in names if name in keys]
+        irrelevant = [name for name in names if not name in keys]
+        
+        total = 1
+        for name in names:
+            total *= len(values[name])
+
+        effective = 1
+        for name in relevant:
+            effective *= len(values[name])
+            
+        logging.info("Permutating %s of %s fields: %s of %s permutations eliminated" % (len(relevant), len(names), total - effective, total))
+        
+        for prod in itertools.product(*(values[name] for name in relevant)):
+            combination = dict(zip(relevant, prod))
+            
+            variants = []
+            for rest in itertools.product(*(values[name] for name in irrelevant)):
+                complete = dict(combination)
+                complete.update(zip(irrelevant, rest))
+                variants.append(Permutation(complete, fields))
+                
+            yield Permutation(combination, fields), variants
+
+
+    def build(self, task, permutations=None, processes=None, shared=False):
+        """
+        Calls the given task (e.g. resolving, sorting and compressing the classes) with each 
+        of the given permutations (defaults to all permutations) in a pool of processes 
+        (defaults to the number of CPUs). Returns the results of the task in the order of the 
+        permutations. The processes read the caches of the projects, but all values computed 
+        and cached there (e.g. trees, compressed functions) are dropped when the build is done: 
+        only the results of the task are returned. Builds with one process keep them. Exceptions 
+        of the task are raised again.
+        
+        With shared enabled the task has to return the compressed parts and the load dependencies 
+        of its classes (see Combiner.getCompressedParts() and Sorter.getLoadDependencies()). The 
+        classes which are the same in all permutations are moved into a common chunk and the code 
+        of the chunk is returned together with the remaining code of every permutation (see 
+        getSharedCode()).
+        """
+        
+        if permutations is None:
+            permutations = self.getPermutations()
+        else:
+            permutations = list(permutations)
+            
+        # Locale projects are created (and their files stored) before forking
+        for permutation in permutations:
+            self.getProjects(permutation)
+            
+        # Workers read the cache files of the projects
+        for project in self.getProjects():
+            project.getCache().sync()
+            
+        results = execute(task, permutations, processes)
+        if shared:
+            return getSharedCode(results)
+            
+        return results
+
+
     def __exportFields(self):
         """
         Converts data from values to a compact data structure for being used to 
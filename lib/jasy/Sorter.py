@@ -61,6 +61,16 @@ class Sorter:
         return self.__sortedClasses
         
         
+    def getLoadDependencies(self):
+        """ Returns a dict which maps the names of the sorted classes to the names of the classes which have to be loaded before """
+        
+        result = {}
+        for classObj in self.getSortedClasses():
+            result[classObj.getName()] = set([depObj.getName() for depObj in self.__getLoadDeps(classObj)])
+            
+        return result
+        
+        
         
         
     def __addSorted(self, classObj, result, postponed=False):
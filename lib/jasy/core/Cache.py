@@ -3,7 +3,7 @@
 # Copyright 2010-2011 Sebastian Werner
 #
 
-import shelve, time, logging, os, os.path, sys, pickle, dbm
+import shelve, time, logging, os, os.path, sys, pickle, dbm, weakref
 
 class Cache:
     """ 
@@ -13,9 +13,24 @@ class Cache:
     
     __db = None
     
+    # Processes which share the cache files with other processes (e.g. the workers
+    # of parallel builds) must not write to them, see setReadOnly()
+    __readOnly = False
+    
+    # All caches of the process (reopened by setReadOnly())
+    __instances = weakref.WeakSet()
+    
+    # Handles of the cache files inherited from the parent process (see __reopen())
+    __inherited = None
+    
     def __init__(self, path, clear=False):
         self.__transient = {}
         self.__file = os.path.join(path, "cache.db")
+        self.__instances.add(self)
+        
+        if self.__readOnly:
+            self.__openReadOnly()
+            return
         
         try:
             self.__db = shelve.open(self.__file, flag="c")
@@ -36,6 +51,39 @@ class Cache:
                 raise error
     
     
+    @classmethod
+    def setReadOnly(cls, readOnly=True):
+        """ 
+        Enables/disables read-only mode for all caches of the process: cache files are
+        not modified anymore, new values are only stored in memory. When enabled, existing 
+        caches open their files again with a new read-only handle (e.g. in forked processes,
+        which must not use the handles inherited from their parent).
+        """
+        
+        cls.__readOnly = readOnly
+        if readOnly:
+            for cache in list(cls.__instances):
+                cache.__reopen()
+    
+    
+    def __openReadOnly(self):
+        try:
+            self.__db = shelve.open(self.__file, flag="r")
+        except dbm.error:
+            self.__db = {}
+            
+            
+    def __reopen(self):
+        """ Replaces the handle of the cache file with a new read-only handle """
+        
+        # The previous handle is kept open (but unused): closing it might write to the file
+        if self.__inherited is None:
+            self.__inherited = []
+            
+        self.__inherited.append(self.__db)
+        self.__openReadOnly()
+    
+    
     def clear(self):
         if self.__db != None:
             logging.debug("Closing cache file %s..." % self.__file)
@@ -84,7 +132,7 @@ class Cache:
         """
         
         self.__transient[key] = value
-        if transient:
+        if transient or self.__readOnly:
             return
         
         if not timestamp:
@@ -99,11 +147,13 @@ class Cache:
         
     def sync(self):
         """ Syncs the internal storage database """
-        self.__db.sync() 
+        if not self.__readOnly:
+            self.__db.sync()
       
       
     def close(self):
         """ Closes the internal storage database """
-        self.__db.close()         
+        if not self.__readOnly:
+            self.__db.close()         
         
       
\ No newline at end of file
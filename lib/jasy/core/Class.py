@@ -3,14 +3,17 @@
 # Copyright 2010-2011 Sebastian Werner
 #
 
-import os, logging, copy, hashlib
+import os, logging, hashlib
 
 from jasy.core.DeadCode import cleanup
 from jasy.core.MetaData import MetaData
-from jasy.core.Permutation import getKeys
-from jasy.core.Translation import hasText
+from jasy.core.PreScan import PreScan, prescan
+from jasy.core.Permutation import getPatchStatements
+from jasy.core.Translation import getTextCalls
 from jasy.parser.Parser import parse
-from jasy.process.Compressor import compress
+from jasy.parser.Node import NodeIndex
+from jasy.tokenizer.Tokenizer import ParseError
+from jasy.process.Compressor import Compressor
 from jasy.process.Variables import scan
 
 aliases = {}
@@ -77,13 +80,17 @@ class Class():
         if tree is not None:
             return tree
             
-        # Parse tree
-        tree = parse(self.getText(), self.__id)
-
-        # Apply permutation
+        # Apply permutation to an overlay of the unpatched tree. All parts which are 
+        # not affected by the permutation are shared between the variants.
         if permutation:
+            original = self.getTree()
+            tree = original.createOverlay(getPatchStatements(original))
             permutation.patch(tree)
             cleanup(tree)
+            
+        # Unpatched tree
+        else:
+            tree = self.__getParsedTree()
 
         # Index variables
         scan(tree)
@@ -92,6 +99,34 @@ class Class():
         return tree
 
 
+    def __getParsedTree(self):
+        """ 
+        Returns the tree of the class as it is parsed from its source. The tree is cached persistently 
+        together with the checksum of the source and so parsed only once per change of the source (and 
+        not again when just the modification time of the file changed). A tree parsed from a changed 
+        source replaces the previous one. The permutation variants are created as overlays of this 
+        tree in getTree().
+        """
+        
+        text = self.getText()
+        checksum = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        field = "parsed[%s]" % self.__id
+        
+        entry = self.__cache.read(field)
+        if entry is None or entry[0] != checksum:
+            tree = parse(text, self.__id, index=True)
+            self.__cache.store(field, (checksum, tree))
+            
+        # The node index (built on first lookup) and the source code are not stored in the cache
+        else:
+            tree = entry[1]
+            tree._source = text
+            if tree._index is None:
+                tree._index = NodeIndex(tree)
+            
+        return tree
+
+
     def getDependencies(self, permutation=None, classes=None):
         """ 
         Returns a set of dependencies seen through the given list of known 
@@ -154,9 +189,31 @@ class Class():
         return stats
         
         
+    def getPreScan(self):
+        """ Returns the facts collected by the token level scanner (without building a tree) """
+        
+        field = "prescan[%s]" % (self.__id)
+        result = self.__cache.read(field, self.__mtime)
+        if result is None:
+            try:
+                result = prescan(self.getText(), self.__id)
+            except ParseError as error:
+                logging.debug("Could not pre-scan %s, using tree instead: %s" % (self.__id, error))
+                result = PreScan(self.getTree())
+                
+            self.__cache.store(field, result, self.__mtime)
+        
+        return result
+        
+        
     def getMeta(self, permutation=None):
         permutation = self.filterPermutation(permutation)
         
+        # Without a relevant permutation the tree is not modified and
+        # all comments are kept which makes the pre-scan result sufficient
+        if permutation is None:
+            return self.getPreScan().meta
+        
         field = "meta[%s]-%s" % (self.__id, permutation)
         meta = self.__cache.read(field, self.__mtime)
         if meta == None:
@@ -167,23 +224,11 @@ class Class():
         
         
     def getPermutationKeys(self):
-        field = "permutations[%s]" % (self.__id)
-        result = self.__cache.read(field, self.__mtime)
-        if result is None:
-            result = getKeys(self.getTree())
-            self.__cache.store(field, result, self.__mtime)
-        
-        return result
+        return self.getPreScan().keys
 
 
     def usesTranslation(self):
-        field = "translation[%s]" % (self.__id)
-        result = self.__cache.read(field, self.__mtime)
-        if result == None:
-            result = hasText(self.getTree())
-            self.__cache.store(field, result, self.__mtime)
-        
-        return result
+        return self.getPreScan().translation
         
         
     def filterPermutation(self, permutation):
@@ -203,29 +248,56 @@ class Class():
         
         
     def getCompressed(self, permutation=None, translation=None, optimization=None, format=None):
+        return self.__getCompressed(permutation, translation, optimization, format)[0]
+        
+        
+    def getCompressedMappings(self, permutation=None, translation=None, optimization=None, format=None):
+        """ 
+        Returns the source mappings of the compressed code (see getCompressed()) as a 
+        list of (offset in code, file ID, line) tuples. 
+        """
+        
+        return self.__getCompressed(permutation, translation, optimization, format)[1]
+        
+        
+    def __getCompressed(self, permutation, translation, optimization, format):
+        """ Returns the compressed code and its mappings, which are recorded in one compression and cached together """
+        
         permutation = self.filterPermutation(permutation)
         translation = self.filterTranslation(translation)
         
-        field = "compressed[%s]-%s-%s-%s-%s" % (self.__id, permutation, translation, optimization, format)
+        field = "compressed[%s]-%s-%s-%s-%s-mappings" % (self.__id, permutation, translation, optimization, format)
         field = hashlib.md5(field.encode("utf-8")).hexdigest()
         
-        compressed = self.__cache.read(field, self.__mtime)
-        if compressed == None:
-            tree = self.getTree(permutation)
-            
-            if translation or optimization:
-                tree = copy.deepcopy(tree)
+        result = self.__cache.read(field, self.__mtime)
+        if result == None:
+            result = self.__compress(permutation, translation, optimization, format)
+            self.__cache.store(field, result, self.__mtime)
             
-                if translation:
-                    translation.patch(tree)
+        return result
+        
+        
+    def __compress(self, permutation, translation, optimization, format):
+        """ Returns the compressed code and its mappings """
+        
+        tree = self.getTree(permutation)
+        
+        if optimization:
+            tree = tree.clone()
+        
+            if translation:
+                translation.patch(tree)
 
-                if optimization:
-                    optimization.apply(tree, self.getStats(permutation))
-                
-            compressed = compress(tree, format)
-            self.__cache.store(field, compressed, self.__mtime)
+            optimization.apply(tree, self.getStats(permutation))
+            
+        # Translation only modifies the calls of translation methods
+        elif translation:
+            tree = tree.createOverlay(getTextCalls(tree))
+            translation.patch(tree)
             
-        return compressed
+        compressor = Compressor(format, mapping=True)
+        compressed = compressor.compress(tree)
+        return compressed, compressor.getMappings()
             
             
     def __str__(self):
@@ -4,16 +4,23 @@
 #
 
 import logging
+from jasy.parser.Traversal import compute
 
 def cleanup(node):
     """ Reprocesses JavaScript to remove dead paths """
+    return compute(node, __cleanupNode)
+
+
+
+def __cleanupNode(node):
+    """ Generator for compute() which cleans up the given node after its children """
     optimized = False
     
     # Process from inside to outside
     for child in reversed(node):
         # None children are allowed sometimes e.g. during array_init like [1,2,,,7,8]
         if child != None:
-            if cleanup(child):
+            if (yield child):
                 optimized = True
         
     # Optimize if cases
@@ -77,6 +84,20 @@ def cleanup(node):
 
 
 
+def isFoldable(node):
+    """ Whether cleanup() might replace the given node with one of its children (or remove it) """
+    
+    if node.type == "if":
+        return __checkCondition(node.condition) is not None
+    elif node.type == "hook":
+        return __checkCondition(node[0]) is not None
+    elif node.type == "switch":
+        return node.discriminant.type in ("string", "number")
+        
+    return False
+
+
+
 #
 # Implementation
 #
@@ -3,6 +3,11 @@
 # Copyright 2010-2011 Sebastian Werner
 #
 
+from jasy.parser.Traversal import Visitor, walk
+
+__all__ = ["MetaData", "MetaDataVisitor"]
+
+
 class MetaData:
     """ 
     Data structure to hold all dependency information 
@@ -13,41 +18,47 @@ class MetaData:
     
     __slots__ = ["name", "requires", "optionals", "breaks", "assets"]
     
-    def __init__(self, tree):
+    def __init__(self, tree=None):
         self.name = None
         self.requires = set()
         self.optionals = set()
         self.breaks = set()
         self.assets = set()
         
-        self.__inspect(tree)
-        
+        if tree is not None:
+            walk(tree, MetaDataVisitor(self))
+
+
+    def inspectComments(self, comments):
+        """ Merges the tags of the given list of comments into the data structure """
         
-    def __inspect(self, node):
-        """ The internal inspection routine """
-    
-        # Parse comments
-        try:
-            comments = node.comments
-        except AttributeError:
-            comments = None
+        for comment in comments:
+            commentTags = comment.getTags()
+            if commentTags:
+
+                if "name" in commentTags:
+                    self.name = commentTags["name"]
+                if "require" in commentTags:
+                    self.requires.update(set(commentTags["require"]))
+                if "optional" in commentTags:
+                    self.optionals.update(set(commentTags["optional"]))
+                if "break" in commentTags:
+                    self.breaks.update(set(commentTags["break"]))
+                if "asset" in commentTags:
+                    self.assets.update(set(commentTags["asset"]))
+
+
+
+class MetaDataVisitor(Visitor):
+    """ Merges the tags of all comments in the visited tree into the given MetaData instance """
     
+    def __init__(self, meta):
+        Visitor.__init__(self)
+        self.meta = meta
+        self.onEnter(None, self.__enter)
+        
+        
+    def __enter(self, node):
+        comments = getattr(node, "comments", None)
         if comments:
-            for comment in comments:
-                commentTags = comment.getTags()
-                if commentTags:
-
-                    if "name" in commentTags:
-                        self.name = commentTags["name"]
-                    if "require" in commentTags:
-                        self.requires.update(set(commentTags["require"]))
-                    if "optional" in commentTags:
-                        self.optionals.update(set(commentTags["optional"]))
-                    if "break" in commentTags:
-                        self.breaks.update(set(commentTags["break"]))
-                    if "asset" in commentTags:
-                        self.assets.update(set(commentTags["asset"]))
-
-        # Process children
-        for child in node:
-            self.__inspect(child)
+            self.meta.inspectComments(comments)
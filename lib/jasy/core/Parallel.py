@@ -0,0 +1,63 @@
+#
+# Jasy - JavaScript Tooling Framework
+# Copyright 2010-2011 Sebastian Werner
+#
+
+import logging, multiprocessing
+from jasy.core.Cache import Cache
+
+__all__ = ["execute"]
+
+# Task and items of the current execute() call, inherited by the forked workers
+__task = None
+__items = None
+
+
+def execute(task, items, processes=None):
+    """
+    Calls the task with each of the given items in a pool of forked processes (defaults to
+    the number of CPUs) and returns the results in the order of the items. The workers
+    inherit the state of the calling process, so the task may be any function (only the
+    results are transferred back) but changes to that state are lost. Caches are reopened
+    read-only in the workers, so values stored there are lost as well. Exceptions raised by
+    the task are raised again by execute(). Without support for forking processes (or with
+    one process) the items are processed sequentially.
+    """
+
+    global __task, __items
+
+    items = list(items)
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    processes = min(processes, len(items))
+
+    try:
+        context = multiprocessing.get_context("fork")
+    except ValueError:
+        context = None
+
+    if context is None or processes <= 1:
+        return [task(item) for item in items]
+
+    logging.info("Processing %s items in %s processes..." % (len(items), processes))
+
+    __task = task
+    __items = items
+
+    try:
+        with context.Pool(processes, __initWorker) as pool:
+            return pool.map(__runTask, range(len(items)), 1)
+
+    finally:
+        __task = None
+        __items = None
+
+
+def __initWorker():
+    # Cache files are kept by the parent process, the workers use their own read-only handles
+    Cache.setReadOnly()
+
+
+def __runTask(position):
+    return __task(__items[position])
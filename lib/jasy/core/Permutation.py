@@ -6,8 +6,10 @@
 import logging, binascii, zlib, json
 from jasy.tokenizer.Tokenizer import Tokenizer
 from jasy.parser.Parser import parseExpression
+from jasy.parser.Traversal import Visitor, walk
+from jasy.core.DeadCode import isFoldable
 
-__all__ = ["Permutation", "getKeys"]
+__all__ = ["Permutation", "KeysVisitor", "getKeys", "getPatchStatements"]
 
 
 # jasy.Env.isSet(key, expected?)
@@ -16,7 +18,7 @@ __all__ = ["Permutation", "getKeys"]
 __dotcalls = ("jasy.Env.isSet", "jasy.Env.getValue", "jasy.Env.select")
 
 # hasjs specific: has(key)
-__globalcalls = ("has")
+__globalcalls = ("has",)
 
 def testNode(node):
     # Assemble dot operators
@@ -43,23 +45,72 @@ def assembleDot(node, result=None):
     return ".".join(result)
 
 
-def getKeys(node, keys=None):
-    if keys is None:
-        keys = set()
+class KeysVisitor(Visitor):
+    """ Collects the permutation keys which are checked in the visited tree """
+
+    def __init__(self, keys=None):
+        Visitor.__init__(self)
+        self.keys = set() if keys is None else keys
+        self.onEnter(("dot", "call"), self.__enter)
+
 
-    result = testNode(node)
-    if result:
+    def __enter(self, node):
+        result = testNode(node)
         if result == "dotcall":
-            keys.add(node.parent[1][0].value)
+            self.keys.add(node.parent[1][0].value)
         elif result == "globalcall":
-            keys.add(node[1][0].value)
+            self.keys.add(node[1][0].value)
+
+
+def getKeys(node, keys=None):
+    return walk(node, KeysVisitor(keys))[0].keys
+
+
+def getPatchStatements(node, result=None, statement=None):
+    """ 
+    Returns the statements which might be modified by Permutation.patch() followed by 
+    a DeadCode cleanup(). These are the statements containing permutation checks or 
+    code which could be removed as dead code (as cleanup() replaces if/hook/switch 
+    nodes in their parent the whole statement is returned).
+    """
     
-    # Process children
-    for child in reversed(node):
+    if result is None:
+        nodeIndex = node.getIndex()
+        if nodeIndex is not None and nodeIndex.root is node:
+            return __getIndexedPatchStatements(nodeIndex)
+            
+        result = []
+        
+    if statement is not None and (testNode(node) or isFoldable(node)):
+        result.append(statement)
+        return result
+        
+    for child in node:
         if child != None:
-            getKeys(child, keys)
+            getPatchStatements(child, result, child if node.type in ("script", "block") else statement)
+            
+    return result
+
+
+def __getIndexedPatchStatements(nodeIndex):
+    """ Implementation of getPatchStatements() for indexed trees: climbs up from the candidates """
     
-    return keys
+    root = nodeIndex.root
+    getParent = nodeIndex.getParent
+    statements = {}
+    
+    for nodeType in ("dot", "call", "if", "hook", "switch"):
+        for node in nodeIndex.get(nodeType):
+            if node is not root and (testNode(node) or isFoldable(node)):
+                statement = node
+                parent = getParent(statement)
+                while not parent.type in ("script", "block"):
+                    statement = parent
+                    parent = getParent(statement)
+                    
+                statements[id(statement)] = statement
+                
+    return list(statements.values())
 
 
 PermutationCache = {}
@@ -82,6 +133,7 @@ class Permutation:
         
         self.__combination = combination
         self.__fields = fields
+        self.__templates = {}
         self.__key = self.__buildKey(combination)
         
         # Convert to same value as in JavaScript
@@ -193,6 +245,37 @@ class Permutation:
     
     def patch(self, node):
         """ Replaces all occourences with incoming values """
+        
+        nodeIndex = node.getIndex()
+        if nodeIndex is None or nodeIndex.root is not node:
+            return self.__patchTree(node)
+            
+        # Checks are only in dot and call nodes, nodes which have been removed 
+        # by patching another check are ignored
+        modified = False
+        for candidate in nodeIndex.get("dot") + nodeIndex.get("call"):
+            if nodeIndex.contains(candidate) and self.__patchNode(candidate):
+                modified = True
+                
+        return modified
+        
+        
+    def __patchTree(self, node):
+        """ Patches the given node and all its descendants """
+        
+        modified = self.__patchNode(node)
+        
+        # Process children
+        for child in reversed(node):
+            if child != None:
+                if self.__patchTree(child):
+                    modified = True
+
+        return modified
+        
+        
+    def __patchNode(self, node):
+        """ Replaces the check in the given node (if any) """
 
         modified = False
         result = testNode(node)
@@ -206,7 +289,7 @@ class Permutation:
                 params = callNode[1]
                 replacement = self.getJSValue(params[0].value)
                 if replacement:
-                    replacementNode = parseExpression(replacement)
+                    replacementNode = self.__getTemplate(replacement).clone()
                     callNode.parent.replace(callNode, replacementNode)
                     modified = True            
             
@@ -220,7 +303,7 @@ class Permutation:
                 
                 if replacement != None:
                     # Auto-fill second parameter with boolean "true"
-                    expected = params[1] if len(params) > 1 else parseExpression("true")
+                    expected = params[1] if len(params) > 1 else self.__getTemplate("true")
                     
                     # Prepare check
                     field = self.__fields[name]
@@ -228,12 +311,12 @@ class Permutation:
                         
                     # Special handling for boolean values
                     if check == "Boolean":
-                        replacementResult = expected.type == parseExpression(replacement).type
+                        replacementResult = expected.type == self.__getTemplate(replacement).type
                     else:
-                        replacementResult = parseExpression(replacement).value in str(expected.value).split("|")
+                        replacementResult = self.__getTemplate(replacement).value in str(expected.value).split("|")
 
                     # Do actual replacement
-                    replacementNode = parseExpression("true" if replacementResult else "false")
+                    replacementNode = self.__getTemplate("true" if replacementResult else "false").clone()
                     callNode.parent.replace(callNode, replacementNode)
                     modified = True
             
@@ -243,7 +326,7 @@ class Permutation:
                 params = callNode[1]
                 replacement = self.getJSValue(params[0].value)
                 if replacement:
-                    parsedReplacement = parseExpression(replacement)
+                    parsedReplacement = self.__getTemplate(replacement)
                     if parsedReplacement.type != "string":
                         raise Exception("jasy.Env.select requires that the given replacement is of type string.")
 
@@ -274,14 +357,21 @@ class Permutation:
 
                 # Only boolean replacements allowed
                 if replacement in ("true", "false"):
-                    replacementNode = parseExpression(replacement)
+                    replacementNode = self.__getTemplate(replacement).clone()
                     node.parent.replace(node, replacementNode)
 
-
-        # Process children
-        for child in reversed(node):
-            if child != None:
-                if self.patch(child):
-                    modified = True
-
-        return modified  
\ No newline at end of file
+        return modified
+        
+        
+    def __getTemplate(self, code):
+        """ 
+        Returns the parsed node of the given code (a value of the permutation or a boolean). Every 
+        code is parsed once per permutation, the nodes are templates which must be cloned before
+        they are inserted into a tree.
+        """
+        
+        try:
+            return self.__templates[code]
+        except KeyError:
+            template = self.__templates[code] = parseExpression(code)
+            return template
@@ -0,0 +1,128 @@
+#
+# Jasy - JavaScript Tooling Framework
+# Copyright 2010-2011 Sebastian Werner
+#
+
+from jasy.tokenizer.Tokenizer import Tokenizer, ParseError
+from jasy.parser.Traversal import walk
+from jasy.core.MetaData import MetaData, MetaDataVisitor
+from jasy.core.Permutation import KeysVisitor
+from jasy.core.Translation import TextVisitor, methods
+
+__all__ = ["PreScan", "prescan"]
+
+
+# Token types after which a slash is a division and not the start of a
+# regular expression. This replaces the context knowledge of the parser.
+__operandEnds = frozenset([
+    "identifier", "number", "string", "regexp",
+    "right_paren", "right_bracket",
+    "this", "null", "true", "false",
+    "increment", "decrement"
+])
+
+# Statements with a parenthesized head. A slash after the closing paren starts a regular
+# expression (e.g. "if (x) /re/.test(s)"), which the scanner does not know, see prescan().
+__conditions = frozenset(["if", "while", "for", "with"])
+
+# jasy.Env.isSet(key, expected?), jasy.Env.getValue(key), jasy.Env.select(key, map)
+__envMethods = ("isSet", "getValue", "select")
+
+
+class PreScan:
+    """
+    Class facts which are available without building a tree: the permutation
+    keys, whether translation methods are used and the meta data from the
+    documentation comments.
+
+    Hint: Must be a clean data class without links to other
+    systems for optiomal cachability using Pickle
+    """
+
+    __slots__ = ["keys", "translation", "meta"]
+
+    def __init__(self, tree=None):
+        self.keys = set()
+        self.translation = False
+        self.meta = MetaData()
+
+        if tree is not None:
+            keys, text, meta = walk(tree, KeysVisitor(self.keys), TextVisitor(), MetaDataVisitor(self.meta))
+            self.translation = text.found
+
+
+
+def prescan(source, fileId=None):
+    """
+    Scans the given source in one linear pass over the token stream and
+    returns a PreScan instance. Raises ParseError on invalid input and on
+    input the scanner cannot tokenize reliably without parsing (callers then
+    fall back to the tree, see PreScan).
+    """
+
+    tokenizer = Tokenizer(source, fileId, 0, "regex")
+    get = tokenizer.get
+
+    types = []
+    values = []
+    operandEnds = __operandEnds
+
+    # Types of the tokens in front of the currently open parens
+    parens = []
+    condition = False
+
+    tokenType = None
+    try:
+        while tokenType != "end":
+            tokenType = get(not tokenType in operandEnds)
+
+            # Division or regular expression, depending on the statement structure
+            if condition and (tokenType == "div" or (tokenType == "assign" and tokenizer.token.assignOp == "div")):
+                raise ParseError("Unclear division after condition", fileId, tokenizer.line)
+
+            condition = False
+            if tokenType == "left_paren":
+                parens.append(types[-1] if types else None)
+            elif tokenType == "right_paren" and parens:
+                condition = parens.pop() in __conditions
+
+            types.append(tokenType)
+            values.append(tokenizer.token.value)
+
+    except ParseError:
+        raise
+
+    # The tokenizer might fail in other ways on wrongly detected divisions
+    except Exception as error:
+        raise ParseError("Could not tokenize: %s" % error, fileId, tokenizer.line)
+
+    result = PreScan()
+    keys = result.keys
+
+    for pos in range(1, len(types)):
+        if types[pos] != "left_paren" or types[pos-1] != "identifier":
+            continue
+
+        # Walk back the chain of identifiers and dots in front of the paren
+        start = pos - 1
+        while start > 1 and types[start-1] == "dot" and types[start-2] == "identifier":
+            start -= 2
+
+        before = types[start-1] if start > 0 else None
+        if before == "function" or before == "new":
+            continue
+
+        name = values[pos-1]
+        if name in methods:
+            result.translation = True
+
+        # Permutation keys can only be detected on string literals
+        if before == "dot" or types[pos+1] != "string" or not types[pos+2] in ("comma", "right_paren"):
+            continue
+
+        chain = values[start:pos:2]
+        if chain == ["has"] or (len(chain) == 3 and chain[0] == "jasy" and chain[1] == "Env" and chain[2] in __envMethods):
+            keys.add(values[pos+1])
+
+    result.meta.inspectComments(tokenizer.comments)
+    return result
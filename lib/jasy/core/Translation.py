@@ -5,34 +5,67 @@
 
 import logging, re, copy, json
 from jasy.parser.Node import Node
+from jasy.parser.Traversal import Visitor, walk
 from jasy.ext import polib
 
-__all__ = ["TranslationError", "Translation", "hasText"]
+__all__ = ["TranslationError", "Translation", "TextVisitor", "hasText", "getTextCalls"]
 
 
 methods = ("tr", "trc", "trn")
 
 
-def hasText(node):
-    if node.type == "call":
-        funcName = None
+def getMethodName(node):
+    """ Returns the name of the translation method called by the given call node (or None) """
+    
+    if node[0].type == "identifier":
+        funcName = node[0].value
+    elif node[0].type == "dot" and node[0][1].type == "identifier":
+        funcName = node[0][1].value
+    else:
+        return None
+        
+    return funcName if funcName in methods else None
+
+
+class TextVisitor(Visitor):
+    """ Detects whether translation methods are called in the visited tree """
+    
+    def __init__(self):
+        Visitor.__init__(self)
+        self.found = False
+        self.onEnter(("call",), self.__enter)
+        
         
-        if node[0].type == "identifier":
-            funcName = node[0].value
-        elif node[0].type == "dot" and node[0][1].type == "identifier":
-            funcName = node[0][1].value
+    def __enter(self, node):
+        if not self.found and getMethodName(node):
+            self.found = True
+
+
+def hasText(node):
+    return walk(node, TextVisitor())[0].found
+
+
+def getTextCalls(node, result=None):
+    """ Returns all (outermost) calls of translation methods """
+    
+    if result is None:
+        # Indexed trees return all calls, including the ones nested in other calls
+        nodeIndex = node.getIndex()
+        if nodeIndex is not None and nodeIndex.root is node:
+            return [call for call in nodeIndex.get("call") if getMethodName(call)]
+            
+        result = []
         
-        if funcName in methods:
-            return True
+    if node.type == "call" and getMethodName(node):
+        result.append(node)
+        return result
             
     # Process children
     for child in node:
         if child != None:
-            ret = hasText(child)
-            if ret:
-                return True
+            getTextCalls(child, result)
     
-    return False
+    return result
 
 
 class TranslationError(Exception):
@@ -73,7 +106,18 @@ class Translation:
         return "this.$$translation=%s;" % json.dumps(self.__generate({}), separators=(',',':'), ensure_ascii=False)
 
     def patch(self, node):
-        self.__recurser(node)
+        nodeIndex = node.getIndex()
+        if nodeIndex is not None and nodeIndex.root is node:
+            # Patch the calls from outside to inside (like the recursion does), calls
+            # which have been removed by patching an outer call are ignored
+            calls = [call for call in nodeIndex.get("call") if getMethodName(call)]
+            calls.sort(key=lambda call: call.start or 0)
+            for call in calls:
+                if nodeIndex.contains(call):
+                    self.__patchCall(call, getMethodName(call))
+                    
+        else:
+            self.__recurser(node)
         
     def load(self, pofile):
         pass
@@ -162,86 +206,83 @@ class Translation:
     
     def __recurser(self, node):
         if node.type == "call":
-            funcName = None
-            
-            if node[0].type == "identifier":
-                funcName = node[0].value
-            elif node[0].type == "dot" and node[0][1].type == "identifier":
-                funcName = node[0][1].value
-            
-            if funcName in methods:
-                params = node[1]
-                table = self.__table
-
-                # Verify param types
-                if params[0].type != "string":
-                    logging.warn("Expecting translation string to be type string: %s at line %s" % (params[0].type, params[0].line))
-                    
-                if (funcName == "trn" or funcName == "trc") and params[1].type != "string":
-                    logging.warn("Expecting translation string to be type string: %s at line %s" % (params[1].type, params[1].line))
-
-
-                # Signature tr(msg, arg1, arg2, ...)
-                if funcName == "tr":
-                    key = params[0].value
-                    if key in table:
-                        params[0].value = table[key]
-                        
-                    if len(params) == 1:
-                        node.parent.replace(node, params[0])
-                    else:
-                        self.__splitTemplate(node, params[0], params[1:])
-                        
-                        
-                # Signature trc(hint, msg, arg1, arg2, ...)
-                elif funcName == "trc":
-                    key = params[0].value
-                    if key in table:
-                        params[1].value = table[key]
-
-                    if len(params) == 2:
-                        node.parent.replace(node, params[1])
-                    else:
-                        self.__splitTemplate(node, params[1], params[2:])
-                        
-                        
-                # Signature trn(msg, msg2, [...], int, arg1, arg2, ...)
-                elif funcName == "trn":
-                    keySingular = params[0].value
-                    if keySingular in table:
-                        params[0].value = table[keySingular]
-
-                    keyPlural = params[1].value
-                    if keyPlural in table:
-                        params[1].value = table[keyPlural]
-                        
-                    # TODO: Multi plural support
-                    
-                    # Patch strings with dynamic values
-                    if len(params) >= 3:
-                        self.__splitTemplate(params[0], params[0], params[3:])
-                        self.__splitTemplate(params[1], params[1], params[3:])
-                    
-                    
-                    # Replace the whole call with: int < 2 ? singularMessage : pluralMessage
-                    hook = Node(None, "hook")
-                    hook.parenthesized = True
-                    condition = Node(None, "le")
-                    condition.append(params[2])
-                    number = Node(None, "number")
-                    number.value = 1
-                    condition.append(number)
-                    
-                    hook.append(condition, "condition")
-                    hook.append(params[1], "elsePart")
-                    hook.append(params[0], "thenPart")
-                    
-                    node.parent.replace(node, hook)
-
-
+            funcName = getMethodName(node)
+            if funcName:
+                self.__patchCall(node, funcName)
 
         # Process children
         for child in node:
             if child != None:
                 self.__recurser(child)
-                
\ No newline at end of file
+                
+                
+    def __patchCall(self, node, funcName):
+        """ Replaces the given call of a translation method """
+        
+        params = node[1]
+        table = self.__table
+
+        # Verify param types
+        if params[0].type != "string":
+            logging.warn("Expecting translation string to be type string: %s at line %s" % (params[0].type, params[0].line))
+            
+        if (funcName == "trn" or funcName == "trc") and params[1].type != "string":
+            logging.warn("Expecting translation string to be type string: %s at line %s" % (params[1].type, params[1].line))
+
+
+        # Signature tr(msg, arg1, arg2, ...)
+        if funcName == "tr":
+            key = params[0].value
+            if key in table:
+                params[0].value = table[key]
+                
+            if len(params) == 1:
+                node.parent.replace(node, params[0])
+            else:
+                self.__splitTemplate(node, params[0], params[1:])
+                
+                
+        # Signature trc(hint, msg, arg1, arg2, ...)
+        elif funcName == "trc":
+            key = params[0].value
+            if key in table:
+                params[1].value = table[key]
+
+            if len(params) == 2:
+                node.parent.replace(node, params[1])
+            else:
+                self.__splitTemplate(node, params[1], params[2:])
+                
+                
+        # Signature trn(msg, msg2, [...], int, arg1, arg2, ...)
+        elif funcName == "trn":
+            keySingular = params[0].value
+            if keySingular in table:
+                params[0].value = table[keySingular]
+
+            keyPlural = params[1].value
+            if keyPlural in table:
+                params[1].value = table[keyPlural]
+                
+            # TODO: Multi plural support
+            
+            # Patch strings with dynamic values
+            if len(params) >= 3:
+                self.__splitTemplate(params[0], params[0], params[3:])
+                self.__splitTemplate(params[1], params[1], params[3:])
+            
+            
+            # Replace the whole call with: int < 2 ? singularMessage : pluralMessage
+            hook = Node(None, "hook")
+            hook.parenthesized = True
+            condition = Node(None, "le")
+            condition.append(params[2])
+            number = Node(None, "number")
+            number.value = 1
+            condition.append(number)
+            
+            hook.append(condition, "condition")
+            hook.append(params[1], "elsePart")
+            hook.append(params[0], "thenPart")
+            
+            node.parent.replace(node, hook)
@@ -11,12 +11,21 @@ import logging
 __all__ = ["optimize"]
 
 def optimize(node):
-    # Process from inside to outside
-    for child in list(node):
-        # None children are allowed sometimes e.g. during array_init like [1,2,,,7,8]
-        if child != None:
-            optimize(child)
-    
+    # Process from inside to outside (using a stack instead of recursion to support deeply nested trees)
+    todo = [(node, False)]
+    while todo:
+        node, processed = todo.pop()
+        if processed:
+            reduceNode(node)
+        else:
+            todo.append((node, True))
+            
+            # None children are allowed sometimes e.g. during array_init like [1,2,,,7,8]
+            todo.extend([(child, False) for child in reversed(list(node)) if child != None])
+
+
+def reduceNode(node):
+    """ Reduces the given node. Its children are already processed. """
     
     # Cleans up empty semicolon statements (or pseudo-empty)
     if node.type == "semicolon" and node.parent.type in ("block", "script"):
@@ -56,7 +65,8 @@ def optimize(node):
             else:
                 result = None
             
-            if result is not None and len(str(result)) < len(compress(node)):
+            # Only the literals need to be compressed, the size of the expression follows from them
+            if result is not None and len(str(result)) < len(compress(firstNumber)) + 1 + len(compress(secondNumber)) + (2 if node.parenthesized else 0):
                 firstNumber.value = result
                 node.parent.replace(node, firstNumber)
 
@@ -73,7 +83,7 @@ def optimize(node):
         if node.parent.type in ("try", "catch", "finally"):
             pass
         elif len(node) == 0:
-            repl =Node(node.tokenizer, "semicolon")
+            repl =Node(node, "semicolon")
             node.parent.replace(node, repl)
             node = repl
         elif len(node) == 1:
@@ -340,14 +350,14 @@ def combineToCommaExpression(node):
         if child.type != "semicolon":
             return node
     
-    comma = Node(node.tokenizer, "comma")
+    comma = Node(node, "comma")
     
     for child in list(node):
         # Ignore empty semicolons
         if hasattr(child, "expression"):
             comma.append(child.expression)
             
-    semicolon = Node(node.tokenizer, "semicolon")
+    semicolon = Node(node, "semicolon")
     semicolon.append(comma, "expression")
     
     parent = node.parent
@@ -377,10 +387,10 @@ def compactIf(node, thenPart, condition):
     else:
         # Has expression => Translate IF using a AND or OR operator
         if condition.type == "not":
-            replacement = Node(thenPart.tokenizer, "or")
+            replacement = Node(thenPart, "or")
             condition = condition[0]
         else:
-            replacement = Node(thenPart.tokenizer, "and")
+            replacement = Node(thenPart, "and")
 
         replacement.append(condition)
         replacement.append(thenExpression)
@@ -396,17 +406,15 @@ def compactIf(node, thenPart, condition):
 def containsIfElse(node):
     """ Checks whether the given node contains another if-else-statement """
     
-    if node.type == "if" and hasattr(node, "elsePart"):
-        return True
+    todo = [node]
+    while todo:
+        node = todo.pop()
+        if node.type == "if" and hasattr(node, "elsePart"):
+            return True
 
-    for child in node:
         # Blocks reset this if-else problem so we ignore them 
         # (and their content) for our scan.
-        if child.type == "block":
-            pass
-        
-        elif containsIfElse(child):
-            return True
+        todo.extend([child for child in node if child.type != "block"])
 
     return False
     
@@ -414,17 +422,15 @@ def containsIfElse(node):
 def containsIf(node):
     """ Checks whether the given node contains another if-statement """
     
-    if node.type == "if":
-        return True
+    todo = [node]
+    while todo:
+        node = todo.pop()
+        if node.type == "if":
+            return True
 
-    for child in node:
         # Blocks reset this if-else problem so we ignore them 
         # (and their content) for our scan.
-        if child.type == "block":
-            pass
-
-        elif containsIf(child):
-            return True
+        todo.extend([child for child in node if child.type != "block"])
 
     return False    
 
@@ -438,7 +444,7 @@ def combineAssignments(condition, thenExpression, elseExpression):
     if thenExpression.type == "assign" and elseExpression.type == "assign":
         operator = getattr(thenExpression, "assignOp", None)
         if operator == getattr(elseExpression, "assignOp", None):
-            if compress(thenExpression[0]) == compress(elseExpression[0]):
+            if isSameExpression(thenExpression[0], elseExpression[0]):
                 hook = createHook(condition, thenExpression[1], elseExpression[1])
                 fixParens(condition)
                 fixParens(hook.thenPart)
@@ -447,11 +453,37 @@ def combineAssignments(condition, thenExpression, elseExpression):
                 return thenExpression.parent
 
 
+def isSameExpression(first, second):
+    """ 
+    Whether the given expressions are structurally equal (and so produce the same code). 
+    Stops at the first difference instead of compressing both expressions.
+    """
+    
+    todo = [(first, second)]
+    while todo:
+        first, second = todo.pop()
+        if first is None or second is None:
+            if first is not second:
+                return False
+            continue
+        
+        if first.type != second.type or len(first) != len(second) or first.parenthesized != second.parenthesized:
+            return False
+        
+        for name in ("value", "assignOp", "postfix"):
+            if getattr(first, name, None) != getattr(second, name, None):
+                return False
+        
+        todo.extend(zip(first, second))
+        
+    return True
+
+
 def combineExpressions(condition, thenExpression, elseExpression):
     """ Combines then and else expression using a hook statement. """
     
     hook = createHook(condition, thenExpression, elseExpression)
-    semicolon = Node(condition.tokenizer, "semicolon")
+    semicolon = Node(condition, "semicolon")
     semicolon.append(hook, "expression")
     
     fixParens(condition)
@@ -464,7 +496,7 @@ def combineExpressions(condition, thenExpression, elseExpression):
 def createReturn(value):
     """ Creates a return statement with the given value """
     
-    ret = Node(value.tokenizer, "return")
+    ret = Node(value, "return")
     ret.append(value, "value")
     return ret
 
@@ -472,7 +504,7 @@ def createReturn(value):
 def createHook(condition, thenPart, elsePart):
     """ Creates a hook expression with the given then/else parts """
     
-    hook = Node(condition.tokenizer, "hook")
+    hook = Node(condition, "hook")
     hook.append(condition, "condition")
     hook.append(thenPart, "thenPart")
     hook.append(elsePart, "elsePart")
@@ -15,21 +15,23 @@ __all__ = ["optimize"]
 #
 
 def optimize(node):
-    # stabilize list during processing modifyable stuff
-    copy = node
-    if node.type in ("script", "block"):
-        copy = list(node)
-    
-    for child in copy:
-        # None children are allowed sometimes e.g. during array_init like [1,2,,,7,8]
-        if child != None:
-            optimize(child)
+    # Process from inside to outside (using a stack instead of recursion to support deeply nested trees)
+    todo = [(node, False)]
+    while todo:
+        node, processed = todo.pop()
+        if not processed:
+            todo.append((node, True))
+            
+            # stabilize list during processing modifyable stuff
+            # None children are allowed sometimes e.g. during array_init like [1,2,,,7,8]
+            todo.extend([(child, False) for child in reversed(list(node)) if child != None])
+            continue
         
-    if node.type in ("script", "block"):
-        __combineSiblings(node)
+        if node.type in ("script", "block"):
+            __combineSiblings(node)
         
-    if node.type == "script":
-        __combineVarStatements(node)
+        if node.type == "script":
+            __combineVarStatements(node)
 
 
 
@@ -108,17 +110,15 @@ def __combineVarStatements(node):
 def __findFirstVarStatement(node):
     """Returns the first var statement of the given node. Ignores inner functions."""
     
-    # Ignore variable blocks which are used as an iterator in for-in loops
-    if node.type == "var" and getattr(node, "rel", None) != "iterator":
-        return node
-        
-    for child in node:
-        if child.type == "function":
-            continue
+    todo = [node]
+    while todo:
+        node = todo.pop()
         
-        result = __findFirstVarStatement(child)
-        if result:
-            return result
+        # Ignore variable blocks which are used as an iterator in for-in loops
+        if node.type == "var" and getattr(node, "rel", None) != "iterator":
+            return node
+            
+        todo.extend([child for child in reversed(node) if child != None and child.type != "function"])
     
     return None
         
@@ -185,28 +185,30 @@ def __createIdentifier(value):
 
 
 def __patchVarStatements(node, firstVarStatement):
-    """Patches all variable statements in the given node (works recursively) and replace them with assignments."""
-    if node is firstVarStatement:
-        return
-        
-    elif node.type == "function":
-        # Don't process inner functions/scopes
-        return
-        
-    elif node.type == "var":
-        __rebuildAsAssignment(node, firstVarStatement)
-        
-    else:
-        # Recursion into children
-        # Create a cast to list() to keep loop stable during modification
-        for child in list(node):
-            __patchVarStatements(child, firstVarStatement)
+    """Patches all variable statements in the given node (including nested ones) and replace them with assignments."""
+    todo = [node]
+    while todo:
+        node = todo.pop()
+        if node is firstVarStatement:
+            continue
+            
+        elif node.type == "function":
+            # Don't process inner functions/scopes
+            continue
+            
+        elif node.type == "var":
+            __rebuildAsAssignment(node, firstVarStatement)
+            
+        else:
+            # Process children from left to right
+            # Create a cast to list() to keep loop stable during modification
+            todo.extend([child for child in reversed(list(node)) if child != None])
             
             
 def __rebuildAsAssignment(node, firstVarStatement):
     """Rebuilds the items of a var statement into a assignment list and moves declarations to the given var statement"""
-    assignment = Node(node.tokenizer, "semicolon")
-    assignmentList = Node(node.tokenizer, "comma")
+    assignment = Node(node, "semicolon")
+    assignmentList = Node(node, "comma")
     assignment.append(assignmentList, "expression")
 
     # Casting to list() creates a copy during the process (keeps loop stable)
@@ -222,7 +224,8 @@ def __rebuildAsAssignment(node, firstVarStatement):
         else:
             # JS 1.7 Destructing Expression
             for identifier in child.names:
-                firstVarStatement.append(__createDeclaration(identifier.value))
+                declaration = __createDeclaration(identifier.value)
+                firstVarStatement.append(declaration)
 
             if hasattr(child, "initializer"):
                 assign = __createMultiAssignment(child.names, child.initializer)
@@ -240,7 +243,8 @@ def __rebuildAsAssignment(node, firstVarStatement):
     # for these kind of statements.
     elif getattr(node, "rel", None) == "iterator":
         if hasattr(child, "name"):
-            node.parent.replace(node, __createIdentifier(child.name))
+            identifier = __createIdentifier(child.name)
+            node.parent.replace(node, identifier)
         else:
             # JS 1.7 Destructing Expressions
             node.parent.replace(node, child.names)
@@ -4,6 +4,7 @@
 #
 
 import zlib, string
+from jasy.parser.Traversal import Visitor, walk
 
 __all__ = ["optimize"]
 
@@ -14,7 +15,9 @@ __all__ = ["optimize"]
 #
 
 def optimize(node):
-    __recurser(node)
+    visitor = Visitor()
+    visitor.onEnter(("identifier",), __crypt)
+    walk(node, visitor)
     
     
 
@@ -24,24 +27,18 @@ def optimize(node):
 
 __cache = {}
 
-def __recurser(node, modified=False):
-    if node.type == "identifier":
-        value = node.value
-        # Protect e.g. __proto__ from optimization
-        if type(value) == str and value.startswith("__") and not value.endswith("__"):
-            if value in __cache:
-                repl = __cache[value]
-            else:
-                repl = "__%s" % __encode(value)
-                __cache[value] = repl
-                
-            # Updating identifier
-            node.value = repl
-        
-    for child in node:
-        # None children are allowed sometimes e.g. during array_init like [1,2,,,7,8]
-        if child != None:
-            __recurser(child)
+def __crypt(node):
+    value = node.value
+    # Protect e.g. __proto__ from optimization
+    if type(value) == str and value.startswith("__") and not value.endswith("__"):
+        if value in __cache:
+            repl = __cache[value]
+        else:
+            repl = "__%s" % __encode(value)
+            __cache[value] = repl
+            
+        # Updating identifier
+        node.value = repl
     
     
     
@@ -3,16 +3,35 @@
 # Copyright 2010-2011 Sebastian Werner
 #
 
-from jasy.parser.Node import Node
+from jasy.process.Scopes import createScopes, getScope
 import logging
 
+__all__ = ["optimize"]
+
 
 #
 # Public API
 #
 
 def optimize(node):
-    return __optimize(node)
+    """ 
+    Removes unused params, variables and functions from all scopes of the given tree. Uses 
+    the scope table of the tree (see jasy.process.Scopes) which is created when missing.
+    """
+    
+    root = getScope(node)
+    if root is None:
+        root = createScopes(node)
+        
+    # Unused names are collected before modifying the tree, inner scopes are processed first
+    scopes = [(scope, scope.getUnused()) for scope in root.walk()]
+
+    optimized = False
+    for scope, unused in reversed(scopes):
+        if unused and __clean(scope, unused):
+            optimized = True
+
+    return optimized
 
 
 
@@ -20,25 +39,7 @@ def optimize(node):
 # Implementation
 #
 
-def __optimize(node):
-    """ The scanner part which looks for scopes with unused variables/params """
-    
-    optimized = False
-    
-    for child in list(node):
-        if child != None:
-            if __optimize(child):
-                optimized = True
-
-    if node.type == "script" and node.stats.unused:
-        if __clean(node, node.stats.unused):
-            optimized = True
-
-    return optimized
-            
-            
-            
-def __clean(node, unused):
+def __clean(scope, unused):
     """ 
     The cleanup part which always processes one scope and cleans up params and
     variable definitions which are unused
@@ -46,17 +47,9 @@ def __clean(node, unused):
     
     retval = False
     
-    # Process children
-    if node.type != "function":
-        for child in node:
-            # None children are allowed sometimes e.g. during array_init like [1,2,,,7,8]
-            if child != None:
-                if __clean(child, unused):
-                    retval = True
-                    
-
-    if node.type == "script" and hasattr(node, "parent"):
-        params = getattr(node.parent, "params", None)
+    function = getattr(scope.node, "parent", None)
+    if function is not None:
+        params = getattr(function, "params", None)
         if params:
             # start from back, as we can only remove params as long
             # as there is not a required one after us.
@@ -68,20 +61,28 @@ def __clean(node, unused):
                 else:
                     break
                     
+    # Variables are processed per "var" statement
+    statements = {}
+    
+    for name in unused:
+        binding = scope.bindings[name]
+        for node in binding.getDeclarations():
+            if node.type == "function":
+                if node.functionForm == "declared_form":
+                    if node.parent.type != "script" or hasattr(node.parent, "parent"):
+                        logging.debug("Remove unused function %s at line %s" % (node.name, node.line))
+                        node.parent.remove(node)
+                        retval = True
+                    
+                else:
+                    logging.debug("Clearing unused function name %s at line %s" % (node.name, node.line))
+                    del node.name
+                    del binding.declarations[id(node)]
                     
-    elif node.type == "function":
-        if hasattr(node, "name") and node.name in unused:
-            if node.functionForm == "declared_form":
-                if node.parent.type != "script" or hasattr(node.parent, "parent"):
-                    logging.debug("Remove unused function %s at line %s" % (node.name, node.line))
-                    node.parent.remove(node)
+            elif node.type == "declaration" and node.parent.type == "var":
+                statements[id(node.parent)] = node.parent
                 
-            else:
-                logging.debug("Clearing unused function name %s at line %s" % (node.name, node.line))
-                del node.name
-    
-    
-    elif node.type == "var":
+    for node in statements.values():
         for decl in reversed(node):
             if getattr(decl, "name", None) in unused:
                 if hasattr(decl, "initializer"):
@@ -103,5 +104,3 @@ def __clean(node, unused):
             node.parent.remove(node)
 
     return retval
-
-    
\ No newline at end of file
@@ -0,0 +1,88 @@
+#
+# Jasy - JavaScript Tooling Framework
+# Copyright 2010-2011 Sebastian Werner
+#
+
+from jasy.parser.Node import Node, getParentSlot
+from jasy.parser.VanillaBuilder import VanillaBuilder
+
+__all__ = ["LeanBuilder", "LeanNode"]
+
+
+class LeanNode(Node):
+    """
+    Node as created by the LeanBuilder. Only keeps the type, the line and the file ID
+    of the token it was created from, the source positions (start, end) are not tracked.
+    Appending children does not update these positions. Lean trees have no node index.
+    """
+
+    __slots__ = []
+
+    def __init__(self, tokenizer, type=None):
+        token = tokenizer.token
+        if token:
+            self.type = type or token.type
+            self.line = token.line
+        else:
+            self.type = type
+            self.line = tokenizer.line
+
+        self.fileId = tokenizer.fileId
+        self.start = None
+        self.end = None
+        self.relations = None
+
+
+    def append(self, kid, rel=None):
+        # kid can be null e.g. [1, , 2].
+        if kid:
+            try:
+                parent = getParentSlot(kid)
+            except AttributeError:
+                parent = None
+
+            if parent is not None:
+                parent.remove(kid)
+
+            kid.parent = self
+
+            if rel is not None:
+                if self.relations is None:
+                    self.relations = { rel : kid }
+                else:
+                    self.relations[rel] = kid
+
+                kid.rel = rel
+
+        # Block None kids when they should be related
+        elif rel:
+            return
+
+        list.append(self, kid)
+
+
+    def getIndex(self):
+        # Lean trees never have a node index
+        return None
+
+
+
+class LeanBuilder(VanillaBuilder):
+    """
+    AST builder for compression only runs (jscompress, release builds). Creates
+    LeanNode instances and does not attach comments to the nodes. The resulting
+    trees are processed by the compressor and the optimizers like the trees of the
+    VanillaBuilder, but miss the comments and the source positions (no getSource(),
+    no API data) and never have a node index.
+    """
+
+    def __init__(self):
+        VanillaBuilder.__init__(self, False)
+
+
+    def createNode(self, tokenizer, type=None):
+        return LeanNode(tokenizer, type)
+
+
+    def COMMENTS_add(self, currNode, prevNode, comments):
+        pass
@@ -11,11 +11,42 @@
 #
 
 import json
-import copy
+import copyreg
 
 nodeId = 0
 
+
+#
+# Node class
+#
+
+# Slots stored by the compact pickle format (see Node.__reduce_ex__())
+pickledSlots = ("type", "line", "start", "end", "fileId", "parent", "rel", "value", "relations")
+
+# Attribute values of these types are shared by Node.clone(), lists and sets are copied.
+# Attributes holding values of any other type (besides "stats") are not cloned.
+clonedTypes = frozenset((bool, int, float, str))
+
 class Node(list):
+    # Fixed fields for the metadata used by (nearly) all nodes. The source position is
+    # kept as a compact span (fileId, start, end, line). Children which are
+    # appended with a relation name (condition, thenPart, body, params, ...) are
+    # kept in the "relations" side table and are readable as attributes like before.
+    # All other attributes (name, readOnly, stats, comments, ...) go into the instance dictionary
+    # which is only created on demand. The node index which tracks the node (if any) is
+    # kept in "_owner" (see getIndex()).
+    __slots__ = ["type", "line", "start", "end", "fileId", "parent", "rel", "value", "relations", "_owner", "__dict__"]
+    
+    # Node index of the tree, only set on indexed root nodes (see getIndex())
+    _index = None
+    
+    # Source code of the tree, only set on root nodes and on copies (see getSource())
+    _source = None
+    
+    # Defaults of frequently checked flags (only set on the nodes where they apply)
+    parenthesized = False
+    postfix = False
+    
     def __init__(self, tokenizer=None, type=None, args=[]):
         # global nodeId 
         
@@ -23,13 +54,20 @@ class Node(list):
         
         self.start = 0
         self.end = 0
-        self.filename = None
+        self.relations = None
         
         # Debug
         # self.id = nodeId
         # nodeId += 1
 
-        if tokenizer:
+        if isinstance(tokenizer, Node):
+            # Use the same positioning as the given node e.g. for nodes created by optimizers
+            self.type = type
+            for name in ("fileId", "line", "start", "end"):
+                if hasattr(tokenizer, name):
+                    setattr(self, name, getattr(tokenizer, name))
+            
+        elif tokenizer:
             token = getattr(tokenizer, "token", None)
             if token:
                 # We may define a custom type but use the same positioning as another token
@@ -47,7 +85,7 @@ class Node(list):
                 self.start = None
                 self.end = None
 
-            self.tokenizer = tokenizer
+            self.fileId = tokenizer.fileId
             
         elif type:
             self.type = type
@@ -58,6 +96,80 @@ class Node(list):
             self.append(arg)
             
             
+    def __getattr__(self, name):
+        """ Fallback for attributes not found otherwise: the related children """
+        if name != "relations":
+            relations = self.relations
+            if relations and name in relations:
+                return relations[name]
+                
+        raise AttributeError("'Node' object has no attribute '%s'" % name)
+        
+        
+    def __reduce_ex__(self, protocol):
+        """ Compact pickle format: bit mask of the set slots, their values, the instance dictionary and the children """
+        mask = 0
+        bit = 1
+        state = [None]
+        for name in pickledSlots:
+            try:
+                state.append(object.__getattribute__(self, name))
+                mask |= bit
+            except AttributeError:
+                pass
+                
+            bit <<= 1
+            
+        state[0] = mask
+        
+        # The node index, the scope table and the source code are not stored (the copies of overlays 
+        # are tracked by object IDs, the source code is restored by the owner of the tree)
+        attrs = getattr(self, "__dict__", None) or None
+        if attrs and ("_index" in attrs or "_scope" in attrs or "_source" in attrs):
+            attrs = dict(attrs)
+            attrs.pop("_index", None)
+            attrs.pop("_scope", None)
+            attrs.pop("_source", None)
+            
+        state.append(attrs or None)
+        state.append(list(self))
+        
+        return (copyreg.__newobj__, (Node,), tuple(state))
+        
+        
+    def __setstate__(self, state):
+        mask = state[0]
+        pos = 1
+        bit = 1
+        for name in pickledSlots:
+            if mask & bit:
+                object.__setattr__(self, name, state[pos])
+                pos += 1
+                
+            bit <<= 1
+            
+        if state[pos]:
+            self.__dict__.update(state[pos])
+            
+        list.extend(self, state[pos+1])
+        
+        
+    def getAttributes(self):
+        """ Returns a list of (name, value) tuples of all attributes, related children included, sorted by name """
+        attrs = dict(getattr(self, "__dict__", {}))
+        for name in Node.__slots__:
+            if name != "relations" and name != "__dict__":
+                try:
+                    attrs[name] = object.__getattribute__(self, name)
+                except AttributeError:
+                    pass
+                    
+        if self.relations:
+            attrs.update(self.relations)
+            
+        return sorted(attrs.items())
+            
+            
     def getUnrelatedChildren(self):
         """Collects all unrelated children"""
         collection = []
@@ -78,41 +190,74 @@ class Node(list):
             
     
     def remove(self, kid):
+        self.__detach(kid)
+        
+        nodeIndex = self.getIndex()
+        if nodeIndex is not None:
+            nodeIndex.removeTree(kid)
+            
+            
+    def __detach(self, kid):
+        """ Removes the kid without notifying the node index (see remove()) """
         if not kid in self:
             raise Exception("Given node is no child!")
         
         if hasattr(kid, "rel"):
-            delattr(self, kid.rel)
+            del self.relations[kid.rel]
             del kid.rel
+            
+        # Detach the kid (related or not) so that it is not seen as part of the tree anymore
+        if hasattr(kid, "parent"):
             del kid.parent
             
         list.remove(self, kid)
         
         
+    def __attached(self, kid, previous):
+        """ Notifies the node indexes about the kid added to this node, moved from the given previous parent (if any) """
+        nodeIndex = self.getIndex()
+        if previous is not None:
+            previousIndex = previous.getIndex()
+            if previousIndex is nodeIndex:
+                if nodeIndex is not None:
+                    nodeIndex.moveTree(kid, previous)
+                return
+                
+            if previousIndex is not None:
+                previousIndex.removeTree(kid)
+                
+        if nodeIndex is not None:
+            nodeIndex.addTree(kid)
+        
+        
     def insert(self, index, kid):
         if index is None:
             return self.append(kid)
             
-        if hasattr(kid, "parent"):
-            kid.parent.remove(kid)
+        previous = getattr(kid, "parent", None)
+        if previous is not None:
+            previous.__detach(kid)
             
         kid.parent = self
-
-        return list.insert(self, index, kid)
+        list.insert(self, index, kid)
+        
+        self.__attached(kid, previous)
             
 
     # Always use push to add operands to an expression, to update start and end.
     def append(self, kid, rel=None):
         # kid can be null e.g. [1, , 2].
         if kid:
-            if hasattr(kid, "parent"):
-                kid.parent.remove(kid)
+            # Kids moved from another parent are detached first (the node index is notified about the move at the end)
+            previous = getattr(kid, "parent", None)
+            if previous is not None:
+                previous.__detach(kid)
             
             # Debug
             if not isinstance(kid, Node):
                 raise Exception("Invalid kid: %s" % kid)
             
-            if hasattr(kid, "tokenizer"):
+            if hasattr(kid, "fileId"):
                 if hasattr(kid, "start"):
                     if not hasattr(self, "start") or self.start == None or kid.start < self.start:
                         self.start = kid.start
@@ -125,26 +270,39 @@ class Node(list):
             
             # alias for function
             if rel != None:
-                setattr(self, rel, kid)
-                setattr(kid, "rel", rel)
+                if self.relations is None:
+                    self.relations = { rel : kid }
+                else:
+                    self.relations[rel] = kid
+                    
+                kid.rel = rel
 
         # Block None kids when they should be related
         if not kid and rel:
             return
             
-        return list.append(self, kid)
+        list.append(self, kid)
+        
+        if kid:
+            if previous is None:
+                nodeIndex = self.getIndex()
+                if nodeIndex is not None:
+                    nodeIndex.addTree(kid)
+            else:
+                self.__attached(kid, previous)
 
     
     # Replaces the given kid with the given replacement kid
     def replace(self, kid, repl):
+        previous = getattr(repl, "parent", None)
         if repl in self:
-            self.remove(repl)
+            self.__detach(repl)
         
         self[self.index(kid)] = repl
         
         if hasattr(kid, "rel"):
             repl.rel = kid.rel
-            setattr(self, kid.rel, repl)
+            self.relations[kid.rel] = repl
             
             # cleanup old kid
             delattr(kid, "rel")
@@ -154,11 +312,31 @@ class Node(list):
             # delete old relation on new child
             delattr(repl, "rel")
 
-        delattr(kid, "parent")
         repl.parent = self
         
+        # The replacement might have been moved from inside the kid, which is detached after
+        # the notification (so that the previous position is still known)
+        self.__attached(repl, previous)
+        
+        nodeIndex = self.getIndex()
+        if nodeIndex is not None:
+            nodeIndex.removeTree(kid)
+            
+        delattr(kid, "parent")
+        
         return kid
         
+        
+    def getIndex(self):
+        """ 
+        Returns the node index of the tree the node belongs to (None for trees without index). The index
+        is built on first lookup, until then only the root node knows it (nothing to update before).
+        """
+        try:
+            return getOwnerSlot(self)
+        except AttributeError:
+            return self._index
+        
 
     # Converts the node to XML
     def toXml(self, format=True, indent=0, tab="  "):
@@ -168,14 +346,16 @@ class Node(list):
 
         relatedChildren = []
         attrsCollection = []
-        for name in dir(self):
+        for name, value in self.getAttributes():
             # "type" is used as node name - no need to repeat it as an attribute
             # "parent" and "target" are relations to other nodes which are not children - for serialization we ignore them at the moment
             # "rel" is used internally to keep the relation to the parent - used by nodes which need to keep track of specific children
             # "start" and "end" are for debugging only
+            # "fileId" is only of interest on the root node, on all other nodes it is part of the position like "start" and "end"
             if name not in ("type", "parent", "comments", "target", "rel", "start", "end") and name[0] != "_":
-                value = getattr(self, name)
-                if isinstance(value, Node):
+                if name == "fileId" and hasattr(self, "parent"):
+                    continue
+                elif isinstance(value, Node):
                     if hasattr(value, "rel"):
                         relatedChildren.append(value)
 
@@ -198,7 +378,7 @@ class Node(list):
 
         attrs = (" " + " ".join(attrsCollection)) if len(attrsCollection) > 0 else ""
         
-        comments = getattr(self, "comments", None)
+        comments = [comment for comment in getattr(self, "comments", None) or () if comment.isValid()]
 
         if len(self) == 0 and len(relatedChildren) == 0 and (not comments or len(comments) == 0):
             result = "%s<%s%s/>%s" % (lead, self.type, attrs, lineBreak)
@@ -231,10 +411,11 @@ class Node(list):
     # Creates a python data structure containing all recursive data of the node
     def export(self):
         attrs = {}
-        for name in dir(self):
+        for name, value in self.getAttributes():
             if name not in ("parent", "target", "rel", "start", "end") and name[0] != "_":
-                value = getattr(self, name)
-                if isinstance(value, Node) and hasattr(value, "rel"):
+                if name == "fileId" and hasattr(self, "parent"):
+                    continue
+                elif isinstance(value, Node) and hasattr(value, "rel"):
                     attrs[name] = value.export()
                 elif type(value) in (bool, int, float, str, list):
                     attrs[name] = value
@@ -248,38 +429,191 @@ class Node(list):
         return attrs    
         
         
-    def __deepcopy__(self, memo):
-        # Create copy
-        if hasattr(self, "tokenizer"):
-            result = Node(self.tokenizer)
+    def clone(self):
+        """ 
+        Returns a copy of the node and all its children (iterative, without recursion).
+        Related children and "stats" are kept, "parent" (of the node itself) and "target" 
+        are not copied. Lists and sets are copied, other values are shared. The node index
+        is not copied. The copy keeps the source code of the tree (see getSource()).
+        """
+        
+        result = self.__cloneNode()
+        rel = getattr(self, "rel", None)
+        if rel is not None:
+            result.rel = rel
+            
+        source = self.__findSource()
+        if source is not None:
+            result._source = source
+        
+        todo = [(self, result)]
+        pop = todo.pop
+        push = todo.append
+        append = list.append
+        
+        while todo:
+            node, copied = pop()
+            relations = node.relations
+            if relations is not None:
+                related = dict([(id(relations[name]), name) for name in relations])
+                copied.relations = {}
+            
+            for child in node:
+                if child is None:
+                    append(copied, None)
+                    continue
+                    
+                childCopy = child.__cloneNode()
+                childCopy.parent = copied
+                
+                if relations is not None:
+                    rel = related.get(id(child))
+                    if rel is not None:
+                        childCopy.rel = rel
+                        copied.relations[rel] = childCopy
+                        
+                append(copied, childCopy)
+                
+                if len(child):
+                    push((child, childCopy))
+                    
+        return result
+        
+        
+    def createOverlay(self, nodes):
+        """
+        Returns a copy-on-write overlay of the tree. The given nodes are cloned (see clone()),
+        their ancestors are copied flat and all other subtrees are shared with this tree. Code
+        working on the overlay must only modify the cloned nodes (e.g. replace them in their
+        parents). Nodes inside other given nodes are ignored. Returns the tree itself when no 
+        nodes are given.
+        """
+        
+        if not nodes:
+            return self
+            
+        targets = set([id(node) for node in nodes])
+        nodeIndex = self._index
+        
+        # Parents of shared nodes might point into another tree (when creating overlays 
+        # of overlays). The index knows how to resolve them. Without an index the
+        # parents are collected by walking down from the root.
+        if nodeIndex is not None:
+            getParent = nodeIndex.getParent
+            found = []
+            for node in nodes:
+                parent = node
+                while parent is not self and parent is not None:
+                    parent = getParent(parent)
+                    if id(parent) in targets:
+                        parent = None
+                        
+                if parent is self:
+                    found.append(node)
+                    
         else:
-            result = Node(None, self.type)
+            parents = {}
+            found = []
+            todo = [self]
+            while todo:
+                node = todo.pop()
+                if id(node) in targets:
+                    found.append(node)
+                    continue
+                    
+                for child in node:
+                    if child is not None:
+                        parents[id(child)] = node
+                        todo.append(child)
+                        
+            getParent = lambda node: parents[id(node)]
+            
+        copies = {}
+        for node in found:
+            child = node
+            childCopy = node.clone()
+            if node is self:
+                copies[id(self)] = childCopy
+                break
+            
+            while True:
+                parent = getParent(child)
+                parentCopy = copies.get(id(parent))
+                created = parentCopy is None
+                if created:
+                    parentCopy = copies[id(parent)] = parent.__cloneNode()
+                    list.extend(parentCopy, parent)
+                    if parent.relations is not None:
+                        parentCopy.relations = dict(parent.relations)
+                        
+                list.__setitem__(parentCopy, parentCopy.index(child), childCopy)
+                childCopy.parent = parentCopy
+                
+                rel = getattr(child, "rel", None)
+                if rel is not None:
+                    childCopy.rel = rel
+                    parentCopy.relations[rel] = childCopy
+                    
+                if not created or parent is self:
+                    break
+                    
+                child = parent
+                childCopy = parentCopy
+                
+        result = copies[id(self)]
+        source = self.__findSource()
+        if source is not None:
+            result._source = source
+            
+        if nodeIndex is not None:
+            result._index = NodeIndex(result, base=nodeIndex, copies=copies, replaced=found)
+            
+        return result
         
-        # Copy children
-        for child in self:
-            rel = getattr(child, "rel", None)
-            result.append(copy.deepcopy(child, memo), rel)
-        
-        # Sync attributes
-        for name in dir(self):
-            if not name in ("parent", "target") and name[0] != "_":
-                value = getattr(self, name)
-                if name == "stats" or type(value) in (bool, int, float, str):
+        
+    def __cloneNode(self):
+        """ Creates a copy of the node without its children and relation """
+        
+        result = list.__new__(Node)
+        result.relations = None
+        
+        try:
+            # Fast path for all nodes created from a tokenizer
+            result.type, result.line, result.start, result.end, result.fileId = self.type, self.line, self.start, self.end, self.fileId
+        except AttributeError:
+            for name in ("type", "line", "start", "end", "fileId"):
+                if hasattr(self, name):
+                    setattr(result, name, getattr(self, name))
+        
+        try:
+            value = getValueSlot(self)
+            if type(value) in clonedTypes:
+                result.value = value
+            elif type(value) in (list, set):
+                result.value = type(value)(value)
+        except AttributeError:
+            pass
+                
+        attrs = self.__dict__
+        if attrs:
+            for name in attrs:
+                value = attrs[name]
+                if name[0] == "_" or name == "target":
+                    continue
+                elif name == "stats" or type(value) in clonedTypes:
                     setattr(result, name, value)
-                elif name == "stats" or type(value) in (list, set):
-                    setattr(result, name, copy.deepcopy(value, memo))
-            
+                elif type(value) in (list, set):
+                    setattr(result, name, type(value)(value))
+        
+        return result
+        
+
+    def __deepcopy__(self, memo):
         # Note: "target" attribute is ignored because if recursion error
         #       This is used by "break" and "continue" statements only and refers
         #       to the parent block where the jump should go to. This is not typically
         #       good style in JS and is not used quite often.
-        # Sync target
-        # if hasattr(self, "target"):
-        #   result.target = copy.deepcopy(self.target, memo)
-        
-        # Note: "parent" attribute is handled by append() already
-
-        return result
+        return self.clone()
         
         
     # Converts the node to JSON
@@ -289,23 +623,42 @@ class Node(list):
         
     # Returns the source code of the node
     def getSource(self):
-        if not self.tokenizer:
-            raise Exception("Could not find source for node '%s'" % node.type)
+        source = self.__findSource()
+        if source is None:
+            raise Exception("Could not find source for node '%s'" % self.type)
             
         if getattr(self, "start", None) is not None:
             if getattr(self, "end", None) is not None:
-                return self.tokenizer.source[self.start:self.end]
-            return self.tokenizer.source[self.start:]
+                return source[self.start:self.end]
+            return source[self.start:]
     
         if getattr(self, "end", None) is not None:
-            return self.tokenizer.source[:self.end]
+            return source[:self.end]
+    
+        return source[:]
+        
     
-        return self.tokenizer.source[:]
+    def __findSource(self):
+        """ 
+        Returns the source code stored on the nearest node (starting with the node itself) up to the 
+        root of the tree, or None. Parsed root nodes store the source code they were parsed from,
+        copies (e.g. of templates inserted into another tree) store the source code of their original.
+        """
+        node = self
+        source = node._source
+        try:
+            while source is None:
+                node = getParentSlot(node)
+                source = node._source
+        except AttributeError:
+            pass
+            
+        return source
         
     
     # Returns the file name
     def getFileName(self):
-        return self.filename
+        return getattr(self, "fileId", None)
 
 
     # Map Python built-ins
@@ -317,3 +670,257 @@ class Node(list):
 
     def __bool__(self): 
         return True
+
+
+
+# Direct access to the "value" and "parent" slots without falling back to the related children
+getValueSlot = Node.value.__get__
+getParentSlot = Node.parent.__get__
+getOwnerSlot = Node._owner.__get__
+
+
+
+#
+# Node index
+#
+
+class NodeIndex:
+    """
+    Index of the nodes of a tree by their type, attached to the root node (see Node.getIndex()).
+    The index is built by walking the tree on the first lookup, afterwards the nodes added by the 
+    mutation methods of Node (append, insert, replace) are added to the index, nodes which have 
+    been removed from the tree (or got another type) are dropped on lookup. The index of an overlay 
+    (see Node.createOverlay()) is based on the index of the original tree and the nodes owned by 
+    the overlay (the copied ancestors, the cloned and all added nodes). Other tables of the tree
+    (e.g. the scope table) are updated by the index as well, see addObserver().
+    """
+    
+    __slots__ = ["root", "types", "base", "copies", "replaced", "valid", "observers"]
+    
+    def __init__(self, root, base=None, copies=None, replaced=None):
+        self.root = root
+        
+        # Nodes by type, None until the index is built
+        self.types = None
+        
+        # Types whose list has been checked since the last modification of the tree
+        self.valid = set()
+        
+        self.base = base
+        self.copies = copies
+        self.replaced = set([id(node) for node in replaced]) if replaced else None
+        
+        # Objects notified about added and removed subtrees (see addObserver())
+        self.observers = None
+        
+        
+    def __collect(self):
+        """ Returns the nodes of the tree (overlays skip the nodes shared with the original tree) """
+        base = self.base
+        
+        nodes = []
+        todo = [self.root]
+        while todo:
+            node = todo.pop()
+            nodes.append(node)
+            for child in node:
+                # Parents of shared nodes are part of the original tree
+                if child is not None and (base is None or getattr(child, "parent", None) is node):
+                    todo.append(child)
+                    
+        return nodes
+        
+        
+    def __build(self):
+        """ Indexes the nodes of the tree """
+        self.types = {}
+        self.__add(self.__collect())
+        
+        
+    def __add(self, nodes):
+        """ Adds the given nodes to the index """
+        self.valid.clear()
+        types = self.types
+        for node in nodes:
+            node._owner = self
+            nodeType = node.type
+            if nodeType in types:
+                types[nodeType].append(node)
+            else:
+                types[nodeType] = [node]
+                
+                
+    def addObserver(self, observer):
+        """ 
+        Registers an object which is notified about the changes of the tree: its methods addTree(node),
+        moveTree(node, previous) and removeTree(node) are called with the root of each subtree which 
+        has been added to the tree, moved inside the tree (from the given previous parent) or removed 
+        from the tree. The nodes of the tree are stamped, so that their mutation methods find the index.
+        """
+        if self.types is None and self.observers is None:
+            for node in self.__collect():
+                node._owner = self
+            
+        if self.observers is None:
+            self.observers = [observer]
+        else:
+            self.observers.append(observer)
+            
+            
+    def removeObserver(self, observer):
+        """ Unregisters the given object (see addObserver()) """
+        if self.observers and observer in self.observers:
+            self.observers.remove(observer)
+        
+        
+    def addTree(self, node):
+        """ Adds the given node and all its descendants to the index (found by the walk when not built yet) """
+        if self.types is None and self.observers is None:
+            return
+            
+        self.__addTree(node)
+        
+        if self.observers:
+            for observer in self.observers:
+                observer.addTree(node)
+                
+                
+    def moveTree(self, node, previous):
+        """ Called when the given node has been moved from the given previous parent to another parent in the tree """
+        if self.types is not None:
+            self.__addTree(node)
+            
+        if self.observers:
+            for observer in self.observers:
+                observer.moveTree(node, previous)
+        
+        
+    def removeTree(self, node):
+        """ Called when the given node (and its descendants) has been removed from the tree """
+        self.valid.clear()
+        
+        if self.observers:
+            for observer in self.observers:
+                observer.removeTree(node)
+                
+                
+    def __addTree(self, node):
+        """ Adds the given node and all its descendants (only stamps them while the index is not built) """
+        nodes = []
+        todo = [node]
+        while todo:
+            current = todo.pop()
+            if current is not None:
+                nodes.append(current)
+                todo.extend(current)
+                
+        if self.types is not None:
+            self.__add(nodes)
+        else:
+            for current in nodes:
+                current._owner = self
+        
+        
+    def resolve(self, node):
+        """ Returns the node which takes the place of the given node in this tree (the copy in overlays) """
+        if self.base is None:
+            return node
+            
+        node = self.base.resolve(node)
+        return self.copies.get(id(node), node)
+        
+        
+    def getParent(self, node):
+        """ Returns the parent of the given node in this tree (None for detached nodes) """
+        try:
+            parent = getParentSlot(node)
+        except AttributeError:
+            return None
+            
+        return self.resolve(parent)
+        
+        
+    def contains(self, node, known=None):
+        """ 
+        Whether the given node is part of this tree. The optional set "known" holds the IDs 
+        of nodes known to be part of the tree, it is updated with the nodes passed on the way up.
+        """
+        root = self.root
+        
+        # Fast path for trees which are not overlays
+        if self.base is None:
+            passed = []
+            try:
+                while node is not root:
+                    if known is not None:
+                        if id(node) in known:
+                            break
+                        passed.append(id(node))
+                        
+                    node = getParentSlot(node)
+                    
+            except AttributeError:
+                return False
+                
+            if known is not None:
+                known.update(passed)
+                
+            return True
+            
+        if self.resolve(node) is not node:
+            return False
+            
+        replaced = self.replaced
+        passed = []
+        while node is not root:
+            if known is not None:
+                if id(node) in known:
+                    break
+                passed.append(id(node))
+                
+            if replaced and id(node) in replaced:
+                return False
+                
+            node = self.getParent(node)
+            if node is None:
+                return False
+                
+        if known is not None:
+            known.update(passed)
+            
+        return True
+        
+        
+    def get(self, nodeType):
+        """ Returns all nodes of the given type which are part of the tree (in no particular order) """
+        if self.types is None:
+            self.__build()
+            
+        seen = set()
+        known = set()
+        contains = self.contains
+        
+        result = []
+        if nodeType in self.types:
+            if self.base is None and nodeType in self.valid:
+                return list(self.types[nodeType])
+                
+            for node in self.types[nodeType]:
+                if node.type == nodeType and not id(node) in seen and contains(node, known):
+                    seen.add(id(node))
+                    result.append(node)
+                    
+            self.types[nodeType] = result
+            self.valid.add(nodeType)
+            result = list(result)
+            
+        # Overlays add the nodes of the original tree (as seen in this tree)
+        if self.base is not None:
+            copies = self.copies
+            for node in self.base.get(nodeType):
+                node = copies.get(id(node), node)
+                if node.type == nodeType and not id(node) in seen and contains(node, known):
+                    seen.add(id(node))
+                    result.append(node)
+                    
+        return result
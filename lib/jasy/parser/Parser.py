@@ -19,7 +19,7 @@ from jasy.parser.VanillaBuilder import VanillaBuilder
 __all__ = [ "parse", "parseExpression" ]
 
 
-def parseExpression(source, fileId=None, line=0, builder=None):
+def parseExpression(source, fileId=None, line=0, builder=None, engine="classic"):
     if builder == None:
         builder = VanillaBuilder()
     
@@ -27,26 +27,35 @@ def parseExpression(source, fileId=None, line=0, builder=None):
     if not source.endswith(";"):
         source = source + ";"
     
-    tokenizer = Tokenizer(source, fileId, line)
+    tokenizer = Tokenizer(source, fileId, line, engine)
     staticContext = StaticContext(False, builder)
     
-    return Expression(tokenizer, staticContext)
+    node = Expression(tokenizer, staticContext)
+    node._source = tokenizer.source
+    
+    return node
 
 
 
-def parse(source, fileId=None, line=0, builder=None):
+def parse(source, fileId=None, line=0, builder=None, engine="classic", index=False):
     if builder == None:
-        builder = VanillaBuilder()
+        builder = VanillaBuilder(index)
     
-    tokenizer = Tokenizer(source, fileId, line)
+    tokenizer = Tokenizer(source, fileId, line, engine)
     staticContext = StaticContext(False, builder)
     node = Script(tokenizer, staticContext)
     
-    # store fileId on top-level node
+    # store fileId and source on top-level node
     node.fileId = tokenizer.fileId
+    node._source = tokenizer.source
     
     if not tokenizer.done():
         raise SyntaxError("Unexpected end of file", tokenizer)
+        
+    # attach the index of all nodes by type (built on first lookup, custom 
+    # builders might not support indexes at all)
+    if hasattr(builder, "INDEX_attach"):
+        builder.INDEX_attach(node)
 
     return node
 
@@ -876,7 +885,7 @@ def Variables(tokenizer, staticContext, letBlock=None):
                 raise SyntaxError("Invalid variable initialization", tokenizer)
 
             # Parse the init as a normal assignment.
-            id = Node(childNode.tokenizer, "identifier")
+            id = Node(tokenizer, "identifier")
             assignmentNode = builder.ASSIGN_build(tokenizer)
             builder.ASSIGN_addOperand(assignmentNode, id)
             builder.ASSIGN_addOperand(assignmentNode, AssignExpression(tokenizer, staticContext))
@@ -0,0 +1,163 @@
+#
+# Jasy - JavaScript Tooling Framework
+# Copyright 2010-2011 Sebastian Werner
+#
+
+from types import GeneratorType
+
+__all__ = ["Visitor", "walk", "compute", "getHandlers"]
+
+
+class Visitor:
+    """
+    Base class for analyses which are executed by walk(). Visitors register
+    handlers for node types using onEnter() and onLeave() (typically in their
+    constructor). Handlers are called with the node as the only argument.
+    """
+
+    def __init__(self):
+        self.enterHandlers = []
+        self.leaveHandlers = []
+
+        # Dispatch table of walks with only this visitor (kept for visitors which are used multiple times)
+        self.table = None
+
+
+    def onEnter(self, types, handler):
+        """ Calls the handler before the children of nodes of the given types (None = all types) """
+        self.enterHandlers.append((types, handler))
+        self.table = None
+
+
+    def onLeave(self, types, handler):
+        """ Calls the handler after the children of nodes of the given types (None = all types) """
+        self.leaveHandlers.append((types, handler))
+        self.table = None
+
+
+
+#
+# Dispatch table
+#
+
+class __Table(dict):
+    """ Maps node types to the handlers to call on enter and on leave, built lazily per type """
+
+    def __init__(self, visitors):
+        self.enterRegistrations = []
+        self.leaveRegistrations = []
+
+        for visitor in visitors:
+            self.enterRegistrations.extend(visitor.enterHandlers)
+            self.leaveRegistrations.extend(visitor.leaveHandlers)
+
+
+    def __missing__(self, nodeType):
+        enter = tuple([handler for types, handler in self.enterRegistrations if types is None or nodeType in types])
+        leave = tuple([handler for types, handler in self.leaveRegistrations if types is None or nodeType in types])
+
+        handlers = self[nodeType] = (enter, leave or None)
+        return handlers
+
+
+
+#
+# Public API
+#
+
+def walk(node, *visitors):
+    """
+    Executes all given visitors in one iterative pre-order walk over the tree
+    starting at the given node. Children are processed from left to right, the
+    enter handlers of multiple visitors are called in the order of the visitors,
+    the leave handlers as well. The visitors must not modify the tree structure.
+    """
+
+    if len(visitors) == 1:
+        table = visitors[0].table
+        if table is None:
+            table = visitors[0].table = __Table(visitors)
+    else:
+        table = __Table(visitors)
+
+    # Leave handlers are pushed (as a tuple) together with their node
+    stack = [node]
+    pop = stack.pop
+    push = stack.append
+    extend = stack.extend
+
+    while stack:
+        current = pop()
+        if current is None:
+            continue
+
+        if current.__class__ is tuple:
+            leave, current = current
+            for handler in leave:
+                handler(current)
+            continue
+
+        enter, leave = table[current.type]
+        for handler in enter:
+            handler(current)
+
+        if leave:
+            push((leave, current))
+
+        if current:
+            extend(reversed(current))
+
+    return visitors
+
+
+
+def compute(node, handler):
+    """
+    Computes a value for the given node without recursion. The handler is called with a
+    node and returns its value, or a generator for nodes which depend on the values of other
+    nodes: the generator yields these nodes, receives their values in exchange and returns
+    the value of its node. The generators are executed on an explicit stack, so the depth
+    of the tree is not limited by the recursion limit of Python.
+    """
+
+    result = handler(node)
+    if result.__class__ is not GeneratorType:
+        return result
+
+    # Stack of the "send" methods of the active generators
+    stack = [result.send]
+    push = stack.append
+    pop = stack.pop
+    value = None
+
+    while True:
+        try:
+            child = stack[-1](value)
+        except StopIteration as stop:
+            pop()
+            value = stop.value
+            if not stack:
+                return value
+            continue
+
+        value = handler(child)
+        if value.__class__ is GeneratorType:
+            push(value.send)
+            value = None
+
+
+
+def getHandlers(cls, prefix="type_"):
+    """
+    Returns a dictionary which maps node types to the functions of the given class named
+    by the prefix and the type (e.g. "type_call" for "call" nodes). The functions are
+    called with the instance and the node. Meant to be built once per class instead of
+    looking up the handler by name for every node.
+    """
+
+    table = {}
+    for name in dir(cls):
+        if name.startswith(prefix):
+            table[name[len(prefix):]] = getattr(cls, name)
+
+    return table
@@ -10,11 +10,23 @@
 #   - Sebastian Werner <info@sebastian-werner.net> (Python Port) (2010)
 #
 
-from jasy.parser.Node import Node
+from jasy.parser.Node import Node, NodeIndex
 
 class VanillaBuilder:
     """The vanilla AST builder."""
     
+    def __init__(self, index=False):
+        # Whether a node index is attached to the tree (built on first lookup)
+        self.index = index
+        
+    def createNode(self, tokenizer, type=None):
+        return Node(tokenizer, type)
+        
+    def INDEX_attach(self, node):
+        """ Attaches a node index to the given root node """
+        if self.index:
+            node._index = NodeIndex(node)
+    
     def COMMENTS_add(self, currNode, prevNode, comments):
         if not comments:
             return
@@ -38,7 +50,7 @@ class VanillaBuilder:
                 prevNode.comments = prevComments
     
     def IF_build(self, tokenizer):
-        return Node(tokenizer, "if")
+        return self.createNode(tokenizer, "if")
 
     def IF_setCondition(self, node, expression):
         node.append(expression, "condition")
@@ -53,7 +65,7 @@ class VanillaBuilder:
         pass
 
     def SWITCH_build(self, tokenizer):
-        node = Node(tokenizer, "switch")
+        node = self.createNode(tokenizer, "switch")
         node.defaultIndex = -1
         return node
 
@@ -70,13 +82,13 @@ class VanillaBuilder:
         pass
 
     def CASE_build(self, tokenizer):
-        return Node(tokenizer, "case")
+        return self.createNode(tokenizer, "case")
 
     def CASE_setLabel(self, node, expression):
         node.append(expression, "label")
 
     def CASE_initializeStatements(self, node, tokenizer):
-        node.append(Node(tokenizer, "block"), "statements")
+        node.append(self.createNode(tokenizer, "block"), "statements")
 
     def CASE_addStatement(self, node, statement):
         node.statements.append(statement)
@@ -85,10 +97,10 @@ class VanillaBuilder:
         pass
 
     def DEFAULT_build(self, tokenizer):
-        return Node(tokenizer, "default")
+        return self.createNode(tokenizer, "default")
 
     def DEFAULT_initializeStatements(self, node, tokenizer):
-        node.append(Node(tokenizer, "block"), "statements")
+        node.append(self.createNode(tokenizer, "block"), "statements")
 
     def DEFAULT_addStatement(self, node, statement):
         node.statements.append(statement)
@@ -97,7 +109,7 @@ class VanillaBuilder:
         pass
 
     def FOR_build(self, tokenizer):
-        node = Node(tokenizer, "for")
+        node = self.createNode(tokenizer, "for")
         node.isLoop = True
         node.isEach = False
         return node
@@ -135,7 +147,7 @@ class VanillaBuilder:
         pass
 
     def WHILE_build(self, tokenizer):
-        node = Node(tokenizer, "while")
+        node = self.createNode(tokenizer, "while")
         node.isLoop = True
         return node
 
@@ -149,7 +161,7 @@ class VanillaBuilder:
         pass
 
     def DO_build(self, tokenizer):
-        node = Node(tokenizer, "do")
+        node = self.createNode(tokenizer, "do")
         node.isLoop = True
         return node
 
@@ -163,7 +175,7 @@ class VanillaBuilder:
         pass
 
     def BREAK_build(self, tokenizer):
-        return Node(tokenizer, "break")
+        return self.createNode(tokenizer, "break")
 
     def BREAK_setLabel(self, node, label):
         node.label = label
@@ -176,7 +188,7 @@ class VanillaBuilder:
         pass
 
     def CONTINUE_build(self, tokenizer):
-        return Node(tokenizer, "continue")
+        return self.createNode(tokenizer, "continue")
 
     def CONTINUE_setLabel(self, node, label):
         node.label = label
@@ -189,7 +201,7 @@ class VanillaBuilder:
         pass
 
     def TRY_build(self, tokenizer):
-        node = Node(tokenizer, "try")
+        node = self.createNode(tokenizer, "try")
         return node
 
     def TRY_setTryBlock(self, node, statement):
@@ -208,11 +220,11 @@ class VanillaBuilder:
         pass
 
     def CATCH_build(self, tokenizer):
-        node = Node(tokenizer, "catch")
+        node = self.createNode(tokenizer, "catch")
         return node
         
     def CATCH_wrapException(self, tokenizer):
-        node = Node(tokenizer, "exception")
+        node = self.createNode(tokenizer, "exception")
         node.value = tokenizer.token.value
         return node
 
@@ -229,7 +241,7 @@ class VanillaBuilder:
         pass
 
     def THROW_build(self, tokenizer):
-        return Node(tokenizer, "throw")
+        return self.createNode(tokenizer, "throw")
 
     def THROW_setException(self, node, expression):
         node.append(expression, "exception")
@@ -238,7 +250,7 @@ class VanillaBuilder:
         pass
 
     def RETURN_build(self, tokenizer):
-        return Node(tokenizer, "return")
+        return self.createNode(tokenizer, "return")
 
     def RETURN_setValue(self, node, expression):
         node.append(expression, "value")
@@ -247,7 +259,7 @@ class VanillaBuilder:
         pass
 
     def YIELD_build(self, tokenizer):
-        return Node(tokenizer, "yield")
+        return self.createNode(tokenizer, "yield")
 
     def YIELD_setValue(self, node, expression):
         node.append(expression, "value")
@@ -256,7 +268,7 @@ class VanillaBuilder:
         pass
 
     def GENERATOR_build(self, tokenizer):
-        return Node(tokenizer, "generator")
+        return self.createNode(tokenizer, "generator")
 
     def GENERATOR_setExpression(self, node, expression):
         node.append(expression, "expression")
@@ -268,7 +280,7 @@ class VanillaBuilder:
         pass
 
     def WITH_build(self, tokenizer):
-        return Node(tokenizer, "with")
+        return self.createNode(tokenizer, "with")
 
     def WITH_setObject(self, node, expression):
         node.append(expression, "object")
@@ -280,10 +292,10 @@ class VanillaBuilder:
         pass
 
     def DEBUGGER_build(self, tokenizer):
-        return Node(tokenizer, "debugger")
+        return self.createNode(tokenizer, "debugger")
 
     def SEMICOLON_build(self, tokenizer):
-        return Node(tokenizer, "semicolon")
+        return self.createNode(tokenizer, "semicolon")
 
     def SEMICOLON_setExpression(self, node, expression):
         node.append(expression, "expression")
@@ -292,7 +304,7 @@ class VanillaBuilder:
         pass
 
     def LABEL_build(self, tokenizer):
-        return Node(tokenizer, "label")
+        return self.createNode(tokenizer, "label")
 
     def LABEL_setLabel(self, node, label):
         node.label = label
@@ -304,7 +316,7 @@ class VanillaBuilder:
         pass
 
     def FUNCTION_build(self, tokenizer):
-        node = Node(tokenizer)
+        node = self.createNode(tokenizer)
         if node.type != "function":
             if tokenizer.token.value == "get":
                 node.type = "getter"
@@ -317,10 +329,10 @@ class VanillaBuilder:
         node.name = identifier
 
     def FUNCTION_initParams(self, node, tokenizer):
-        node.append(Node(tokenizer, "list"), "params")
+        node.append(self.createNode(tokenizer, "list"), "params")
         
     def FUNCTION_wrapParam(self, tokenizer):
-        param = Node(tokenizer)
+        param = self.createNode(tokenizer)
         param.value = tokenizer.token.value
         return param
         
@@ -345,7 +357,7 @@ class VanillaBuilder:
         pass
 
     def VAR_build(self, tokenizer):
-        return Node(tokenizer, "var")
+        return self.createNode(tokenizer, "var")
 
     def VAR_addDecl(self, node, childNode, childContext=None):
         node.append(childNode)
@@ -354,7 +366,7 @@ class VanillaBuilder:
         pass
 
     def CONST_build(self, tokenizer):
-        return Node(tokenizer, "const")
+        return self.createNode(tokenizer, "const")
 
     def CONST_addDecl(self, node, childNode, childContext=None):
         node.append(childNode)
@@ -363,7 +375,7 @@ class VanillaBuilder:
         pass
 
     def LET_build(self, tokenizer):
-        return Node(tokenizer, "let")
+        return self.createNode(tokenizer, "let")
 
     def LET_addDecl(self, node, childNode, childContext=None):
         node.append(childNode)
@@ -372,7 +384,7 @@ class VanillaBuilder:
         pass
 
     def DECL_build(self, tokenizer):
-        return Node(tokenizer, "declaration")
+        return self.createNode(tokenizer, "declaration")
 
     def DECL_setNames(self, node, expression):
         node.append(expression, "names")
@@ -390,7 +402,7 @@ class VanillaBuilder:
         pass
 
     def LETBLOCK_build(self, tokenizer):
-        node = Node(tokenizer, "let_block")
+        node = self.createNode(tokenizer, "let_block")
         return node
 
     def LETBLOCK_setVariables(self, node, childNode):
@@ -406,7 +418,7 @@ class VanillaBuilder:
         pass
 
     def BLOCK_build(self, tokenizer, id):
-        node = Node(tokenizer, "block")
+        node = self.createNode(tokenizer, "block")
         # node.id = id
         return node
 
@@ -420,7 +432,7 @@ class VanillaBuilder:
         pass
 
     def EXPRESSION_build(self, tokenizer, tokenType):
-        return Node(tokenizer, tokenType)
+        return self.createNode(tokenizer, tokenType)
 
     def EXPRESSION_addOperand(self, node, childNode):
         node.append(childNode)
@@ -429,7 +441,7 @@ class VanillaBuilder:
         pass
 
     def ASSIGN_build(self, tokenizer):
-        return Node(tokenizer, "assign")
+        return self.createNode(tokenizer, "assign")
 
     def ASSIGN_addOperand(self, node, childNode):
         node.append(childNode)
@@ -441,7 +453,7 @@ class VanillaBuilder:
         pass
 
     def HOOK_build(self, tokenizer):
-        return Node(tokenizer, "hook")
+        return self.createNode(tokenizer, "hook")
 
     def HOOK_setCondition(self, node, expression):
         node.append(expression, "condition")
@@ -456,7 +468,7 @@ class VanillaBuilder:
         pass
 
     def OR_build(self, tokenizer):
-        return Node(tokenizer, "or")
+        return self.createNode(tokenizer, "or")
 
     def OR_addOperand(self, node, childNode):
         node.append(childNode)
@@ -465,7 +477,7 @@ class VanillaBuilder:
         pass
 
     def AND_build(self, tokenizer):
-        return Node(tokenizer, "and")
+        return self.createNode(tokenizer, "and")
 
     def AND_addOperand(self, node, childNode):
         node.append(childNode)
@@ -474,7 +486,7 @@ class VanillaBuilder:
         pass
 
     def BITWISEOR_build(self, tokenizer):
-        return Node(tokenizer, "bitwise_or")
+        return self.createNode(tokenizer, "bitwise_or")
 
     def BITWISEOR_addOperand(self, node, childNode):
         node.append(childNode)
@@ -483,7 +495,7 @@ class VanillaBuilder:
         pass
 
     def BITWISEXOR_build(self, tokenizer):
-        return Node(tokenizer, "bitwise_xor")
+        return self.createNode(tokenizer, "bitwise_xor")
 
     def BITWISEXOR_addOperand(self, node, childNode):
         node.append(childNode)
@@ -492,7 +504,7 @@ class VanillaBuilder:
         pass
 
     def BITWISEAND_build(self, tokenizer):
-        return Node(tokenizer, "bitwise_and")
+        return self.createNode(tokenizer, "bitwise_and")
 
     def BITWISEAND_addOperand(self, node, childNode):
         node.append(childNode)
@@ -502,7 +514,7 @@ class VanillaBuilder:
 
     def EQUALITY_build(self, tokenizer):
         # NB: tokenizer.token.type must be "eq", "ne", "strict_eq", or "strict_ne".
-        return Node(tokenizer)
+        return self.createNode(tokenizer)
 
     def EQUALITY_addOperand(self, node, childNode):
         node.append(childNode)
@@ -512,7 +524,7 @@ class VanillaBuilder:
 
     def RELATIONAL_build(self, tokenizer):
         # NB: tokenizer.token.type must be "lt", "le", "ge", or "gt".
-        return Node(tokenizer)
+        return self.createNode(tokenizer)
 
     def RELATIONAL_addOperand(self, node, childNode):
         node.append(childNode)
@@ -522,7 +534,7 @@ class VanillaBuilder:
 
     def SHIFT_build(self, tokenizer):
         # NB: tokenizer.token.type must be "lsh", "rsh", or "ursh".
-        return Node(tokenizer)
+        return self.createNode(tokenizer)
 
     def SHIFT_addOperand(self, node, childNode):
         node.append(childNode)
@@ -532,7 +544,7 @@ class VanillaBuilder:
 
     def ADD_build(self, tokenizer):
         # NB: tokenizer.token.type must be "plus" or "minus".
-        return Node(tokenizer)
+        return self.createNode(tokenizer)
 
     def ADD_addOperand(self, node, childNode):
         node.append(childNode)
@@ -542,7 +554,7 @@ class VanillaBuilder:
 
     def MULTIPLY_build(self, tokenizer):
         # NB: tokenizer.token.type must be "mul", "div", or "mod".
-        return Node(tokenizer)
+        return self.createNode(tokenizer)
 
     def MULTIPLY_addOperand(self, node, childNode):
         node.append(childNode)
@@ -558,7 +570,7 @@ class VanillaBuilder:
         elif tokenizer.token.type == "minus":
             tokenizer.token.type = "unary_minus"
             
-        return Node(tokenizer)
+        return self.createNode(tokenizer)
 
     def UNARY_addOperand(self, node, childNode):
         node.append(childNode)
@@ -570,7 +582,7 @@ class VanillaBuilder:
         pass
 
     def MEMBER_build(self, tokenizer, tokenType=None):
-        node = Node(tokenizer, tokenType)
+        node = self.createNode(tokenizer, tokenType)
         if node.type == "identifier":
             node.value = tokenizer.token.value
         return node
@@ -586,7 +598,7 @@ class VanillaBuilder:
 
     def PRIMARY_build(self, tokenizer, tokenType):
         # NB: tokenizer.token.type must be "null", "this", "true", "false", "identifier", "number", "string", or "regexp".
-        node = Node(tokenizer, tokenType)
+        node = self.createNode(tokenizer, tokenType)
         if tokenType in ("identifier", "string", "regexp"):
             node.value = tokenizer.token.value
             
@@ -612,7 +624,7 @@ class VanillaBuilder:
         pass
 
     def ARRAYINIT_build(self, tokenizer):
-        return Node(tokenizer, "array_init")
+        return self.createNode(tokenizer, "array_init")
 
     def ARRAYINIT_addElement(self, node, childNode):
         node.append(childNode)
@@ -621,7 +633,7 @@ class VanillaBuilder:
         pass
 
     def ARRAYCOMP_build(self, tokenizer):
-        return Node(tokenizer, "array_comp")
+        return self.createNode(tokenizer, "array_comp")
     
     def ARRAYCOMP_setExpression(self, node, expression):
         node.append(expression, "expression")
@@ -633,7 +645,7 @@ class VanillaBuilder:
         pass
 
     def COMPTAIL_build(self, tokenizer):
-        return Node(tokenizer, "comp_tail")
+        return self.createNode(tokenizer, "comp_tail")
 
     def COMPTAIL_setGuard(self, node, expression):
         node.append(expression, "guard")
@@ -645,7 +657,7 @@ class VanillaBuilder:
         pass
 
     def OBJECTINIT_build(self, tokenizer):
-        return Node(tokenizer, "object_init")
+        return self.createNode(tokenizer, "object_init")
 
     def OBJECTINIT_addProperty(self, node, childNode):
         node.append(childNode)
@@ -654,7 +666,7 @@ class VanillaBuilder:
         pass
 
     def PROPERTYINIT_build(self, tokenizer):
-        return Node(tokenizer, "property_init")
+        return self.createNode(tokenizer, "property_init")
 
     def PROPERTYINIT_addOperand(self, node, childNode):
         node.append(childNode)
@@ -663,7 +675,7 @@ class VanillaBuilder:
         pass
 
     def COMMA_build(self, tokenizer):
-        return Node(tokenizer, "comma")
+        return self.createNode(tokenizer, "comma")
 
     def COMMA_addOperand(self, node, childNode):
         node.append(childNode)
@@ -672,7 +684,7 @@ class VanillaBuilder:
         pass
 
     def LIST_build(self, tokenizer):
-        return Node(tokenizer, "list")
+        return self.createNode(tokenizer, "list")
 
     def LIST_addOperand(self, node, childNode):
         node.append(childNode)
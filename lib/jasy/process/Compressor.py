@@ -3,11 +3,14 @@
 # Copyright 2010-2011 Sebastian Werner
 #
 
-import re, sys, json
+import re, json
+from operator import itemgetter
+from types import GeneratorType
 from jasy.tokenizer.Lang import keywords
 from jasy.parser.Lang import expressions, futureReserved
+from jasy.parser.Traversal import compute, getHandlers
 
-all = [ "compress" ]
+all = [ "compress", "CompressorError" ]
 
 
 #
@@ -24,12 +27,26 @@ def compress(node, format=False):
 # Class
 #
 
+class CompressorError(Exception):
+    def __init__(self, message, node):
+        Exception.__init__(self, "Compressor error: %s\n%s:%s" % (message, node.getFileName(), getattr(node, "line", None)))
+
+
+
 class Compressor:
     __semicolonSymbol = ";"
     __commaSymbol = ","
     
+    # Maps node types to their handler functions, built on first use
+    __handlers = None
+    
 
-    def __init__(self, format=None):
+    def __init__(self, format=None, mapping=False):
+        """
+        When mapping is enabled the compressor records the origin (file ID, line) of the generated
+        code while emitting it, see getMappings().
+        """
+        
         if format:
             if format.has("semicolon"):
                 self.__semicolonSymbol = ";\n"
@@ -38,6 +55,23 @@ class Compressor:
                 self.__commaSymbol = ",\n"
             
         self.__forcedSemicolon = False
+        self.__buffer = None
+        self.__write = None
+        
+        self.__mapping = mapping
+        self.__mappings = None
+        self.__result = None
+        
+        if Compressor.__handlers is None:
+            handlers = getHandlers(Compressor)
+            for type in self.__simple:
+                handlers[type] = Compressor.__keyword
+            for type in self.__prefixes:
+                handlers[type] = Compressor.__prefix
+            for type in self.__dividers:
+                handlers[type] = Compressor.__divider
+            
+            Compressor.__handlers = handlers
 
 
 
@@ -46,32 +80,111 @@ class Compressor:
     #
 
     def compress(self, node):
-        type = node.type
-        result = None
-    
-        if type in self.__simple:
-            result = type
-        elif type in self.__prefixes:
-            if getattr(node, "postfix", False):
-                result = self.compress(node[0]) + self.__prefixes[node.type]
-            else:
-                result = self.__prefixes[node.type] + self.compress(node[0])
-            
-        elif type in self.__dividers:
-            result = self.__dividers[node.type].join(map(self.compress, node))
-
+        # All code fragments are appended to one buffer which is joined at the end
+        buffer = self.__buffer = []
+        self.__write = buffer.append
+        
+        if self.__mapping:
+            mappings = self.__mappings = []
+            handler = self.__compressMappedNode
         else:
-            try:
-                result = getattr(self, "type_%s" % type)(node)
-            except KeyError:
-                print("Compressor does not support type '%s' from line %s in file %s" % (type, node.line, node.getFileName()))
-                print(node.toJson())
-                sys.exit(1)
+            mappings = None
+            handler = self.__compressNode
+            
+        try:
+            compute(node, handler)
+        finally:
+            self.__buffer = None
+            self.__write = None
+            self.__mappings = None
+            
+        if mappings is not None:
+            self.__result = self.__resolveMappings(buffer, mappings)
             
-        if getattr(node, "parenthesized", None):
-            return "(%s)" % result
+        return "".join(buffer)
+        
+        
+    def getMappings(self):
+        """ 
+        Returns the mappings of the code returned by the last call of compress() as a list 
+        of (offset in code, file ID, line) tuples, sorted by offset. Only available with mapping enabled.
+        """
+        
+        return self.__result
+        
+        
+    def __compressMappedNode(self, node):
+        """ Same as __compressNode() but records the origin of the code of the node first """
+        
+        try:
+            fileId = node.fileId
+            line = node.line
+        except AttributeError:
+            pass
         else:
+            # Entries are (fragment, offset in fragment, file ID, line), only added when the line changes.
+            # Nodes without a line are mapped by their children. Lines are zero based (see parse()).
+            mappings = self.__mappings
+            if line is not None and (not mappings or mappings[-1][3] != line or mappings[-1][2] != fileId):
+                mappings.append((len(self.__buffer), 0, fileId, line))
+            
+        return self.__compressNode(node)
+        
+        
+    def __resolveMappings(self, buffer, mappings):
+        """ Converts the fragment based positions of the recorded mappings to offsets in the joined code """
+        
+        result = []
+        fragment = 0
+        offset = 0
+        length = len(buffer)
+        
+        for position, inner, fileId, line in sorted(mappings, key=itemgetter(0, 1)):
+            while fragment < position and fragment < length:
+                offset += len(buffer[fragment])
+                fragment += 1
+                
+            # Of the nodes starting at the same offset the innermost (last) one is kept,
+            # following mappings of the same line are omitted
+            position = offset + inner
+            if result and result[-1][0] == position:
+                result.pop()
+            
+            if not result or result[-1][2] != line or result[-1][1] != fileId:
+                result.append((position, fileId, line))
+            
+        return result
+        
+        
+    def __compressNode(self, node):
+        """ 
+        Writes the code of the given node to the buffer. Returns a generator for nodes with
+        children which yields the children in output order (see jasy.parser.Traversal.compute()) 
+        """
+        
+        try:
+            handler = self.__handlers[node.type]
+        except KeyError:
+            raise CompressorError("Unsupported node type '%s'" % node.type, node)
+            
+        result = handler(self, node)
+            
+        if result.__class__ is GeneratorType:
+            if node.parenthesized:
+                return self.__parenthesize(result)
+            
             return result
+            
+        # Leaf nodes return their code (or None when they have written it already)
+        write = self.__write
+        if node.parenthesized:
+            write("(")
+            if result:
+                write(result)
+            write(")")
+            
+        elif result:
+            write(result)
     
     
     
@@ -80,35 +193,117 @@ class Compressor:
     #
     
     def __statements(self, node):
-        result = []
         for child in node:
-            result.append(self.compress(child))
-
-        return "".join(result)
+            yield child
+        
+    def __keyword(self, node):
+        return node.type
+        
+    def __prefix(self, node):
+        prefix = self.__prefixes[node.type]
+        write = self.__write
+        if node.postfix:
+            yield node[0]
+            write(prefix)
+        else:
+            write(prefix)
+            yield node[0]
+            
+    def __divider(self, node):
+        divider = self.__dividers[node.type]
+        write = self.__write
+        first = True
+        for child in node:
+            if first:
+                first = False
+            else:
+                write(divider)
+                
+            # Shortcut for plain identifiers (most operands of e.g. "dot")
+            if child.type == "identifier" and not child.parenthesized:
+                write(child.value)
+            else:
+                yield child
+        
+    def __list(self, children, divider):
+        write = self.__write
+        first = True
+        for child in children:
+            if first:
+                first = False
+            else:
+                write(divider)
+                
+            # None children are allowed in arrays e.g. [1,2,,,7,8]
+            if child is None:
+                continue
+            elif child.type == "identifier" and not child.parenthesized:
+                write(child.value)
+            else:
+                yield child
+        
+    def __parenthesize(self, generator):
+        write = self.__write
+        write("(")
+        yield from generator
+        write(")")
+        
+    def __placeholder(self):
+        """ Appends an empty fragment which might be replaced later and returns its position """
+        buffer = self.__buffer
+        buffer.append("")
+        return len(buffer) - 1
+        
+    def __startsWith(self, mark, prefixes):
+        """ Whether the code written since the given mark starts with one of the given prefixes """
+        buffer = self.__buffer
+        for pos in range(mark, len(buffer)):
+            if buffer[pos]:
+                return buffer[pos].startswith(prefixes)
+                
+        return False
+        
+    def __isEmpty(self, mark):
+        """ Whether no code was written since the given mark """
+        buffer = self.__buffer
+        for pos in range(mark, len(buffer)):
+            if buffer[pos]:
+                return False
+                
+        return True
     
     def __handleForcedSemicolon(self, node):
         if node.type == "semicolon" and not hasattr(node, "expression"):
             self.__forcedSemicolon = True
 
-    def __addSemicolon(self, result):
-        if not result.endswith(self.__semicolonSymbol):
-            if self.__forcedSemicolon:
-                self.__forcedSemicolon = False
+    def __addSemicolon(self, mark):
+        """ Adds a semicolon to the code written since the given mark if it does not end with one """
+        buffer = self.__buffer
         
-            return result + self.__semicolonSymbol
-
-        else:
-            return result
+        # Empty fragments are only used as placeholders followed by other code, so 
+        # the last fragment tells whether the code ends with a semicolon
+        if len(buffer) > mark and buffer[-1].endswith(self.__semicolonSymbol):
+            return
+            
+        if self.__forcedSemicolon:
+            self.__forcedSemicolon = False
+            
+        buffer.append(self.__semicolonSymbol)
 
-    def __removeSemicolon(self, result):
+    def __removeSemicolon(self, mark):
+        """ Removes the semicolon at the end of the code written since the given mark (when not forced) """
         if self.__forcedSemicolon:
             self.__forcedSemicolon = False
-            return result
+            return
     
-        if result.endswith(self.__semicolonSymbol):
-            return result[:-len(self.__semicolonSymbol)]
-        else:
-            return result
+        buffer = self.__buffer
+        if len(buffer) > mark:
+            last = buffer[-1]
+            symbol = self.__semicolonSymbol
+            if last == symbol:
+                buffer.pop()
+            elif last.endswith(symbol):
+                buffer[-1] = last[:-len(symbol)]
 
 
     #
@@ -174,32 +369,45 @@ class Compressor:
     #
 
     def type_object_init(self, node):
-        return "{%s}" % self.__commaSymbol.join(map(self.compress, node))
+        write = self.__write
+        write("{")
+        yield from self.__list(node, self.__commaSymbol)
+        write("}")
 
     def type_property_init(self, node):
-        key = self.compress(node[0])
-        value = self.compress(node[1])
+        buffer = self.__buffer
+        mark = len(buffer)
+        yield node[0]
 
+        # Numeric keys are stored as numbers on the identifier
+        key = buffer[mark] if len(buffer) == mark + 1 else "".join(buffer[mark:])
         if type(key) in [int,float]:
-            pass
+            buffer[mark] = "%s" % key
 
         # Protect keywords and special characters
         elif key in keywords or key in futureReserved or not self.__simple_property.match(key):
-            key = self.type_string(node[0])
+            buffer[mark:] = [self.type_string(node[0])]
 
-        return "%s:%s" % (key, value)
+        buffer.append(":")
+        yield node[1]
         
     def type_array_init(self, node):
-        def helper(child):
-            return self.compress(child) if child != None else ""
-    
-        return "[%s]" % ",".join(map(helper, node))
+        write = self.__write
+        write("[")
+        yield from self.__list(node, ",")
+        write("]")
 
     def type_array_comp(self, node):
-        return "[%s %s]" % (self.compress(node.expression), self.compress(node.tail))    
+        write = self.__write
+        write("[")
+        yield node.expression
+        write(" ")
+        yield node.tail
+        write("]")
 
     def type_string(self, node):
-        return json.JSONEncoder(ensure_ascii=False).encode(node.value)
+        # Closing tags are escaped to keep the code embeddable into inline <script> elements
+        return json.JSONEncoder(ensure_ascii=False).encode(node.value).replace("</", "<\\/")
 
     def type_number(self, node):
         value = node.value
@@ -223,73 +431,88 @@ class Compressor:
         return node.value
 
     def type_list(self, node):
-        return ",".join(map(self.compress, node))
+        return self.__list(node, ",")
 
     def type_index(self, node):
-        return "%s[%s]" % (self.compress(node[0]), self.compress(node[1]))
+        write = self.__write
+        yield node[0]
+        write("[")
+        yield node[1]
+        write("]")
 
     def type_declaration(self, node):
+        write = self.__write
         names = getattr(node, "names", None)
         if names:
-            result = self.compress(names)
+            yield names
         else:
-            result = node.name    
+            write(node.name)
 
         initializer = getattr(node, "initializer", None)
         if initializer:
-            result += "=%s" % self.compress(node.initializer)
-
-        return result
+            write("=")
+            yield initializer
 
     def type_assign(self, node):
         assignOp = getattr(node, "assignOp", None)
         operator = "=" if not assignOp else self.__dividers[assignOp] + "="
     
-        return self.compress(node[0]) + operator + self.compress(node[1])
+        yield node[0]
+        self.__write(operator)
+        yield node[1]
 
     def type_call(self, node):
-        return "%s(%s)" % (self.compress(node[0]), self.compress(node[1]))
+        write = self.__write
+        yield node[0]
+        write("(")
+        yield node[1]
+        write(")")
 
     def type_new_with_args(self, node):
-        return "new %s(%s)" % (self.compress(node[0]), self.compress(node[1]))
+        write = self.__write
+        write("new ")
+        yield node[0]
+        write("(")
+        yield node[1]
+        write(")")
 
     def type_exception(self, node):
         return node.value
     
     def type_generator(self, node):
         """ Generator Expression """
-        result = self.compress(getattr(node, "expression"))
+        yield getattr(node, "expression")
         tail = getattr(node, "tail", None)
         if tail:
-            result += " %s" % self.compress(tail)
-
-        return result
+            self.__write(" ")
+            yield tail
 
     def type_comp_tail(self, node):
         """  Comprehensions Tails """
-        result = self.compress(getattr(node, "for"))
+        write = self.__write
+        yield getattr(node, "for")
         guard = getattr(node, "guard", None)
         if guard:
-            result += "if(%s)" % self.compress(guard)
-
-        return result    
+            write("if(")
+            yield guard
+            write(")")
     
     def type_in(self, node):
-        first = self.compress(node[0])
-        second = self.compress(node[1])
+        buffer = self.__buffer
+        yield node[0]
     
-        if first.endswith("'") or first.endswith('"'):
-            pattern = "%sin %s"
+        last = buffer[-1]
+        if last.endswith("'") or last.endswith('"'):
+            buffer.append("in ")
         else:
-            pattern = "%s in %s"
-    
-        return pattern % (first, second)
+            buffer.append(" in ")
+            
+        yield node[1]
     
     def type_instanceof(self, node):
-        first = self.compress(node[0])
-        second = self.compress(node[1])
-
-        return "%s instanceof %s" % (first, second)    
+        yield node[0]
+        self.__write(" instanceof ")
+        yield node[1]
     
     
 
@@ -298,38 +521,66 @@ class Compressor:
     #
 
     def type_block(self, node):
-        return "{%s}" % self.__removeSemicolon(self.__statements(node))
+        buffer = self.__buffer
+        buffer.append("{")
+        mark = len(buffer)
+        yield from self.__statements(node)
+        self.__removeSemicolon(mark)
+        buffer.append("}")
     
     def type_let_block(self, node):
-        begin = "let(%s)" % ",".join(map(self.compress, node.variables))
+        write = self.__write
+        write("let(")
+        yield from self.__list(node.variables, ",")
+        write(")")
+        
         if hasattr(node, "block"):
-            end = self.compress(node.block)
+            yield node.block
         elif hasattr(node, "expression"):
-            end = self.compress(node.expression)    
-    
-        return begin + end
+            yield node.expression
 
     def type_const(self, node):
-        return self.__addSemicolon("const %s" % self.type_list(node))
+        return self.__declarations(node, "const ")
 
     def type_var(self, node):
-        return self.__addSemicolon("var %s" % self.type_list(node))
+        return self.__declarations(node, "var ")
 
     def type_let(self, node):
-        return self.__addSemicolon("let %s" % self.type_list(node))
+        return self.__declarations(node, "let ")
+        
+    def __declarations(self, node, keyword):
+        buffer = self.__buffer
+        mark = len(buffer)
+        buffer.append(keyword)
+        yield from self.__list(node, ",")
+        self.__addSemicolon(mark)
 
     def type_semicolon(self, node):
+        mark = len(self.__buffer)
         expression = getattr(node, "expression", None)
-        return self.__addSemicolon(self.compress(expression) if expression else "")
+        if expression:
+            yield expression
+            
+        self.__addSemicolon(mark)
 
     def type_label(self, node):
-        return self.__addSemicolon("%s:%s" % (node.label, self.compress(node.statement)))
+        buffer = self.__buffer
+        mark = len(buffer)
+        buffer.append("%s:" % node.label)
+        yield node.statement
+        self.__addSemicolon(mark)
 
     def type_break(self, node):
-        return self.__addSemicolon("break" if not hasattr(node, "label") else "break %s" % node.label)
+        buffer = self.__buffer
+        mark = len(buffer)
+        buffer.append("break" if not hasattr(node, "label") else "break %s" % node.label)
+        self.__addSemicolon(mark)
 
     def type_continue(self, node):
-        return self.__addSemicolon("continue" if not hasattr(node, "label") else "continue %s" % node.label)
+        buffer = self.__buffer
+        mark = len(buffer)
+        buffer.append("continue" if not hasattr(node, "label") else "continue %s" % node.label)
+        self.__addSemicolon(mark)
 
 
     #
@@ -337,27 +588,37 @@ class Compressor:
     #
 
     def type_function(self, node):
+        buffer = self.__buffer
+        write = buffer.append
+        
         if node.type == "setter":
-            result = "set"
+            write("set")
         elif node.type == "getter":
-            result = "get"
+            write("get")
         else:
-            result = "function"
+            write("function")
         
         name = getattr(node, "name", None)
         if name:
-            result += " %s" % name
+            write(" %s" % name)
     
         params = getattr(node, "params", None)
-        result += "(%s)" % self.compress(params) if params else "()"
+        if params:
+            write("(")
+            yield params
+            write(")")
+        else:
+            write("()")
     
         # keep expression closure format (may be micro-optimized for other code, too)
         if getattr(node, "expressionClosure", False):
-            result += self.compress(node.body)
+            yield node.body
         else:
-            result += "{%s}" % self.__removeSemicolon(self.compress(node.body))
-        
-        return result
+            write("{")
+            mark = len(buffer)
+            yield node.body
+            self.__removeSemicolon(mark)
+            write("}")
 
     def type_getter(self, node):
         return self.type_function(node)
@@ -366,17 +627,19 @@ class Compressor:
         return self.type_function(node)
     
     def type_return(self, node):
-        result = "return"
+        buffer = self.__buffer
+        mark = len(buffer)
+        buffer.append("return")
+        
         if hasattr(node, "value"):
-            valueCode = self.compress(node.value)
+            space = self.__placeholder()
+            yield node.value
 
             # Micro optimization: Don't need a space when a block/map/array/group/strings are returned
-            if not valueCode.startswith(("(","[","{","'",'"',"!","-","/")): 
-                result += " "
+            if not self.__startsWith(space, ("(","[","{","'",'"',"!","-","/")): 
+                buffer[space] = " "
 
-            result += valueCode
-
-        return self.__addSemicolon(result)
+        self.__addSemicolon(mark)
 
 
 
@@ -385,22 +648,30 @@ class Compressor:
     #            
     
     def type_throw(self, node):
-        return self.__addSemicolon("throw %s" % self.compress(node.exception))
+        buffer = self.__buffer
+        mark = len(buffer)
+        buffer.append("throw ")
+        yield node.exception
+        self.__addSemicolon(mark)
 
     def type_try(self, node):
-        result = "try%s" % self.compress(node.tryBlock)
+        write = self.__write
+        write("try")
+        yield node.tryBlock
     
         for catch in node:
             if catch.type == "catch":
+                write("catch(")
+                yield catch.exception
                 if hasattr(catch, "guard"):
-                    result += "catch(%s if %s)%s" % (self.compress(catch.exception), self.compress(catch.guard), self.compress(catch.block))
-                else:
-                    result += "catch(%s)%s" % (self.compress(catch.exception), self.compress(catch.block))
+                    write(" if ")
+                    yield catch.guard
+                write(")")
+                yield catch.block
 
         if hasattr(node, "finallyBlock"):
-            result += "finally%s" % self.compress(node.finallyBlock)
-
-        return result
+            write("finally")
+            yield node.finallyBlock
 
 
 
@@ -409,54 +680,103 @@ class Compressor:
     #    
     
     def type_while(self, node):
-        result = "while(%s)%s" % (self.compress(node.condition), self.compress(node.body))
+        write = self.__write
+        write("while(")
+        yield node.condition
+        write(")")
+        yield node.body
         self.__handleForcedSemicolon(node.body)
-        return result
 
 
     def type_do(self, node):
+        buffer = self.__buffer
+        mark = len(buffer)
+        buffer.append("do")
+        
         # block unwrapping don't help to reduce size on this loop type
         # but if it happens (don't like to modify a global function to fix a local issue), we
         # need to fix the body and re-add braces around the statement
-        body = self.compress(node.body)
-        if not body.startswith("{"):
-            body = "{%s}" % body
+        brace = self.__placeholder()
+        yield node.body
+        if not self.__startsWith(brace, "{"):
+            buffer[brace] = "{"
+            buffer.append("}")
         
-        return self.__addSemicolon("do%swhile(%s)" % (body, self.compress(node.condition)))
+        buffer.append("while(")
+        yield node.condition
+        buffer.append(")")
+        self.__addSemicolon(mark)
 
 
     def type_for_in(self, node):
+        buffer = self.__buffer
+        write = buffer.append
+        mark = len(buffer)
+        
+        mappings = self.__mappings
+        if mappings is not None:
+            mappingMark = len(mappings)
+        
         # Optional variable declarations
         varDecl = getattr(node, "varDecl", None)
 
-        # Body is optional - at least in comprehensions tails
+        # Body is optional - at least in comprehensions tails. It is processed first 
+        # (like the other parts it might change the semicolon state) and moved behind them.
         body = getattr(node, "body", None)
         if body:
-            body = self.compress(body)
-        else:
-            body = ""
+            yield body
+            
+        bodyEnd = len(buffer)
         
-        result = "for(%s in %s)%s" % (self.__removeSemicolon(self.compress(node.iterator)), self.compress(node.object), body)
+        write("for(")
+        iterator = len(buffer)
+        yield node.iterator
+        self.__removeSemicolon(iterator)
+        write(" in ")
+        yield node.object
+        write(")")
     
         if body:
+            buffer[mark:] = buffer[bodyEnd:] + buffer[mark:bodyEnd]
             self.__handleForcedSemicolon(node.body)
-        
-        return result
+            
+            # Move the recorded mappings together with the code
+            if mappings is not None:
+                headLength = len(buffer) - bodyEnd
+                bodyLength = bodyEnd - mark
+                for pos in range(mappingMark, len(mappings)):
+                    position, inner, fileId, line = mappings[pos]
+                    if position < bodyEnd:
+                        mappings[pos] = (position + headLength, inner, fileId, line)
+                    else:
+                        mappings[pos] = (position - bodyLength, inner, fileId, line)
     
     
     def type_for(self, node):
+        buffer = self.__buffer
         setup = getattr(node, "setup", None)
         condition = getattr(node, "condition", None)
         update = getattr(node, "update", None)
 
-        result = "for("
-        result += self.__addSemicolon(self.compress(setup) if setup else "")
-        result += self.__addSemicolon(self.compress(condition) if condition else "")
-        result += self.compress(update) if update else ""
-        result += ")%s" % self.compress(node.body)
+        buffer.append("for(")
+        
+        mark = len(buffer)
+        if setup:
+            yield setup
+        self.__addSemicolon(mark)
+        
+        mark = len(buffer)
+        if condition:
+            yield condition
+        self.__addSemicolon(mark)
+        
+        if update:
+            yield update
+            
+        buffer.append(")")
+        yield node.body
 
         self.__handleForcedSemicolon(node.body)
-        return result
     
        
        
@@ -474,48 +794,63 @@ class Compressor:
             [thenPart,elsePart] = [elsePart,thenPart]
             condition = condition[0]
     
-        return "%s?%s:%s" % (self.compress(condition), self.compress(thenPart), self.compress(elsePart))
+        write = self.__write
+        yield condition
+        write("?")
+        yield thenPart
+        write(":")
+        yield elsePart
     
     
     def type_if(self, node):
-        result = "if(%s)%s" % (self.compress(node.condition), self.compress(node.thenPart))
+        buffer = self.__buffer
+        buffer.append("if(")
+        yield node.condition
+        buffer.append(")")
+        yield node.thenPart
 
         elsePart = getattr(node, "elsePart", None)
         if elsePart:
-            result += "else"
+            buffer.append("else")
+            space = self.__placeholder()
 
-            elseCode = self.compress(elsePart)
+            yield elsePart
         
             # Micro optimization: Don't need a space when the child is a block
             # At this time the brace could not be part of a map declaration (would be a syntax error)
-            if not elseCode.startswith(("{", "(", ";")):
-                result += " "        
-            
-            result += elseCode
+            if not self.__startsWith(space, ("{", "(", ";")):
+                buffer[space] = " "
         
             self.__handleForcedSemicolon(elsePart)
-        
-        return result
 
 
     def type_switch(self, node):
-        result = "switch(%s){" % self.compress(node.discriminant)
+        buffer = self.__buffer
+        mark = len(buffer)
+        
+        buffer.append("switch(")
+        yield node.discriminant
+        buffer.append("){")
+        
         for case in node:
             if case.type == "case":
-                labelCode = self.compress(case.label)
-                if labelCode.startswith('"'):
-                    result += "case%s:" % labelCode
-                else:
-                    result += "case %s:" % labelCode
+                keyword = len(buffer)
+                buffer.append("case ")
+                yield case.label
+                if self.__startsWith(keyword + 1, '"'):
+                    buffer[keyword] = "case"
+                buffer.append(":")
+                    
             elif case.type == "default":
-                result += "default:"
+                buffer.append("default:")
             else:
                 continue
         
             for statement in case.statements:
-                temp = self.compress(statement)
-                if len(temp) > 0:
-                    result += self.__addSemicolon(temp)
+                statementMark = len(buffer)
+                yield statement
+                if not self.__isEmpty(statementMark):
+                    self.__addSemicolon(statementMark)
         
-        return "%s}" % self.__removeSemicolon(result)
-        
\ No newline at end of file
+        self.__removeSemicolon(mark)
+        buffer.append("}")
@@ -0,0 +1,414 @@
+#
+# Jasy - JavaScript Tooling Framework
+# Copyright 2010-2011 Sebastian Werner
+#
+
+from jasy.parser.Node import NodeIndex, getParentSlot
+from jasy.parser.Traversal import Visitor, walk
+
+__all__ = ["Scope", "Binding", "ScopesVisitor", "createScopes", "getScope"]
+
+#
+# The scope table is updated by the mutation methods of Node (append, insert, replace and remove):
+# it observes the node index of the tree (see NodeIndex.addObserver()). Nodes removed from the tree
+# are dropped from their bindings, added nodes are registered in the scope they are added to (as
+# seen from their position at that time). Accesses are bound when they are registered, declarations
+# added or removed later do not rebind them. Other modifications of nodes (e.g. of their names and
+# values) are not tracked, variables are renamed using Binding.rename().
+#
+
+
+#
+# Public API
+#
+
+def createScopes(node):
+    """
+    Builds the scope table of the given tree in one walk. Each script node gets its Scope
+    (see getScope()). The table observes the node index of the tree (which is attached when
+    missing) to stay up to date with the tree. Returns the scope of the given node.
+    """
+
+    nodeIndex = node.getIndex()
+    if nodeIndex is None:
+        nodeIndex = node._index = NodeIndex(node)
+
+    # Replaces the previous table of the tree
+    previous = getattr(node, "_scope", None)
+    if previous is not None:
+        nodeIndex.removeObserver(previous)
+
+    root = walk(node, ScopesVisitor())[0].result
+    nodeIndex.addObserver(root)
+
+    return root
+
+
+def getScope(node):
+    """ Returns the scope the given node is part of (None for trees without scope table) """
+
+    try:
+        while node.type != "script":
+            node = getParentSlot(node)
+    except AttributeError:
+        return None
+
+    return getattr(node, "_scope", None)
+
+
+
+class Binding:
+    """
+    A name declared in a scope (param, variable, function or exception) together with the nodes
+    declaring it and the nodes accessing it (identifiers, also those of inner scopes). Both are
+    stored by node ID and only contain nodes which are part of the tree.
+    """
+
+    __slots__ = ["name", "scope", "declarations", "references"]
+
+    def __init__(self, name, scope):
+        self.name = name
+        self.scope = scope
+        self.declarations = {}
+        self.references = {}
+
+
+    def addDeclaration(self, node):
+        self.declarations[id(node)] = node
+        self.scope.nodes[id(node)] = self
+
+
+    def addReference(self, node):
+        self.references[id(node)] = node
+        self.scope.nodes[id(node)] = self
+
+
+    def getDeclarations(self):
+        """ Returns the declaring nodes """
+        return list(self.declarations.values())
+
+
+    def getReferences(self):
+        """ Returns the accessing nodes """
+        return list(self.references.values())
+
+
+    def isAccessed(self):
+        """ Whether the name is accessed by at least one node """
+        return len(self.references) > 0
+
+
+    def rename(self, name):
+        """ Renames all declarations and references """
+        for node in self.getDeclarations() + self.getReferences():
+            if node.type in ("identifier", "exception"):
+                node.value = name
+            else:
+                node.name = name
+
+        self.name = name
+
+
+
+class Scope:
+    """
+    Variables of one scope (script node): the params of its function, the declared names and their
+    bindings. Names accessed in the scope (or inner scopes) but bound outside are "shared". The scopes
+    of a tree share the table of the bindings by node ID ("nodes") which is used to drop removed nodes
+    and the visitor which registers added nodes.
+    """
+
+    __slots__ = ["node", "parent", "children", "params", "declared", "bindings", "shared", "nodes", "visitor"]
+
+    def __init__(self, node, parent=None):
+        self.node = node
+        self.parent = parent
+        self.children = []
+
+        self.params = set()
+        self.declared = set()
+        self.bindings = {}
+        self.shared = set()
+
+        if parent is not None:
+            parent.children.append(self)
+            self.nodes = parent.nodes
+            self.visitor = parent.visitor
+        else:
+            self.nodes = {}
+            self.visitor = None
+
+
+    def declare(self, name, node, param=False):
+        """ Adds the given declaring node to the binding of the given name in this scope """
+        binding = self.bindings.get(name)
+        if binding is None:
+            binding = self.bindings[name] = Binding(name, self)
+
+        binding.addDeclaration(node)
+
+        if param:
+            self.params.add(name)
+        else:
+            self.declared.add(name)
+
+        return binding
+
+
+    def lookup(self, name):
+        """ Returns the binding of the given name as seen from this scope (None for global names) """
+        scope = self
+        while scope is not None:
+            binding = scope.bindings.get(name)
+            if binding is not None:
+                return binding
+
+            scope = scope.parent
+
+        return None
+
+
+    def addReference(self, node, name=None):
+        """ Registers a node of this scope which accesses the given name (defaults to its value) """
+        if name is None:
+            name = node.value
+
+        scope = self
+        while scope is not None:
+            binding = scope.bindings.get(name)
+            if binding is not None:
+                binding.addReference(node)
+                return binding
+
+            scope.shared.add(name)
+            scope = scope.parent
+
+        return None
+
+
+    def getUnused(self):
+        """ Returns the set of declared names (and params) which are not accessed anymore """
+        bindings = self.bindings
+        return set([name for name in bindings if not bindings[name].isAccessed()])
+
+
+    def getRoot(self):
+        scope = self
+        while scope.parent is not None:
+            scope = scope.parent
+
+        return scope
+
+
+    def addTree(self, node):
+        """ Registers the given node (just added to the tree) and its descendants in the scope table """
+        scope = getScope(getParentSlot(node))
+        if scope is None:
+            return
+
+        visitor = self.__getVisitor(scope)
+        walk(node, visitor)
+        self.__resolve(scope, visitor.pending[0])
+
+
+    def moveTree(self, node, previous):
+        """ Updates the scope table for the given node which has been moved from the given previous parent """
+        before = getScope(previous)
+        scope = getScope(getParentSlot(node))
+
+        if before is None or scope is not before or node.type == "script":
+            if before is not None:
+                self.removeTree(node)
+
+            if scope is not None:
+                self.addTree(node)
+
+            return
+
+        # Inside the same scope only the registrations which depend on the parent can change (the
+        # node itself and its children, e.g. declarations of a "var" moved out of a for-in loop)
+        visitor = self.__getVisitor(scope)
+        for current in [node] + [child for child in node if child is not None]:
+            if current.type == "identifier" or current.type == "declaration":
+                self.__unregister(current)
+                for types, handler in visitor.enterHandlers:
+                    if current.type in types:
+                        handler(current)
+
+        self.__resolve(scope, visitor.pending[0])
+
+
+    def removeTree(self, node):
+        """ Drops the given node (just removed from the tree) and its descendants from the scope table """
+        nodes = self.nodes
+        todo = [node]
+        while todo:
+            node = todo.pop()
+            binding = nodes.pop(id(node), None)
+            if binding is not None:
+                binding.declarations.pop(id(node), None)
+                binding.references.pop(id(node), None)
+
+            if node.type == "script":
+                scope = getattr(node, "_scope", None)
+                if scope is not None:
+                    del node._scope
+                    if scope.parent is not None and scope in scope.parent.children:
+                        scope.parent.children.remove(scope)
+
+            # Children which have been moved to another parent (e.g. the replacement of the node) stay in the tree
+            for child in node:
+                if child is not None and getattr(child, "parent", None) is node:
+                    todo.append(child)
+
+
+    def __unregister(self, node):
+        binding = self.nodes.pop(id(node), None)
+        if binding is not None:
+            binding.declarations.pop(id(node), None)
+            binding.references.pop(id(node), None)
+
+
+    def __getVisitor(self, scope):
+        """ Returns the visitor of the table, prepared for nodes added to the given scope """
+        visitor = self.visitor
+        if visitor is None:
+            visitor = ScopesVisitor()
+            for member in self.getRoot().walk():
+                member.visitor = visitor
+
+        visitor.reset(scope)
+        return visitor
+
+
+    def __resolve(self, scope, pending):
+        """ Registers the accesses which are not bound by the nodes added to the given scope """
+        for name, reference in pending:
+            scope.addReference(reference, name)
+
+
+    def walk(self):
+        """ Returns this scope and all inner scopes, outer scopes first """
+        result = []
+        todo = [self]
+        while todo:
+            scope = todo.pop()
+            result.append(scope)
+            todo.extend(reversed(scope.children))
+
+        return result
+
+
+
+#
+# Implementation
+#
+
+class ScopesVisitor(Visitor):
+    """ 
+    Builds the scope table: declarations and accesses of variables per scope (script node). Nodes
+    added to an existing table are walked with their scope, the accesses which are not bound by the
+    walked nodes are kept in "pending".
+    """
+
+    def __init__(self, scope=None):
+        Visitor.__init__(self)
+        self.reset(scope)
+
+        self.onEnter(("script",), self.__enterScope)
+        self.onLeave(("script",), self.__leaveScope)
+        self.onEnter(("function",), self.__enterFunction)
+        self.onEnter(("declaration",), self.__enterDeclaration)
+        self.onEnter(("identifier",), self.__enterIdentifier)
+        self.onEnter(("block",), self.__enterBlock)
+
+
+    def reset(self, scope=None):
+        """ Prepares the visitor for another walk (of nodes added to the given scope) """
+        self.scopes = [scope] if scope is not None else []
+        self.pending = [[]] if scope is not None else []
+        self.result = None
+
+
+    def __enterScope(self, node):
+        scope = Scope(node, self.scopes[-1] if self.scopes else None)
+        node._scope = scope
+
+        # Params of the function the scope belongs to
+        if getattr(node, "rel", None) == "body" and node.parent.type == "function":
+            paramList = getattr(node.parent, "params", None)
+            if paramList:
+                for paramIdentifier in paramList:
+                    scope.declare(paramIdentifier.value, paramIdentifier, True)
+
+        self.scopes.append(scope)
+        self.pending.append([])
+
+
+    def __leaveScope(self, node):
+        scope = self.scopes.pop()
+        pending = self.pending.pop()
+
+        # Accesses are resolved at the end of the scope as declarations are valid in the whole scope
+        bindings = scope.bindings
+        outer = self.pending[-1] if self.pending else None
+        for name, reference in pending:
+            if name in bindings:
+                bindings[name].addReference(reference)
+            else:
+                scope.shared.add(name)
+                if outer is not None:
+                    outer.append((name, reference))
+
+        if not self.scopes:
+            self.result = scope
+
+
+    def __enterFunction(self, node):
+        functionName = getattr(node, "name", None)
+        if functionName:
+            self.scopes[-1].declare(functionName, node)
+
+
+    def __enterDeclaration(self, node):
+        scope = self.scopes[-1]
+
+        # Variables used as an iterator of for-in loops are accessed by the loop
+        iterator = getattr(node.parent, "rel", None) == "iterator"
+
+        varName = getattr(node, "name", None)
+        if varName != None:
+            scope.declare(varName, node)
+            if iterator:
+                self.pending[-1].append((varName, node))
+
+        else:
+            # JS 1.7 Destructing Expression
+            for identifier in node.names:
+                scope.declare(identifier.value, identifier)
+                if iterator:
+                    self.pending[-1].append((identifier.value, identifier))
+
+
+    def __enterIdentifier(self, node):
+        parent = node.parent
+
+        # Ignore parameter names (of inner functions, these are handled by __enterScope)
+        if parent.type == "list" and getattr(parent, "rel", None) == "params":
+            pass
+
+        # Ignore property initialization names
+        elif parent.type == "property_init" and parent[0] == node:
+            pass
+
+        # Ignore non first identifiers in dot-chains
+        elif parent.type != "dot" or parent[0] is node:
+            if node.value != "arguments":
+                self.pending[-1].append((node.value, node))
+
+
+    def __enterBlock(self, node):
+        # Treat exception variables in catch blocks like declared
+        if node.parent.type == "catch":
+            exception = node.parent.exception
+            self.scopes[-1].declare(exception.value, exception)
@@ -0,0 +1,104 @@
+#
+# Jasy - JavaScript Tooling Framework
+# Copyright 2010-2011 Sebastian Werner
+#
+
+import json
+
+__all__ = ["SourceMap", "generate"]
+
+
+__base64 = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+
+
+def encode(value):
+    """ Returns the Base64 VLQ representation of the given integer """
+
+    vlq = ((-value) << 1) | 1 if value < 0 else value << 1
+    result = ""
+
+    while True:
+        digit = vlq & 31
+        vlq >>= 5
+        if vlq:
+            digit |= 32
+
+        result += __base64[digit]
+        if not vlq:
+            return result
+
+
+
+class SourceMap:
+    """
+    Source map (revision 3) for generated code based on a list of (offset in code, file ID, zero based line)
+    mappings as returned by the compressor and the combiner. Lines are mapped only, all
+    mappings point to the first column of their source line.
+    """
+
+    def __init__(self, code, mappings, getPath=None):
+        self.__sources = []
+        self.__mappings = self.__encode(code, mappings, getPath)
+
+
+    def __encode(self, code, mappings, getPath):
+        sources = self.__sources
+        sourceIndex = {}
+
+        lines = []
+        segments = []
+
+        # Generated line/column, previous values of the relative fields
+        lineStart = 0
+        nextLine = code.find("\n")
+        previousColumn = 0
+        previousSource = 0
+        previousLine = 0
+
+        for offset, fileId, line in mappings:
+            while nextLine != -1 and offset > nextLine:
+                lines.append(",".join(segments))
+                segments = []
+                lineStart = nextLine + 1
+                nextLine = code.find("\n", lineStart)
+                previousColumn = 0
+
+            if not fileId in sourceIndex:
+                sourceIndex[fileId] = len(sources)
+                sources.append(getPath(fileId) if getPath else fileId)
+
+            column = offset - lineStart
+            source = sourceIndex[fileId]
+
+            # Source lines are zero based, in the map as well as in the tree
+            segments.append(encode(column - previousColumn) + encode(source - previousSource) + encode(line - previousLine) + "A")
+
+            previousColumn = column
+            previousSource = source
+            previousLine = line
+
+        lines.append(",".join(segments))
+        return ";".join(lines)
+
+
+    def export(self, fileName=None):
+        """ Returns the JSON representation of the source map """
+
+        result = {
+            "version" : 3,
+            "sources" : self.__sources,
+            "names" : [],
+            "mappings" : self.__mappings
+        }
+
+        if fileName:
+            result["file"] = fileName
+
+        return json.dumps(result)
+
+
+
+def generate(code, mappings, fileName=None, getPath=None):
+    """ Returns the JSON of a source map for the given code and mappings """
+
+    return SourceMap(code, mappings, getPath).export(fileName)
@@ -5,12 +5,13 @@
 
 import logging
 from jasy.process.Compressor import compress
+from jasy.parser.Traversal import Visitor, walk
 
 
-__all__ = ["scan"]
+__all__ = ["VariablesVisitor", "scan"]
 
 def scan(node):
-    return __scanScope(node)
+    return walk(node, VariablesVisitor())[0].result
     
     
 class Stats:
@@ -53,16 +54,65 @@ class Stats:
 # Implementation
 #
 
-def __scanNode(node, stats):
-    """ Scans nodes recursively and collects all variables which are declared and accessed. """
+class VariablesVisitor(Visitor):
+    """ Collects all variables which are declared and accessed, per scope (script node) """
     
-    if node.type == "function":
+    def __init__(self):
+        Visitor.__init__(self)
+        self.scopes = []
+        self.result = None
+        
+        self.onEnter(("script",), self.__enterScope)
+        self.onLeave(("script",), self.__leaveScope)
+        self.onEnter(("function",), self.__enterFunction)
+        self.onEnter(("declaration",), self.__enterDeclaration)
+        self.onEnter(("identifier",), self.__enterIdentifier)
+        self.onEnter(("block",), self.__enterBlock)
+        
+        
+    def __enterScope(self, node):
+        # Initialize statistics object for this scope
+        stats = Stats()
+        node.stats = stats
+        
+        # Add params to declaration list
+        self.__addParams(node, stats)
+        
+        self.scopes.append(stats)
+        
+        
+    def __leaveScope(self, node):
+        innerStats = self.scopes.pop()
+        self.__finishScope(innerStats)
+        
+        if not self.scopes:
+            self.result = innerStats
+            return
+            
+        stats = self.scopes[-1]
+        for name in innerStats.shared:
+            stats.increment(name, innerStats.shared[name])
+            
+            if name in innerStats.modified:
+                stats.modified.add(name)
+        
+        for package in innerStats.packages:
+            if package in stats.packages:
+                stats.packages[package] += innerStats.packages[package]
+            else:
+                stats.packages[package] = innerStats.packages[package]
+                
+                
+    def __enterFunction(self, node):
         functionName = getattr(node, "name", None)
         if functionName:
+            stats = self.scopes[-1]
             stats.declared.add(functionName)
             stats.modified.add(functionName)
-    
-    elif node.type == "declaration":
+            
+            
+    def __enterDeclaration(self, node):
+        stats = self.scopes[-1]
         varName = getattr(node, "name", None)
         if varName != None:
             stats.declared.add(varName)
@@ -76,7 +126,6 @@ def __scanNode(node, stats):
             
         else:
             # JS 1.7 Destructing Expression
-            varNames = node.names
             for identifier in node.names:
                 stats.declared.add(identifier.value)
                 stats.modified.add(identifier.value)
@@ -85,58 +134,80 @@ def __scanNode(node, stats):
             if getattr(node.parent, "rel", None) == "iterator":
                 for identifier in node.names:
                     stats.increment(identifier.value)
-            
-    elif node.type == "identifier":
-        # Ignore parameter names (of inner functions, these are handled by __scanScope)
-        if node.parent.type == "list" and getattr(node.parent, "rel", None) == "params":
+                    
+                    
+    def __enterIdentifier(self, node):
+        parent = node.parent
+        
+        # Ignore parameter names (of inner functions, these are handled by __enterScope)
+        if parent.type == "list" and getattr(parent, "rel", None) == "params":
             pass
         
         # Ignore property initialization names
-        elif node.parent.type == "property_init" and node.parent[0] == node:
+        elif parent.type == "property_init" and parent[0] == node:
             pass
             
         # Ignore non first identifiers in dot-chains
-        elif node.parent.type != "dot" or node.parent.index(node) == 0:
+        elif parent.type != "dot" or parent.index(node) == 0:
             if node.value != "arguments":
+                stats = self.scopes[-1]
                 stats.increment(node.value)
             
-                if node.parent.type in ("increment", "decrement"):
+                if parent.type in ("increment", "decrement"):
                     stats.modified.add(node.value)
                 
-                elif node.parent.type == "assign" and node.parent[0] == node:
+                elif parent.type == "assign" and parent[0] == node:
                     stats.modified.add(node.value)
 
                 # Support for package-like object access
-                if node.parent.type == "dot":
+                if parent.type == "dot":
                     package = combinePackage(node)
                     if package in stats.packages:
                         stats.packages[package] += 1
                     else:
                         stats.packages[package] = 1
-                
-    # Treat exception variables in catch blocks like declared
-    elif node.type == "block" and node.parent.type == "catch":
-        stats.declared.add(node.parent.exception.value)                
-    
-    if node.type == "script":
-        innerStats = __scanScope(node)
-        for name in innerStats.shared:
-            stats.increment(name, innerStats.shared[name])
+                        
+                        
+    def __enterBlock(self, node):
+        # Treat exception variables in catch blocks like declared
+        if node.parent.type == "catch":
+            self.scopes[-1].declared.add(node.parent.exception.value)
+
+
+    def __finishScope(self, stats):
+        """ Computes the shared and unused variables of a scope after all its children have been scanned """
+    
+        # Remove all objects which are based on locally declared variables
+        for name in list(stats.packages):
+            top = name[0:name.index(".")]
+            if top in stats.declared or top in stats.params:
+                del stats.packages[name]
+    
+        # Look for accessed varibles which have not been defined
+        # Might be a part of a closure or just a mistake
+        for name in stats.accessed:
+            if name not in stats.declared and name not in stats.params and name != "arguments":
+                stats.shared[name] = stats.accessed[name]
             
-            if name in innerStats.modified:
-                stats.modified.add(name)
-        
-        for package in innerStats.packages:
-            if package in stats.packages:
-                stats.packages[package] += innerStats.packages[package]
-            else:
-                stats.packages[package] = innerStats.packages[package]
-                
-    else:
-        for child in node:
-            # None children are allowed sometimes e.g. during array_init like [1,2,,,7,8]
-            if child != None:
-                __scanNode(child, stats)
+        # Look for variables which have been defined, but not accessed.
+        for name in stats.params:
+            if not name in stats.accessed:
+                stats.unused.add(name)
+        for name in stats.declared:
+            if not name in stats.accessed:
+                stats.unused.add(name)
+
+
+    def __addParams(self, node, stats):
+        """ Adds all param names from outer function to the definition list """
+
+        rel = getattr(node, "rel", None)
+        if rel == "body" and node.parent.type == "function":
+            paramList = getattr(node.parent, "params", None)
+            if paramList:
+                for paramIdentifier in paramList:
+                    stats.params.add(paramIdentifier.value)
+
 
 
 def combinePackage(node):
@@ -149,56 +220,3 @@ def combinePackage(node):
         parent = parent.parent
 
     return ".".join(result)
-    
-    
-def __scanScope(node):
-    """ Scans a scope and collects statistics on variable declaration and usage """
-    
-    # Initialize statistics object for this scope
-    stats = Stats()
-    node.stats = stats
-    
-    # Add params to declaration list
-    __addParams(node, stats)
-
-    # Collect all stats from all children (excluding sub-scopes)
-    for child in node:
-        __scanNode(child, stats)
-        
-    # Remove all objects which are based on locally declared variables
-    for name in list(stats.packages):
-        top = name[0:name.index(".")]
-        if top in stats.declared or top in stats.params:
-            del stats.packages[name]
-    
-    # Look for accessed varibles which have not been defined
-    # Might be a part of a closure or just a mistake
-    for name in stats.accessed:
-        if name not in stats.declared and name not in stats.params and name != "arguments":
-            stats.shared[name] = stats.accessed[name]
-            
-    # Look for variables which have been defined, but not accessed.
-    for name in stats.params:
-        if not name in stats.accessed:
-            stats.unused.add(name)
-    for name in stats.declared:
-        if not name in stats.accessed:
-            stats.unused.add(name)
-    
-    # print("Quit Scope [Line:%s]" % node.line)
-    # stats.output()
-    
-    return stats
-    
-    
-    
-def __addParams(node, stats):
-    """ Adds all param names from outer function to the definition list """
-
-    rel = getattr(node, "rel", None)
-    if rel == "body" and node.parent.type == "function":
-        paramList = getattr(node.parent, "params", None)
-        if paramList:
-            for paramIdentifier in paramList:
-                stats.params.add(paramIdentifier.value)
-    
\ No newline at end of file
@@ -3,6 +3,7 @@
 # Copyright 2010-2011 Sebastian Werner
 #
 
+import logging
 import markdown2
 
 class CommentException(Exception):
@@ -14,31 +15,79 @@ class CommentException(Exception):
             
 
 class Comment():
+    """
+    Comment as found in the source code. The text is stored as it was found
+    in the source. Outdenting, doc processing and tag extraction happen lazily
+    on first access of the text or tags so that compression only runs do not
+    need to pay for it. Comments whose content turns out to be invalid are
+    ignored by the consumers of the tree (see isValid()), like the tokenizer
+    dropped them before.
+    """
+    
     def __init__(self, text, variant, context, lineNo=0, indent=""):
         self.variant = variant
         self.context = context
-        self.tags = None
         
-        if variant == "single":
-            text = text[2:].strip()
-            
-        elif variant == "multi":
-            text = self.__outdent(text, indent, lineNo)
-            if text.startswith("/**"):
-                variant = "doc"
-                text = self.__processDoc(text, lineNo)
-
-                # Docs first and last line is removed, we need to add the missing line here
-                text = self.__extractTags(text, lineNo+1)
-                
-            else:
-                text = text[2:-2]
-
-        self.text = text
+        self.__source = text
+        self.__lineNo = lineNo
+        self.__indent = indent
+        self.__processed = False
+        self.__valid = True
+        self.__text = None
+        self.__tags = None
         
     
     def getTags(self):
-        return self.tags
+        if not self.__processed:
+            self.__process()
+            
+        return self.__tags
+        
+        
+    def isValid(self):
+        """ Whether the content of the comment could be processed """
+        if not self.__processed:
+            self.__process()
+            
+        return self.__valid
+        
+        
+    def getText(self):
+        if not self.__processed:
+            self.__process()
+            
+        return self.__text
+        
+    text = property(getText)
+        
+        
+    def __process(self):
+        text = self.__source
+        lineNo = self.__lineNo
+        self.__processed = True
+        
+        try:
+            if self.variant == "single":
+                text = text[2:].strip()
+
+            elif self.variant == "multi":
+                text = self.__outdent(text, self.__indent, lineNo)
+                if text.startswith("/**"):
+                    text = self.__processDoc(text, lineNo)
+
+                    # Docs first and last line is removed, we need to add the missing line here
+                    text = self.__extractTags(text, lineNo+1)
+
+                else:
+                    text = text[2:-2]
+                    
+        except CommentException as commentError:
+            logging.debug("Ignoring invalid comment: %s" % commentError)
+            self.__valid = False
+            self.__tags = None
+            text = None
+            
+        self.__text = text
         
 
     def __outdent(self, text, indent, lineNo):
@@ -183,7 +232,7 @@ class Comment():
 
         # Store tags
         if result:
-            self.tags = result
+            self.__tags = result
 
         # Overall description as final comment text
         return "\n".join(description)        
@@ -11,9 +11,8 @@
 #
 
 import re
-from copy import copy
 from jasy.tokenizer.Lang import keywords
-from jasy.tokenizer.Comment import Comment, CommentException
+from jasy.tokenizer.Comment import Comment
 
 __all__ = [ "Tokenizer" ]
 
@@ -75,12 +74,122 @@ assignOperators = ["|", "^", "&", "<<", ">>", ">>>", "+", "-", "*", "/", "%"]
 
 
 
+#
+# Regex engine data
+#
+
+# Punctuator source text to (token type, assign operator) including the
+# assignment variants. As all prefixes of operators are valid operators
+# the longest match is identical to the greedy lexing of lexOp().
+punctuatorTable = {}
+for __op in operatorNames:
+    punctuatorTable[__op] = (operatorNames[__op], None)
+for __op in assignOperators:
+    punctuatorTable[__op + "="] = ("assign", operatorNames[__op])
+
+def __buildPunctuators(exclude=()):
+    ops = [op for op in punctuatorTable if not op.startswith(exclude)]
+    return "|".join([re.escape(op) for op in sorted(ops, key=len, reverse=True)])
+
+# Whitespace and line breaks in front of the token are part of the match. Comments
+# are only detected (the tokenizer then skips them, see skipRegex()). Numbers which
+# may have an exponent are matched without it being mandatory. Whenever an "e"
+# directly follows a number without exponent the engine reports the missing exponent.
+__tokenPattern = r"""
+    [ \t\xA0\n]*
+    (?:
+    (?P<identifier>[a-zA-Z$_][a-zA-Z0-9$_]*)
+  | (?P<comment>/[*/])
+  | %s
+    (?P<punctuator>%s)
+  | (?P<string>"[^"\\]*(?:\\[\s\S][^"\\]*)*"|'[^'\\]*(?:\\[\s\S][^'\\]*)*')
+  | (?P<dotnumber>\.[0-9]+(?P<dotexp>[eE][+-]?[0-9]+)?)
+  | (?P<dot>\.)
+  | (?P<decimal>[1-9][0-9]*(?P<floating>\.[0-9]*)?(?P<decexp>[eE][+-]?[0-9]+)?)
+  | (?P<zeronumber>0(?:[xX][0-9a-fA-F]*|[0-7]+|\.[0-9]*(?P<zeroexp>[eE][+-]?[0-9]+)?))
+  | (?P<zero>0(?P<exp>[eE][+-]?[0-9]+)?)
+    )
+"""
+
+# Regular expressions are only allowed where an operand is expected. There a slash
+# always starts a regular expression (like in lexRegExp()) and never a division.
+operandMatcher = re.compile(__tokenPattern % (
+    r"(?P<regexp>/(?:[^\\\[/]|\\[\s\S]|\[(?:[^\\\]]|\\[\s\S])*\])*/[a-z]*)|",
+    __buildPunctuators(exclude="/")), re.VERBOSE).match
+operatorMatcher = re.compile(__tokenPattern % ("", __buildPunctuators()), re.VERBOSE).match
+
+# Runs of whitespace, optionally spanning multiple lines (then returning the last indent)
+whitespaceMatcher = re.compile(r"[ \t\xA0]+").match
+multiLineMatcher = re.compile(r"(?:[ \t\xA0]*\n)+([ \t\xA0]*)").match
+
+keywordSet = frozenset(keywords)
+
+
+
+#
+# String literals
+#
+
+# Single character escapes. Line continuations are removed. All other escaped
+# characters (e.g. quotes, backslash, slash) stand for themselves.
+escapeTable = {
+    "b" : "\b",
+    "f" : "\f",
+    "n" : "\n",
+    "r" : "\r",
+    "t" : "\t",
+    "v" : "\v",
+    
+    "\n" : "",
+    "\r" : "",
+    "\r\n" : "",
+    "\u2028" : "",
+    "\u2029" : ""
+}
+
+# Legacy octal escapes are limited to \377 like in JavaScript.
+escapeMatcher = re.compile(r"\\(?:([0-3][0-7]{0,2}|[4-7][0-7]?)|x([0-9a-fA-F]{2})|u([0-9a-fA-F]{4})|(\r\n|[\s\S]))")
+
+def __decodeEscape(match):
+    octal, hexCode, unicodeCode, char = match.groups()
+    if char is not None:
+        if char == "x" or char == "u":
+            raise ValueError("Invalid escape sequence: \\%s" % char)
+            
+        return escapeTable.get(char, char)
+        
+    return chr(int(octal, 8) if octal else int(hexCode or unicodeCode, 16))
+
+def decodeString(value):
+    """ Returns the value of the given string literal content (without quotes) """
+    
+    if not "\\" in value:
+        return value
+        
+    return escapeMatcher.sub(__decodeEscape, value)
+
+
+
+
 #
 # Classes
 #
 
-class Token: 
-    pass
+class Token:
+    """
+    Token record. The tokenizer keeps a ring of four of these records
+    which are reused for every new token (no allocation per token).
+    """
+    
+    __slots__ = ["type", "value", "start", "end", "line", "assignOp"]
+    
+    def __init__(self):
+        self.type = None
+        self.value = None
+        self.start = None
+        self.end = None
+        self.line = None
+        self.assignOp = None
 
 
 class ParseError(Exception):
@@ -89,22 +198,29 @@ class ParseError(Exception):
 
 
 class Tokenizer(object):
-    def __init__(self, source, fileId="", line=1):
+    def __init__(self, source, fileId="", line=1, engine="classic"):
         # source: JavaScript source
         # fileId: Filename (for debugging proposes)
         # line: Line number (for debugging proposes)
+        # engine: Lexing engine to use: "classic" (character based) or "regex" (master patterns)
         self.cursor = 0
         self.source = str(source)
-        self.tokens = {}
+        self.tokens = [None, None, None, None]
         self.tokenIndex = 0
+        self.token = None
         self.lookahead = 0
         self.scanNewlines = False
         self.fileId = fileId
         self.line = line
         self.comments = []
+        
+        if engine == "regex":
+            self.skip = self.skipRegex
+            self.get = self.getRegex
+        elif engine != "classic":
+            raise Exception("Unsupported tokenizer engine: %s" % engine)
 
     input_ = property(lambda self: self.source[self.cursor:])
-    token = property(lambda self: self.tokens.get(self.tokenIndex))
 
 
     def done(self):
@@ -126,7 +242,7 @@ class Tokenizer(object):
 
     def peek(self, scanOperand=False):
         if self.lookahead:
-            next = self.tokens.get((self.tokenIndex + self.lookahead) & 3)
+            next = self.tokens[(self.tokenIndex + self.lookahead) & 3]
             if self.scanNewlines and (getattr(next, "line", None) != getattr(self, "line", None)):
                 tokenType = "newline"
             else:
@@ -180,8 +296,6 @@ class Tokenizer(object):
                 
             elif ch == "/" and next == "*":
                 self.cursor += 1
-                text = "/*"
-                inline = startLine == self.line and startLine > 0
                 commentStartLine = self.line
                 if startLine > 0 and startLine == self.line:
                     mode = "inline"
@@ -190,35 +304,20 @@ class Tokenizer(object):
                 else:
                     mode = "block"
                     
-                while (True):
-                    try:
-                        ch = input[self.cursor]
-                        self.cursor += 1
-                    except IndexError:
-                        raise ParseError("Unterminated comment", self.fileId, self.line)
-                        
-                    if ch == "*":
-                        next = input[self.cursor]
-                        if next == "/":
-                            text += "*/"
-                            self.cursor += 1
-                            break
-                            
-                    elif ch == "\n":
-                        self.line += 1
-                        
-                    text += ch
+                end = input.find("*/", self.cursor)
+                if end == -1:
+                    self.line += input.count("\n", self.cursor)
+                    raise ParseError("Unterminated comment", self.fileId, self.line)
                     
-                try:
-                    self.comments.append(Comment(text, "multi", mode, commentStartLine, indent))
-                except CommentException as commentError:
-                    #print("Ignoring comment in %s: %s" % (self.fileId, commentError))
-                    pass
+                text = input[self.cursor-2:end+2]
+                self.line += text.count("\n")
+                self.cursor = end + 2
+                    
+                self.comments.append(Comment(text, "multi", mode, commentStartLine, indent))
                     
 
             elif ch == "/" and next == "/":
                 self.cursor += 1
-                text = "//"
                 if startLine > 0 and startLine == self.line:
                     mode = "inline"
                 elif (self.line-1) > startLine:
@@ -226,24 +325,17 @@ class Tokenizer(object):
                 else:
                     mode = "block"
                     
-                while (True):
-                    try:
-                        ch = input[self.cursor]
-                        self.cursor += 1
-                    except IndexError:
-                        return
-
-                    if ch == "\n":
-                        self.line += 1
-                        break
+                # An unterminated single line comment at the end of the file is dropped
+                end = input.find("\n", self.cursor)
+                if end == -1:
+                    self.cursor = len(input)
+                    return
                     
-                    text += ch
+                text = input[self.cursor-2:end]
+                self.line += 1
+                self.cursor = end + 1
                         
-                try:
-                    self.comments.append(Comment(text, "single", mode, self.line-1))
-                except CommentException:
-                    #print("Ignoring comment in %s: %s" % (self.fileId, commentError))
-                    pass
+                self.comments.append(Comment(text, "single", mode, self.line-1))
 
             # check for whitespace, also for special cases like 0xA0
             elif ch in "\xA0 \t":
@@ -395,7 +487,10 @@ class Tokenizer(object):
             self.cursor += 1
 
         if hasEscapes:
-            token.value = eval(input[token.start:self.cursor])
+            try:
+                token.value = decodeString(input[token.start+1:self.cursor-1])
+            except ValueError as error:
+                raise ParseError(str(error), self.fileId, self.line)
         else:
             token.value = input[token.start+1:self.cursor-1]
 
@@ -510,14 +605,20 @@ class Tokenizer(object):
         while self.lookahead:
             self.lookahead -= 1
             self.tokenIndex = (self.tokenIndex + 1) & 3
-            token = self.tokens[self.tokenIndex]
+            self.token = token = self.tokens[self.tokenIndex]
             if token.type != "newline" or self.scanNewlines:
                 return token.type
 
         self.skip()
 
-        self.tokenIndex = (self.tokenIndex + 1) & 3
-        self.tokens[self.tokenIndex] = token = Token()
+        self.tokenIndex = tokenIndex = (self.tokenIndex + 1) & 3
+        token = self.tokens[tokenIndex]
+        if token is None:
+            token = self.tokens[tokenIndex] = Token()
+        else:
+            token.value = None
+            token.assignOp = None
+        self.token = token
 
         token.start = self.cursor
         token.line = self.line
@@ -563,6 +664,183 @@ class Tokenizer(object):
         return token.type
         
 
+    #
+    # Regex Engine
+    #
+
+    def skipRegex(self):
+        """Eats comments and whitespace. Same as skip() but based on precompiled patterns."""
+        input = self.source
+        cursor = self.cursor
+        line = startLine = self.line
+        scanNewlines = self.scanNewlines
+        
+        indent = ""
+        
+        while True:
+            if not scanNewlines:
+                match = multiLineMatcher(input, cursor)
+                if match:
+                    line += match.group().count("\n")
+                    indent = match.group(1)
+                    cursor = match.end()
+
+            match = whitespaceMatcher(input, cursor)
+            if match:
+                indent += match.group()
+                cursor = match.end()
+                
+            if input.startswith("/", cursor):
+                next = input[cursor+1:cursor+2]
+                if next != "*" and next != "/":
+                    break
+
+                if startLine > 0 and startLine == line:
+                    mode = "inline"
+                elif (line-1) > startLine:
+                    mode = "section"
+                else:
+                    mode = "block"
+
+                if next == "*":
+                    end = input.find("*/", cursor+2)
+                    if end == -1:
+                        self.line = line + input.count("\n", cursor)
+                        raise ParseError("Unterminated comment", self.fileId, self.line)
+
+                    text = input[cursor:end+2]
+                    commentStartLine = line
+                    line += text.count("\n")
+                    cursor = end + 2
+
+                    self.comments.append(Comment(text, "multi", mode, commentStartLine, indent))
+                        
+                else:
+                    end = input.find("\n", cursor+2)
+                    
+                    # Like in skip() an unterminated single line comment at the end of the file is dropped
+                    if end == -1:
+                        self.cursor = len(input)
+                        self.line = line
+                        return
+
+                    text = input[cursor:end]
+                    line += 1
+                    cursor = end + 1
+                    
+                    self.comments.append(Comment(text, "single", mode, line-1))
+
+            else:
+                break
+                
+        self.cursor = cursor
+        self.line = line
+
+
+    def getRegex(self, scanOperand=False):
+        """ Same as get() but lexes the whitespace and the token using one precompiled master pattern."""
+        while self.lookahead:
+            self.lookahead -= 1
+            self.tokenIndex = (self.tokenIndex + 1) & 3
+            self.token = token = self.tokens[self.tokenIndex]
+            if token.type != "newline" or self.scanNewlines:
+                return token.type
+
+        self.tokenIndex = tokenIndex = (self.tokenIndex + 1) & 3
+        token = self.tokens[tokenIndex]
+        if token is None:
+            token = self.tokens[tokenIndex] = Token()
+        else:
+            token.value = None
+            token.assignOp = None
+        self.token = token
+        
+        input = self.source
+        cursor = self.cursor
+        matcher = operandMatcher if scanOperand else operatorMatcher
+
+        match = None if self.scanNewlines else matcher(input, cursor)
+        kind = match and match.lastgroup
+
+        if kind is None or kind == "comment":
+            # Comments, line breaks as tokens and the end of the input
+            self.skip()
+            cursor = self.cursor
+            token.start = cursor
+            token.line = self.line
+            
+            if cursor == len(input):
+                token.end = cursor
+                token.type = "end"
+                return "end"
+            
+            if self.scanNewlines and input[cursor] == "\n":
+                token.end = self.cursor = cursor + 1
+                token.type = "newline"
+                self.line += 1
+                return "newline"
+                
+            match = matcher(input, cursor)
+            kind = match and match.lastgroup
+            if kind is None:
+                raise ParseError("Illegal token: %s (Code: %s)" % (input[cursor], ord(input[cursor])), self.fileId, self.line)
+                
+        else:
+            start = match.start(kind)
+            if start != cursor:
+                self.line += input.count("\n", cursor, start)
+                
+            token.start = start
+            token.line = self.line
+            
+        if kind == "identifier":
+            value = match.group(kind)
+            if value in keywordSet:
+                token.type = value
+            else:
+                token.type = "identifier"
+                token.value = value
+                
+        elif kind == "punctuator":
+            token.type, token.assignOp = punctuatorTable[match.group(kind)]
+            
+        elif kind == "string":
+            value = match.group(kind)
+            token.type = "string"
+            if "\\" in value:
+                try:
+                    token.value = decodeString(value[1:-1])
+                except ValueError as error:
+                    raise ParseError(str(error), self.fileId, self.line)
+            else:
+                token.value = value[1:-1]
+                
+        elif kind == "dot":
+            token.type = "dot"
+            
+        elif kind == "regexp":
+            token.type = "regexp"
+            token.value = match.group(kind)
+            
+        else:
+            # Numbers (like lexExponent() an "e" without exponent is an error, but octal
+            # and hexadecimal numbers are never followed by an exponent)
+            token.type = "number"
+            value = match.group(kind)
+            if input.startswith(("e", "E"), match.end()) and not (kind == "zeronumber" and value[1] != "."):
+                raise ParseError("Missing exponent", self.fileId, self.line)
+            
+            if kind == "zero":
+                token.value = 0
+            elif kind == "decimal" and match.group("floating") is None and not match.group("decexp"):
+                token.value = int(value)
+            else:
+                token.value = value
+
+        token.end = self.cursor = match.end()
+        return token.type
+        
+
     def unget(self):
         """ Match depends on unget returning undefined."""
         self.lookahead += 1
@@ -571,13 +849,15 @@ class Tokenizer(object):
             raise ParseError("PANIC: too much lookahead!", self.fileId, self.line)
         
         self.tokenIndex = (self.tokenIndex - 1) & 3
+        self.token = self.tokens[self.tokenIndex]
         
     
     def save(self):
+        # Token records are reused, so we need to store their content
         return {
             "cursor" : self.cursor,
             "tokenIndex": self.tokenIndex,
-            "tokens": copy(self.tokens),
+            "tokens": [(token.type, token.value, token.start, token.end, token.line, token.assignOp) if token else None for token in self.tokens],
             "lookahead": self.lookahead,
             "scanNewlines": self.scanNewlines,
             "line": self.line
@@ -587,7 +867,16 @@ class Tokenizer(object):
     def rewind(self, point):
         self.cursor = point["cursor"]
         self.tokenIndex = point["tokenIndex"]
-        self.tokens = copy(point["tokens"])
         self.lookahead = point["lookahead"]
-        self.scanNewline = point["scanNewline"]
+        self.scanNewlines = point["scanNewlines"]
         self.line = point["line"]
+        
+        for index, data in enumerate(point["tokens"]):
+            if data is None:
+                self.tokens[index] = None
+            else:
+                token = self.tokens[index] or Token()
+                token.type, token.value, token.start, token.end, token.line, token.assignOp = data
+                self.tokens[index] = token
+
+        self.token = self.tokens[self.tokenIndex]
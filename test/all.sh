@@ -10,4 +10,15 @@ for file in `find $dir/blockreducer $dir/combinedeclarations $dir/localvariables
   diff tmp.js $file.res > /dev/null && echo ">>> $file: OK" || echo ">>> $file: FAIL"
 done
 
-rm -f tmp.js
\ No newline at end of file
+rm -f tmp.js
+
+python3 $dir/tokenizer.py $dir/compressor $dir/../data/jscore
+python3 $dir/prescan.py $dir/../data/jscore
+python3 $dir/deep.py
+python3 $dir/sourcemap.py
+python3 $dir/index.py
+python3 $dir/overlay.py
+python3 $dir/trees.py $dir/../data/jscore
+python3 $dir/parallel.py
+python3 $dir/classcache.py
+python3 $dir/scopes.py $dir/../data/jscore
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+
+#
+# Benchmarks for the tokenizer, the syntax trees and the compressor. Runs the
+# benchmarks given by name (default: all) on the files of the given folders
+# (default: data/jscore), e.g. "bench.py trees index data/jscore". The results
+# of the measured code are checked by the tests (see all.sh).
+#
+
+import sys, os, time, pickle, copy, tracemalloc, subprocess, types
+
+# Extend PYTHONPATH with 'lib'
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), os.pardir, "lib")))
+
+from jasy.tokenizer.Tokenizer import Tokenizer, decodeString
+from jasy.parser.Parser import parse
+from jasy.parser.Traversal import walk
+from jasy.parser.LeanBuilder import LeanBuilder
+from jasy.process.Compressor import compress
+from jasy.process.Variables import VariablesVisitor, scan
+from jasy.core.MetaData import MetaData, MetaDataVisitor
+from jasy.core.Permutation import KeysVisitor, getKeys, getPatchStatements
+from jasy.core.Translation import TextVisitor, hasText, getTextCalls
+
+
+def measure(func, rounds=1):
+    """ Returns the best duration of the given number of calls of func in milliseconds """
+    best = None
+    for round in range(rounds):
+        start = time.time()
+        func()
+        duration = time.time() - start
+        if best is None or duration < best:
+            best = duration
+
+    return best * 1000
+
+
+def countNodes(tree):
+    count = 0
+    todo = [tree]
+    while todo:
+        node = todo.pop()
+        if node is not None:
+            count += 1
+            todo.extend(node)
+
+    return count
+
+
+
+#
+# Benchmarks
+#
+
+def benchStrings(sources):
+    """ Decoding of escape-dense string literals """
+    literals = [
+        r'"Grüße \"%s\"\n\tvon \xfcber\n"',
+        r"'It\'s \x3Cb\x3E–bold–\x3C/b\x3E\r\n'",
+        r'"ABCDEFGHIJ"',
+        r'"tab\tseparated\tvalues\twith\\backslashes\\"',
+        r'"plain string without any escapes"'
+    ] * 20000
+
+    source = "\n".join(["x(%s);" % literal for literal in literals])
+
+    def tokenize(engine):
+        tokenizer = Tokenizer(source, "bench", 1, engine)
+        while tokenizer.get() != "end":
+            pass
+
+    print("%s literals, %s characters" % (len(literals), len(source)))
+    print("eval(): %.1fms, decodeString(): %.1fms" % (measure(lambda: [eval(literal) for literal in literals], 5), measure(lambda: [decodeString(literal[1:-1]) for literal in literals], 5)))
+    print("tokenizer classic: %.1fms, regex: %.1fms" % (measure(lambda: tokenize("classic"), 5), measure(lambda: tokenize("regex"), 5)))
+
+
+def benchTokenizer(sources):
+    """ Tokenizing with the classic and with the regex engine (operands detected like in PreScan) """
+    operandEnds = frozenset(["identifier", "number", "string", "regexp", "right_paren", "right_bracket", "this", "null", "true", "false", "increment", "decrement"])
+
+    def tokenize(engine):
+        for source, path in sources:
+            tokenizer = Tokenizer(source, path, 1, engine)
+            get = tokenizer.get
+            tokenType = None
+            while tokenType != "end":
+                tokenType = get(not tokenType in operandEnds)
+
+    print("%s files" % len(sources))
+    print("classic: %.1fms, regex: %.1fms" % (measure(lambda: tokenize("classic"), 5), measure(lambda: tokenize("regex"), 5)))
+
+
+def benchMemory(sources):
+    """ Memory allocated for the scanned trees """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    trees = []
+    for source, path in sources:
+        tree = parse(source, path)
+        scan(tree)
+        trees.append(tree)
+
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    nodes = sum([countNodes(tree) for tree in trees])
+    print("%s trees, %s nodes" % (len(trees), nodes))
+    print("%.1f KB total, %.1f bytes per node" % (size / 1024, size / nodes))
+
+
+def benchTrees(sources):
+    """ Storing and copying trees """
+    trees = []
+    for source, path in sources:
+        tree = parse(source, path)
+        scan(tree)
+        trees.append(tree)
+
+    dumps = [pickle.dumps(tree, pickle.HIGHEST_PROTOCOL) for tree in trees]
+
+    print("%s trees, %.1f KB pickled" % (len(trees), sum([len(dump) for dump in dumps]) / 1024))
+    print("pickle: %.1fms, unpickle: %.1fms, copy: %.1fms" % (
+        measure(lambda: [pickle.dumps(tree, pickle.HIGHEST_PROTOCOL) for tree in trees]),
+        measure(lambda: [pickle.loads(dump) for dump in dumps]),
+        measure(lambda: [copy.deepcopy(tree) for tree in trees])
+    ))
+
+
+def benchTraversal(sources):
+    """ Analyses of trees one after another and together in one walk """
+    trees = [parse(source, path) for source, path in sources]
+
+    def separate():
+        for tree in trees:
+            scan(tree)
+            MetaData(tree), getKeys(tree), hasText(tree)
+
+    def combined():
+        for tree in trees:
+            walk(tree, VariablesVisitor(), KeysVisitor(), TextVisitor(), MetaDataVisitor(MetaData()))
+
+    print("%s trees" % len(trees))
+    print("separate walks: %.1fms, single walk: %.1fms" % (measure(separate), measure(combined)))
+
+
+def benchIndex(sources):
+    """ Lookup of permutation statements and translation calls by walking and by node index """
+    plainParse = measure(lambda: [parse(source, path) for source, path in sources], 3)
+    indexedParse = measure(lambda: [parse(source, path, index=True) for source, path in sources], 3)
+
+    plain = [parse(source, path) for source, path in sources]
+    indexed = [parse(source, path, index=True) for source, path in sources]
+
+    def lookup(trees):
+        for tree in trees:
+            getPatchStatements(tree), getTextCalls(tree)
+
+    print("%s trees" % len(sources))
+    print("parse: %.1fms, with index: %.1fms" % (plainParse, indexedParse))
+    print("lookup by walking: %.1fms, by index: %.1fms (first, builds the index), %.1fms (again)" % (measure(lambda: lookup(plain)), measure(lambda: lookup(indexed)), measure(lambda: lookup(indexed))))
+
+
+def benchBuilder(sources):
+    """ Parsing with the VanillaBuilder and the LeanBuilder """
+    size = sum([len(source) for source, path in sources]) / 1024
+    vanilla = measure(lambda: [parse(source, path) for source, path in sources])
+    lean = measure(lambda: [parse(source, path, builder=LeanBuilder()) for source, path in sources])
+
+    print("%s files, %.1fKB" % (len(sources), size))
+    print("vanilla: %.1fms (%.0fKB/s), lean: %.1fms (%.0fKB/s)" % (vanilla, size / vanilla * 1000, lean, size / lean * 1000))
+
+
+# Last revision with the string concatenation emitter of the compressor
+baselineRevision = "c8f01ad^"
+
+def loadBaseline(revision, path="lib/jasy/process/Compressor.py"):
+    """ Returns the module at the given path as it was in the given revision of the repository """
+    root = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), os.pardir)
+    code = subprocess.check_output(["git", "show", "%s:%s" % (revision, path)], cwd=root).decode("utf-8")
+
+    module = types.ModuleType("baseline")
+    exec(compile(code, "%s:%s" % (revision, path), "exec"), module.__dict__)
+    return module
+
+
+def benchCompressor(sources):
+    """ Compression with the buffer emitter and with the string emitter of the baseline revision """
+    trees = [parse(source, path) for source, path in sources]
+    combined = parse("\n".join([source for source, path in sources] * 10), "combined")
+    baseline = loadBaseline(baselineRevision)
+
+    for tree in trees:
+        if baseline.compress(tree) != compress(tree):
+            print("different output: %s" % tree.fileId)
+
+    print("%s trees, baseline %s" % (len(trees), baselineRevision))
+    print("one by one: %.1fms (baseline: %.1fms)" % (measure(lambda: [compress(tree) for tree in trees], 10), measure(lambda: [baseline.compress(tree) for tree in trees], 10)))
+    print("combined (10 times): %.1fms (baseline: %.1fms)" % (measure(lambda: compress(combined), 3), measure(lambda: baseline.compress(combined), 3)))
+
+
+benchmarks = [
+    ("strings", benchStrings),
+    ("tokenizer", benchTokenizer),
+    ("memory", benchMemory),
+    ("trees", benchTrees),
+    ("traversal", benchTraversal),
+    ("index", benchIndex),
+    ("builder", benchBuilder),
+    ("compressor", benchCompressor)
+]
+
+
+if __name__ == "__main__":
+    root = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), os.pardir)
+    names = [name for name in sys.argv[1:] if name in dict(benchmarks)]
+    folders = [name for name in sys.argv[1:] if not name in dict(benchmarks)] or [os.path.join(root, "data", "jscore")]
+
+    sources = []
+    for folder in folders:
+        for dirPath, dirNames, fileNames in os.walk(folder):
+            for fileName in sorted(fileNames):
+                if fileName.endswith(".js"):
+                    path = os.path.join(dirPath, fileName)
+                    sources.append((open(path, encoding="utf-8").read(), path))
+
+    for name, bench in benchmarks:
+        if not names or name in names:
+            print("--- %s: %s" % (name, bench.__doc__.strip()))
+            bench(sources)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+#
+# Test for the caches of classes. Builds a class of a temporary project multiple
+# times (each time with a new project, like separate runs of a build script) and
+# checks that the parsed tree is read from the cache, that it is parsed again when
+# the source changes (replacing the previous entry), that just touching the file
+# does not parse it again and that the mappings are cached with the compressed code.
+#
+
+import sys, os, tempfile, shutil, shelve, hashlib
+
+# Extend PYTHONPATH with 'lib'
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), os.pardir, "lib")))
+
+import jasy.core.Class
+from jasy.process.Compressor import Compressor
+from jasy.Project import Project
+
+
+source = """
+cachetest.Foo = {
+  first : function(a) { return a + 1; },
+  second : function(b) { return b * 2; }
+};
+"""
+
+parsed = []
+parse = jasy.core.Class.parse
+
+def countingParse(text, fileId, *args, **kwargs):
+    parsed.append(fileId)
+    return parse(text, fileId, *args, **kwargs)
+
+jasy.core.Class.parse = countingParse
+
+compressed = []
+compress = Compressor.compress
+
+def countingCompress(self, node):
+    compressed.append(node.type)
+    return compress(self, node)
+
+Compressor.compress = countingCompress
+
+
+def build(folder, mappings=False):
+    """ Compresses the class with a new project and returns the code (and mappings) and the parsed tree entries """
+    project = Project(folder)
+    classObj = project.getClasses()["cachetest.Foo"]
+    code = classObj.getCompressed()
+    if mappings:
+        code = (code, classObj.getCompressedMappings())
+    project.close()
+
+    db = shelve.open(os.path.join(folder, "cache.db"), flag="r")
+    entries = dict([(key, db[key]) for key in db.keys() if key.startswith("parsed[") and not key.endswith("-timestamp")])
+    db.close()
+
+    return code, entries
+
+
+def write(path, text):
+    open(path, "w", encoding="utf-8").write(text)
+
+    # Ensure a new modification time
+    mtime = os.stat(path).st_mtime + 10
+    os.utime(path, (mtime, mtime))
+
+
+def check(name, condition):
+    print(">>> %s: %s" % (name, "OK" if condition else "FAIL"))
+
+
+if __name__ == "__main__":
+    folder = tempfile.mkdtemp()
+    try:
+        os.mkdir(os.path.join(folder, "src"))
+        open(os.path.join(folder, "manifest.json"), "w").write('{"name":"cachetest"}')
+        path = os.path.join(folder, "src", "Foo.js")
+
+        write(path, source)
+        code, entries = build(folder)
+        check("parsed", parsed == ["Foo"] and list(entries) == ["parsed[Foo]"])
+
+        write(path, source.replace("a + 1", "a + 2"))
+        changed, entries = build(folder)
+        checksum = hashlib.sha1(source.replace("a + 1", "a + 2").encode("utf-8")).hexdigest()
+        check("changed", len(parsed) == 2 and "a+2" in changed and list(entries) == ["parsed[Foo]"] and entries["parsed[Foo]"][0] == checksum)
+
+        write(path, source.replace("a + 1", "a + 2"))
+        touched, entries = build(folder)
+        check("touched", len(parsed) == 2 and touched == changed)
+
+        write(path, source)
+        del compressed[:]
+        (code, mappings), entries = build(folder, True)
+        check("mappings", compressed.count("script") == 1 and mappings and set([fileId for offset, fileId, line in mappings]) == set(["Foo"]))
+
+    finally:
+        shutil.rmtree(folder)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+#
+# Test for the iterative tree processing. Builds very deeply nested trees
+# (deeper than the recursion limit of Python) and checks that the compressor,
+# the dead code cleanup, the variable scanner and the optimizations are able
+# to process them.
+#
+
+import sys, os
+
+# Extend PYTHONPATH with 'lib'
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), os.pardir, "lib")))
+
+from jasy.parser.Node import Node
+from jasy.process.Compressor import Compressor
+from jasy.process.Variables import scan
+from jasy.core.DeadCode import cleanup
+from jasy.Optimization import Optimization
+
+
+def identifier(name):
+    node = Node(None, "identifier")
+    node.value = name
+    return node
+
+
+def chain(depth):
+    """ Builds a script with the statement a+b+b+...+b """
+    expression = identifier("a")
+    for pos in range(depth):
+        plus = Node(None, "plus")
+        plus.append(expression)
+        plus.append(identifier("b"))
+        expression = plus
+
+    return script(expression)
+
+
+def hooks(depth):
+    """ Builds a script with the statement true?(true?(...):c):c """
+    expression = identifier("a")
+    for pos in range(depth):
+        hook = Node(None, "hook")
+        hook.append(Node(None, "true"))
+        hook.append(expression)
+        hook.append(identifier("c"))
+        expression = hook
+
+    return script(expression)
+
+
+def script(expression):
+    statement = Node(None, "semicolon")
+    statement.append(expression, "expression")
+
+    root = Node(None, "script")
+    root.append(statement)
+    return root
+
+
+def check(name, condition):
+    print(">>> %s: %s" % (name, "OK" if condition else "FAIL"))
+
+
+if __name__ == "__main__":
+    depth = sys.getrecursionlimit() * 5
+
+    tree = chain(depth)
+    check("compress chain", Compressor().compress(tree) == "a" + "+b" * depth + ";")
+    check("scan chain", "b" in scan(tree).accessed)
+
+    tree = chain(depth)
+    Optimization("unused", "declarations", "blocks", "variables", "privates").apply(tree, scan(tree))
+    check("optimize chain", Compressor().compress(tree) == "a" + "+b" * depth + ";")
+
+    tree = hooks(depth)
+    check("cleanup hooks", cleanup(tree) and Compressor().compress(tree) == "a;")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+#
+# Test for the node index of parsed trees. Compares the indexed nodes with the nodes
+# found by walking the tree (after parsing and after modifications of the tree, before
+# and after the index is built, in overlays) and checks that trees without index (lean
+# trees, custom builders) work as well.
+#
+
+import sys, os
+
+# Extend PYTHONPATH with 'lib'
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), os.pardir, "lib")))
+
+from jasy.parser.Parser import parse
+from jasy.parser.Node import Node
+from jasy.parser.VanillaBuilder import VanillaBuilder
+from jasy.parser.LeanBuilder import LeanBuilder
+from jasy.process.Compressor import compress
+
+
+source = """
+function outer(a) {
+  if (a) {
+    call(a, function() { return other(1); });
+  }
+  return a ? first() : second();
+}
+outer(2);
+"""
+
+
+class CustomBuilder:
+    """ Builder which only knows the methods of the parser interface (no INDEX_attach) """
+
+    def __init__(self):
+        self.__builder = VanillaBuilder()
+
+    def __getattr__(self, name):
+        if name == "INDEX_attach":
+            raise AttributeError(name)
+
+        return getattr(self.__builder, name)
+
+
+def collect(tree):
+    """ Returns the IDs of all nodes in the tree by their type """
+    result = {}
+    todo = [tree]
+    while todo:
+        node = todo.pop()
+        if node is not None:
+            result.setdefault(node.type, set()).add(id(node))
+            todo.extend(node)
+
+    return result
+
+
+def matches(tree):
+    """ Whether the index of the tree returns the same nodes as a walk over the tree """
+    nodeIndex = tree.getIndex()
+    for nodeType, found in collect(tree).items():
+        if set([id(node) for node in nodeIndex.get(nodeType)]) != found:
+            return False
+
+    return True
+
+
+def createCall():
+    """ Returns a new statement calling a function """
+    statement = Node(None, "semicolon")
+    call = Node(None, "call")
+    call.append(Node(None, "identifier"))
+    call.append(Node(None, "list"))
+    statement.append(call, "expression")
+    return statement
+
+
+def check(name, condition):
+    print(">>> %s: %s" % (name, "OK" if condition else "FAIL"))
+
+
+if __name__ == "__main__":
+    tree = parse(source, "index.js", index=True)
+    check("parsed", tree.getIndex() is not None and matches(tree))
+    check("calls", len(tree.getIndex().get("call")) == 5)
+
+    # Replace the hook in the return statement by one of its branches
+    hook = tree.getIndex().get("hook")[0]
+    hook.parent.replace(hook, hook[1])
+    check("replace", matches(tree) and not tree.getIndex().get("hook"))
+
+    # Remove the if statement
+    condition = tree.getIndex().get("if")[0]
+    condition.parent.remove(condition)
+    check("remove", matches(tree) and len(tree.getIndex().get("call")) == 2)
+
+    # Append a new call to the script
+    statement = createCall()
+    tree.append(statement)
+    check("append", matches(tree) and statement.expression in tree.getIndex().get("call"))
+    check("owner", statement.expression.getIndex() is tree.getIndex() and hook[1].getIndex() is tree.getIndex())
+
+    # Modifications before the first lookup are found by the walk which builds the index
+    tree = parse(source, "lazy.js", index=True)
+    tree.append(createCall())
+    tree.remove(tree[0])
+    check("lazy", tree[0].getIndex() is None and matches(tree) and len(tree.getIndex().get("call")) == 2)
+
+    # Overlays index the nodes they own (copied ancestors, clones and added nodes) on top of the original
+    original = parse(source, "original.js", index=True)
+    calls = len(original.getIndex().get("call"))
+    overlay = original.createOverlay([original[0]])
+    overlay.append(createCall())
+    check("overlay", matches(overlay) and len(overlay.getIndex().get("call")) == calls + 1)
+
+    overlay.replace(overlay[0], createCall())
+    check("overlay replace", matches(overlay) and len(overlay.getIndex().get("call")) == 3 and matches(original))
+
+    tree = parse(source, "plain.js")
+    check("no index", tree.getIndex() is None and tree[0].getIndex() is None)
+
+    expected = compress(parse(source, "plain.js"))
+
+    tree = parse(source, "lean.js", builder=LeanBuilder())
+    check("lean", tree.getIndex() is None and compress(tree) == expected)
+
+    tree = parse(source, "custom.js", builder=CustomBuilder())
+    check("custom builder", tree.getIndex() is None and compress(tree) == expected)
@@ -1 +1 @@
-function wrapper(){var a=5}
+function wrapper(){}
@@ -1 +1 @@
-function run(){var b=function(){}}
+function run(){}
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+#
+# Test for the copy-on-write overlays used for permutation variants. Patches overlays
+# of one tree with multiple permutations and checks that the original tree stays
+# unchanged and that each overlay produces the same code as a freshly parsed tree
+# which is patched and cleaned up directly.
+#
+
+import sys, os
+
+# Extend PYTHONPATH with 'lib'
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), os.pardir, "lib")))
+
+from jasy.parser.Parser import parse
+from jasy.core.Permutation import Permutation, getPatchStatements
+from jasy.core.DeadCode import cleanup
+from jasy.process.Compressor import compress
+
+
+source = """
+var config = {
+  debug : jasy.Env.getValue("debug"),
+  engine : jasy.Env.select("engine", { webkit : "wk", gecko : "moz" })
+};
+
+function log(message) {
+  if (jasy.Env.isSet("debug")) {
+    console.log(message);
+  } else {
+    store(message);
+  }
+}
+
+function render(node) {
+  var prefix = jasy.Env.isSet("engine", "webkit") ? "-webkit-" : "-moz-";
+  node.style[prefix + "transform"] = "none";
+  return has("touch") && node.addEventListener("touchstart", log);
+}
+"""
+
+fields = {
+  "debug" : { "check" : "Boolean" },
+  "engine" : { "check" : ["webkit", "gecko"] },
+  "touch" : { "check" : "Boolean" }
+}
+
+combinations = [
+  { "debug" : True, "engine" : "webkit", "touch" : True },
+  { "debug" : False, "engine" : "gecko", "touch" : False },
+  { "debug" : False, "engine" : "webkit", "touch" : True }
+]
+
+
+def patched(tree, permutation):
+    permutation.patch(tree)
+    cleanup(tree)
+    return compress(tree)
+
+
+def check(name, condition):
+    print(">>> %s: %s" % (name, "OK" if condition else "FAIL"))
+
+
+if __name__ == "__main__":
+    for index in (True, False):
+        original = parse(source, "overlay.js", index=index)
+        pristine = original.toXml()
+        expected = compress(original)
+
+        for pos, combination in enumerate(combinations):
+            name = "%s %s" % ("indexed" if index else "plain", pos)
+            permutation = Permutation(combination, fields)
+
+            overlay = original.createOverlay(getPatchStatements(original))
+            result = patched(overlay, permutation)
+
+            check("%s matches fresh" % name, result == patched(parse(source, "overlay.js"), permutation))
+            check("%s keeps original" % name, original.toXml() == pristine and compress(original) == expected)
+
+            # Templates are shared by all trees patched with the same permutation
+            overlay = original.createOverlay(getPatchStatements(original))
+            check("%s repeated" % name, patched(overlay, permutation) == result)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+#
+# Test for the parallel execution of tasks. Checks that the workers read the values
+# of the cache through their own read-only handle, that values stored by the workers
+# are dropped and that the cache file of the calling process stays unchanged.
+#
+
+import sys, os, tempfile, shutil
+
+# Extend PYTHONPATH with 'lib'
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), os.pardir, "lib")))
+
+from jasy.core.Cache import Cache
+from jasy.core.Parallel import execute
+
+
+cache = None
+handle = None
+
+
+def task(item):
+    """ Reads the value stored by the parent and stores a new one """
+    cache.store("item-%s" % item, item)
+    return (cache.read("shared"), cache.read("item-%s" % item), cache._Cache__db is not handle)
+
+
+def check(name, condition):
+    print(">>> %s: %s" % (name, "OK" if condition else "FAIL"))
+
+
+if __name__ == "__main__":
+    folder = tempfile.mkdtemp()
+    try:
+        cache = Cache(folder)
+        cache.store("shared", "value")
+        cache.sync()
+        handle = cache._Cache__db
+
+        results = execute(task, range(4), 2)
+        check("worker results", results == [("value", item, True) for item in range(4)])
+        check("worker values dropped", cache.read("item-0") is None and "item-0" not in handle)
+        check("parent writes", cache._Cache__db is handle)
+
+        cache.store("after", 1)
+        cache.close()
+
+        cache = Cache(folder)
+        check("cache file", cache.read("shared") == "value" and cache.read("after") == 1 and cache.read("item-1") is None)
+        cache.close()
+
+    finally:
+        shutil.rmtree(folder)
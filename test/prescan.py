@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+#
+# Differential test of the token level pre-scan. Compares the permutation keys,
+# the translation usage and the meta data of the pre-scan with the results of
+# the tree based analysis. The pre-scan might see additional comments which
+# are not attached to any node in the tree (e.g. in files without code).
+#
+
+import sys, os
+
+# Extend PYTHONPATH with 'lib'
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), os.pardir, "lib")))
+
+from jasy.core.PreScan import PreScan, prescan
+from jasy.parser.Parser import parse
+from jasy.tokenizer.Tokenizer import ParseError
+
+
+# Sources where a slash after a paren starts a regular expression. The scanner must
+# reject them (so that the tree is used) instead of failing or losing keys.
+fallbacks = [
+    'if (x) /"/.test(s); jasy.Env.isSet("a");',
+    'while (x) /a/g.exec(s); jasy.Env.isSet("a");',
+    'for (;;) /=/.test(s); jasy.Env.isSet("a");'
+]
+
+
+def compare(fileName):
+    source = open(fileName, encoding="utf-8").read()
+    expected = PreScan(parse(source, fileName))
+    result = prescan(source, fileName)
+
+    if result.keys != expected.keys or result.translation != expected.translation:
+        return False
+
+    if expected.meta.name is not None and result.meta.name != expected.meta.name:
+        return False
+
+    for name in ("requires", "optionals", "breaks", "assets"):
+        if not getattr(expected.meta, name) <= getattr(result.meta, name):
+            return False
+
+    return True
+
+
+def compareFallback(source):
+    """ Like Class.getPreScan(): the tree is used when the scanner raises a ParseError """
+    try:
+        result = prescan(source, "fallback")
+    except ParseError:
+        result = PreScan(parse(source, "fallback"))
+
+    return result.keys == PreScan(parse(source, "fallback")).keys
+
+
+if __name__ == "__main__":
+    root = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), os.pardir)
+    folders = sys.argv[1:] or [os.path.join(root, "data", "jscore")]
+
+    for pos, source in enumerate(fallbacks):
+        print(">>> fallback %s: %s" % (pos, "OK" if compareFallback(source) else "FAIL"))
+
+    for folder in folders:
+        for dirPath, dirNames, fileNames in os.walk(folder):
+            for fileName in sorted(fileNames):
+                if fileName.endswith(".js"):
+                    path = os.path.join(dirPath, fileName)
+                    print(">>> %s: %s" % (path, "OK" if compare(path) else "FAIL"))
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+
+#
+# Test for the scope table. Modifies trees using the mutation methods of Node (directly,
+# randomly and by running the optimizers) and checks that the table which has been updated
+# by the tree is the same as a table which is built from scratch for the modified tree.
+#
+
+import sys, os, logging, random
+
+# Extend PYTHONPATH with 'lib'
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), os.pardir, "lib")))
+
+from jasy.parser.Parser import parse
+from jasy.parser.Node import Node
+from jasy.parser.Traversal import walk
+from jasy.process.Scopes import ScopesVisitor, createScopes
+from jasy.process.Variables import scan
+
+import jasy.optimizer.UnusedCleaner as UnusedCleaner
+import jasy.optimizer.BlockReducer as BlockReducer
+import jasy.optimizer.CombineDeclarations as CombineDeclarations
+
+
+source = """
+var used = 1, unused = 2;
+function outer(a, b) {
+  var inner = function(c) { return a + c; };
+  return inner(used);
+}
+outer(used);
+"""
+
+
+def snapshot(root):
+    """ Returns the bindings of all scopes as { script node ID : { name : (declaration IDs, reference IDs) } } """
+    result = {}
+    for scope in root.walk():
+        bindings = {}
+        for name, binding in scope.bindings.items():
+            if binding.declarations or binding.references:
+                bindings[name] = (set(binding.declarations), set(binding.references))
+
+        result[id(scope.node)] = bindings
+
+    return result
+
+
+def rebuilt(tree):
+    """ Returns the snapshot of a table built from scratch (the scopes of the script nodes are kept) """
+    scopes = tree._scope.walk()
+    result = snapshot(walk(tree, ScopesVisitor())[0].result)
+
+    for scope in scopes:
+        scope.node._scope = scope
+
+    return result
+
+
+def compareOptimized(source, fileName):
+    tree = parse(source, fileName)
+    scan(tree)
+    createScopes(tree)
+
+    UnusedCleaner.optimize(tree)
+    BlockReducer.optimize(tree)
+    CombineDeclarations.optimize(tree)
+    UnusedCleaner.optimize(tree)
+
+    return snapshot(tree._scope) == rebuilt(tree)
+
+
+def compareRandom(source, fileName):
+    """ Removes, moves, wraps and replaces statements and identifiers (without declarations) """
+    tree = parse(source, fileName)
+    root = createScopes(tree)
+    generator = random.Random(fileName)
+
+    def collect():
+        statements = []
+        containers = []
+        identifiers = []
+        todo = [tree]
+        while todo:
+            node = todo.pop()
+            if node.type in ("block", "script"):
+                containers.append(node)
+                for child in node:
+                    if not [found for found in collectTypes(child) if found in ("declaration", "function", "catch")]:
+                        statements.append(child)
+
+            elif node.type == "identifier" and id(node) in root.nodes and id(node) in root.nodes[id(node)].references:
+                identifiers.append(node)
+
+            todo.extend([child for child in node if child is not None])
+
+        return statements, containers, identifiers
+
+    for step in range(20):
+        statements, containers, identifiers = collect()
+        operation = generator.choice(("remove", "move", "wrap", "replace"))
+
+        if operation == "remove" and statements:
+            statement = generator.choice(statements)
+            statement.parent.remove(statement)
+
+        elif operation == "move" and statements:
+            statement = generator.choice(statements)
+            target = generator.choice([container for container in containers if not statement in ancestors(container)])
+            target.insert(generator.randint(0, len(target)), statement)
+
+        elif operation == "wrap" and statements:
+            statement = generator.choice(statements)
+            if statement.type == "semicolon" and getattr(statement, "expression", None):
+                wrapper = Node(None, "semicolon")
+                comma = Node(None, "comma")
+                comma.append(statement.expression)
+                wrapper.append(comma, "expression")
+                statement.parent.replace(statement, wrapper)
+
+        elif operation == "replace" and identifiers:
+            identifier = generator.choice(identifiers)
+            replacement = Node(None, "identifier")
+            replacement.value = generator.choice(identifiers).value
+            identifier.parent.replace(identifier, replacement)
+
+    return snapshot(root) == rebuilt(tree)
+
+
+def collectTypes(node):
+    result = set()
+    todo = [node]
+    while todo:
+        node = todo.pop()
+        if node is not None:
+            result.add(node.type)
+            todo.extend(node)
+
+    return result
+
+
+def ancestors(node):
+    result = [node]
+    while hasattr(node, "parent"):
+        node = node.parent
+        result.append(node)
+
+    return result
+
+
+def check(name, condition):
+    print(">>> %s: %s" % (name, "OK" if condition else "FAIL"))
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+
+    tree = parse(source, "scopes.js")
+    root = createScopes(tree)
+    binding = root.bindings["used"]
+    check("built", len(binding.getReferences()) == 2 and root.getUnused() == set(["unused"]))
+
+    # Removing the call of outer() drops its access of "used" and of "outer"
+    statement = tree[-1]
+    tree.remove(statement)
+    check("removed", len(binding.getReferences()) == 1 and root.getUnused() == set(["unused", "outer"]))
+
+    # Adding it again (with another argument) registers the accesses again
+    statement[0][1][0].value = "unused"
+    tree.append(statement)
+    check("added", len(binding.getReferences()) == 1 and root.getUnused() == set())
+
+    # Moving the inner function keeps its scope (and its access of "a") in the table
+    function = tree[1]
+    inner = function.body[0][0].initializer
+    before = len(function.body._scope.bindings["a"].getReferences())
+    function.body[0][0].remove(inner)
+    removed = len(function.body._scope.bindings["a"].getReferences())
+    function.body[0][0].append(inner, "initializer")
+    check("moved", before == 1 and removed == 0 and len(function.body._scope.bindings["a"].getReferences()) == 1 and snapshot(root) == rebuilt(tree))
+
+    # A new identifier replacing an existing one
+    identifier = Node(None, "identifier")
+    identifier.value = "b"
+    returned = function.body[1].value
+    returned.replace(returned[1], identifier)
+    check("replaced", snapshot(tree._scope) == rebuilt(tree) and function.body._scope.bindings["b"].isAccessed())
+
+    root = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), os.pardir)
+    folders = sys.argv[1:] or [os.path.join(root, "data", "jscore")]
+
+    for folder in folders:
+        for dirPath, dirNames, fileNames in os.walk(folder):
+            for fileName in sorted(fileNames):
+                if fileName.endswith(".js"):
+                    path = os.path.join(dirPath, fileName)
+                    source = open(path, encoding="utf-8").read()
+                    check("%s (optimized)" % path, compareOptimized(source, path))
+                    check("%s (random)" % path, compareRandom(source, path))
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+#
+# Test for the source maps of compressed code. Generates the map of a small
+# source, decodes it again and checks the source line of known positions.
+#
+
+import sys, os, json
+
+# Extend PYTHONPATH with 'lib'
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), os.pardir, "lib")))
+
+from jasy.parser.Parser import parse
+from jasy.process.Compressor import Compressor
+from jasy.process.SourceMap import generate
+
+
+source = """var a=1;
+function f(){
+  return a;
+}
+f();
+"""
+
+base64 = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+
+
+def decode(mappings):
+    """ Returns the segments of the given mappings as (generated line, column, source, source line) tuples """
+    result = []
+    column = source = line = 0
+
+    for generatedLine, group in enumerate(mappings.split(";")):
+        column = 0
+        for segment in group.split(","):
+            if not segment:
+                continue
+
+            values = []
+            value = shift = 0
+            for char in segment:
+                digit = base64.index(char)
+                value += (digit & 31) << shift
+                shift += 5
+                if not digit & 32:
+                    values.append(-(value >> 1) if value & 1 else value >> 1)
+                    value = shift = 0
+
+            column += values[0]
+            source += values[1]
+            line += values[2]
+            result.append((generatedLine, column, source, line))
+
+    return result
+
+
+def lineAt(segments, column):
+    """ Returns the source line of the given column of the first generated line """
+    found = None
+    for generatedLine, start, source, line in segments:
+        if generatedLine == 0 and start <= column:
+            found = line
+
+    return found
+
+
+def check(name, condition):
+    print(">>> %s: %s" % (name, "OK" if condition else "FAIL"))
+
+
+if __name__ == "__main__":
+    compressor = Compressor(mapping=True)
+    code = compressor.compress(parse(source, "test.js"))
+    sourceMap = json.loads(generate(code, compressor.getMappings(), "test.min.js"))
+    segments = decode(sourceMap["mappings"])
+
+    check("sources", sourceMap["sources"] == ["test.js"])
+    check("first line", lineAt(segments, code.index("var")) == 0)
+    check("function", lineAt(segments, code.index("function")) == 1)
+    check("return", lineAt(segments, code.index("return")) == 2)
+    check("call", lineAt(segments, code.rindex("f()")) == 4)
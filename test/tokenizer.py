@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+#
+# Differential test of the tokenizer engines. Parses every file with the
+# classic and with the regex engine and compares the token stream (type, value,
+# positions, line), the comments and the resulting tree of both runs. Also
+# compares the decoded values of string literals with the values of Python and
+# checks that comments with invalid content are ignored.
+#
+
+import sys, os
+
+# Extend PYTHONPATH with 'lib'
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), os.pardir, "lib")))
+
+from jasy.tokenizer.Tokenizer import Tokenizer, decodeString
+from jasy.parser.Parser import Script, StaticContext, parse
+from jasy.parser.VanillaBuilder import VanillaBuilder
+
+
+# String literals with escapes which are decoded the same way by Python
+literals = [
+    r'"Grüße \"%s\"\n\tvon \xfcber\n"',
+    r"'It\'s \x3Cb\x3E–bold–\x3C/b\x3E\r\n'",
+    r'"\u0041\u0062c\x44"',
+    r'"tab\tseparated\tvalues\twith\\backslashes\\"',
+    r'"plain string without any escapes"'
+]
+
+# Valid documentation comment and one which is invalid (parameter without name)
+commentSource = """
+/**
+ * Valid documentation
+ */
+function a() {}
+
+/**
+ * Parameter without name
+ * @param {Integer}
+ */
+function b(x) {}
+"""
+
+
+def record(source, fileId, engine):
+    tokenizer = Tokenizer(source, fileId, 0, engine)
+    tokens = []
+    comments = []
+
+    get = tokenizer.get
+    def recordGet(scanOperand=False):
+        tokenType = get(scanOperand)
+        token = tokenizer.token
+        tokens.append((tokenType, getattr(token, "value", None), token.start, token.end, token.line, getattr(token, "assignOp", None), tokenizer.line))
+        return tokenType
+
+    getComments = tokenizer.getComments
+    def recordComments():
+        result = getComments()
+        if result:
+            for comment in result:
+                comments.append((comment.variant, comment.context, comment.text, comment.getTags()))
+        return result
+
+    tokenizer.get = recordGet
+    tokenizer.getComments = recordComments
+
+    try:
+        tree = Script(tokenizer, StaticContext(False, VanillaBuilder())).toXml()
+    except Exception as error:
+        tree = "%s: %s" % (error.__class__.__name__, error)
+
+    return tokens, comments, tree
+
+
+def compare(fileName):
+    source = open(fileName, encoding="utf-8").read()
+    return record(source, fileName, "classic") == record(source, fileName, "regex")
+
+
+if __name__ == "__main__":
+    root = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), os.pardir)
+    folders = sys.argv[1:] or [os.path.join(root, "test", "compressor"), os.path.join(root, "data", "jscore")]
+
+    for pos, literal in enumerate(literals):
+        print(">>> decode %s: %s" % (pos, "OK" if decodeString(literal[1:-1]) == eval(literal) else "FAIL"))
+
+    xml = parse(commentSource, "comments.js").toXml()
+    print(">>> invalid comments: %s" % ("OK" if "Valid documentation" in xml and not "without name" in xml else "FAIL"))
+
+    for folder in folders:
+        for dirPath, dirNames, fileNames in os.walk(folder):
+            for fileName in sorted(fileNames):
+                if fileName.endswith(".js"):
+                    path = os.path.join(dirPath, fileName)
+                    print(">>> %s: %s" % (path, "OK" if compare(path) else "FAIL"))
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+#
+# Differential test of the syntax tree representations. Parses every file and
+# checks that pickled and copied trees are equal to the original tree, that the
+# LeanBuilder produces the same code as the VanillaBuilder, that the node index
+# contains exactly the nodes of the tree and that the analyses return the same
+# results when they are executed together in one walk.
+#
+
+import sys, os, pickle, copy
+
+# Extend PYTHONPATH with 'lib'
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), os.pardir, "lib")))
+
+from jasy.parser.Parser import parse
+from jasy.parser.LeanBuilder import LeanBuilder
+from jasy.parser.Traversal import walk
+from jasy.process.Compressor import compress
+from jasy.process.Variables import VariablesVisitor, scan
+from jasy.core.MetaData import MetaData, MetaDataVisitor
+from jasy.core.Permutation import KeysVisitor, getKeys, getPatchStatements
+from jasy.core.Translation import TextVisitor, hasText, getTextCalls
+
+
+def collect(tree):
+    """ Returns the IDs of all nodes in the tree by their type """
+    result = {}
+    todo = [tree]
+    while todo:
+        node = todo.pop()
+        if node is not None:
+            result.setdefault(node.type, set()).add(id(node))
+            todo.extend(node)
+
+    return result
+
+
+def comparePickle(source, fileName):
+    tree = parse(source, fileName, index=True)
+    scan(tree)
+
+    restored = pickle.loads(pickle.dumps(tree, pickle.HIGHEST_PROTOCOL))
+    return restored.toXml() == tree.toXml() and compress(restored) == compress(tree) and restored._index is None and restored._source is None
+
+
+def compareCopy(source, fileName):
+    tree = parse(source, fileName)
+    scan(tree)
+
+    expected = tree.toXml()
+    return tree.clone().toXml() == expected and copy.deepcopy(tree).toXml() == expected
+
+
+def compareLean(source, fileName):
+    return compress(parse(source, fileName, builder=LeanBuilder())) == compress(parse(source, fileName))
+
+
+def compareIndex(source, fileName):
+    tree = parse(source, fileName, index=True)
+    nodeIndex = tree.getIndex()
+    for nodeType, found in collect(tree).items():
+        if set([id(node) for node in nodeIndex.get(nodeType)]) != found:
+            return False
+
+    # Nested statements are only reported by the index (they are ignored by createOverlay())
+    plain = parse(source, fileName)
+    return (len(getPatchStatements(tree)) == 0) == (len(getPatchStatements(plain)) == 0) and len(getTextCalls(tree)) >= len(getTextCalls(plain))
+
+
+def compareWalk(source, fileName):
+    tree = parse(source, fileName)
+
+    scan(tree)
+    separate = MetaData(tree), getKeys(tree), hasText(tree)
+
+    variables, keys, text, meta = walk(tree, VariablesVisitor(), KeysVisitor(), TextVisitor(), MetaDataVisitor(MetaData()))
+    combined = meta.meta, keys.keys, text.found
+
+    return separate[1:] == combined[1:] and [getattr(separate[0], name) for name in MetaData.__slots__] == [getattr(combined[0], name) for name in MetaData.__slots__]
+
+
+checks = [
+    ("pickle", comparePickle),
+    ("copy", compareCopy),
+    ("lean", compareLean),
+    ("index", compareIndex),
+    ("walk", compareWalk)
+]
+
+
+if __name__ == "__main__":
+    root = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), os.pardir)
+    folders = sys.argv[1:] or [os.path.join(root, "data", "jscore")]
+
+    for folder in folders:
+        for dirPath, dirNames, fileNames in os.walk(folder):
+            for fileName in sorted(fileNames):
+                if fileName.endswith(".js"):
+                    path = os.path.join(dirPath, fileName)
+                    source = open(path, encoding="utf-8").read()
+                    for name, compare in checks:
+                        print(">>> %s (%s): %s" % (path, name, "OK" if compare(source, path) else "FAIL"))
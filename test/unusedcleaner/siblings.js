@@ -0,0 +1,10 @@
+function wrapper()
+{
+  var first = 1;
+  var second = 2;
+  var used = 3;
+  var third = 4, fourth = 5;
+  var fifth = function() {};
+
+  return used;
+}
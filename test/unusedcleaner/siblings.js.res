@@ -0,0 +1 @@
+function wrapper(){var a=3;return a}